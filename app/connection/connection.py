@@ -1,5 +1,8 @@
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
+from app.utils.metrics import mongo_event_listeners
+from app.utils.slow_ops import slow_op_listeners
 import os
 
 # Load environment variables
@@ -28,8 +31,8 @@ class MongoDBConnection:
                 raise ValueError("MONGODB_URI environment variable is not set")
             print(f"Connecting to MongoDB at: {mongodb_uri}")
 
-            # Create MongoDB client
-            self._client = MongoClient(mongodb_uri)
+            # Create MongoDB client; the listeners feed /metrics and the slow-op log
+            self._client = MongoClient(mongodb_uri, event_listeners=mongo_event_listeners() + slow_op_listeners())
             
             # Get database name from environment variables
             db_name = os.getenv('MONGODB_DB_NAME')
@@ -69,4 +72,70 @@ class MongoDBConnection:
             self._client.close()
             self._client = None
             self._db = None
-            print("MongoDB connection closed.") 
\ No newline at end of file
+            print("MongoDB connection closed.") 
+
+
+class AsyncMongoDBConnection:
+    """Motor-backed connection used by the API so Mongo round-trips never block the event loop.
+
+    The synchronous MongoDBConnection above stays available for scripts such as loaddb.py.
+    """
+    _instance = None
+    _client = None
+    _db = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncMongoDBConnection, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._client is None:
+            self.connect()
+
+    def connect(self):
+        """Create the Motor client (no I/O happens until the first awaited operation)"""
+        try:
+            mongodb_uri = os.getenv('MONGODB_URI')
+            if not mongodb_uri:
+                raise ValueError("MONGODB_URI environment variable is not set")
+            print(f"Connecting to MongoDB (async) at: {mongodb_uri}")
+
+            self._client = AsyncIOMotorClient(mongodb_uri, event_listeners=mongo_event_listeners() + slow_op_listeners())
+
+            db_name = os.getenv('MONGODB_DB_NAME')
+            if not db_name:
+                raise ValueError("MONGODB_DB_NAME environment variable is not set")
+            print(f"Using database: {db_name}")
+
+            self._db = self._client[db_name]
+        except Exception as e:
+            print(f"Error connecting to MongoDB: {str(e)}")
+            raise
+
+    async def ping(self):
+        """Test the connection"""
+        await self._client.admin.command('ping')
+        print("Successfully connected to MongoDB (async)!")
+
+    def get_database(self):
+        """Get database instance"""
+        if self._db is None:
+            print("Database not initialized, connecting...")
+            self.connect()
+        return self._db
+
+    def get_collection(self, collection_name):
+        """Get collection instance"""
+        if self._db is None:
+            print("Database not initialized, connecting...")
+            self.connect()
+        return self._db[collection_name]
+
+    def close(self):
+        """Close MongoDB connection"""
+        if self._client:
+            self._client.close()
+            self._client = None
+            self._db = None
+            print("Async MongoDB connection closed.")
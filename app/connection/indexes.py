@@ -0,0 +1,235 @@
+from app.connection.connection import AsyncMongoDBConnection
+from app.controller.sync_controller import SYNC_TOMBSTONE_RETENTION_DAYS
+from typing import Dict, List, Optional, Tuple
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+import argparse
+import asyncio
+import json
+import os
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "JSON_db.json")
+
+# Indexes the controller queries need on top of what JSON_db.json declares.
+# Every lookup by "id" must be unique and indexed, and each equality filter is
+# paired with "id" so the same index also returns rows in id order.
+QUERY_INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("type", ASCENDING), ("id", ASCENDING)]),
+        # Case-insensitive email uniqueness; partial so users not yet backfilled don't collide on null
+        IndexModel(
+            [("email_normalized", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"email_normalized": {"$type": "string"}},
+        ),
+        # /sync reads each collection in change order
+        IndexModel([("updated_seq", ASCENDING)]),
+    ],
+    "documents": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("type", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("teacher_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("subject_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("owner", ASCENDING), ("id", ASCENDING)]),
+        # Sorted listings (GET /documents/?sort=). Keys follow equality, sort,
+        # range: an equality filter first, then the sort field and id, so the
+        # index returns rows already in order, resumes a page with one seek and
+        # also bounds an upload_date range when sorting by date. Covered:
+        #   sort only                 -> (upload_date, id), (grade, id)
+        #   subject or teacher + sort -> (subject_id|teacher_id, upload_date|grade, id)
+        #   owner + upload_date       -> (owner, upload_date, id): a student's own documents
+        # type is left out of the prefix: with five values it narrows little,
+        # so walking the sort index and filtering type costs about as much.
+        # Other filters and combinations are checked on the rows these return.
+        IndexModel([("upload_date", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("grade", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("subject_id", ASCENDING), ("upload_date", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("subject_id", ASCENDING), ("grade", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("teacher_id", ASCENDING), ("upload_date", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("teacher_id", ASCENDING), ("grade", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("owner", ASCENDING), ("upload_date", ASCENDING), ("id", ASCENDING)]),
+        # /search; a collection can have only one text index
+        IndexModel([("title", TEXT)]),
+        IndexModel([("updated_seq", ASCENDING)]),
+    ],
+    "subjects": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # /search; a match in the name ranks above one in the description
+        IndexModel([("name", TEXT), ("description", TEXT)], weights={"name": 3, "description": 1}),
+        IndexModel([("updated_seq", ASCENDING)]),
+    ],
+    "courses": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Multikey: one entry per element of the subjects array
+        IndexModel([("subjects", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("updated_seq", ASCENDING)]),
+    ],
+    # Deleted records for /sync, read in change order and expired by a TTL index
+    "tombstones": [
+        IndexModel([("updated_seq", ASCENDING)]),
+        IndexModel([("deleted_at", ASCENDING)], expireAfterSeconds=SYNC_TOMBSTONE_RETENTION_DAYS * 86400),
+    ],
+    # Materialized grade summaries, listed one dimension at a time
+    "grade_stats": [
+        IndexModel([("dimension", ASCENDING), ("key", ASCENDING)]),
+    ],
+}
+
+# Indexes the API cannot run without, because they are the only guard against
+# duplicates (the controllers no longer look before they write). Startup stops
+# if one is missing, whether its build failed or MONGODB_INDEX_DRY_RUN skipped it.
+REQUIRED_INDEXES: Dict[str, List[Tuple]] = {
+    "users": [(("email_normalized", ASCENDING),)],
+}
+
+
+def _key_of(keys, weights: Optional[Dict] = None) -> Tuple:
+    """Comparable form of an index key.
+
+    The server lists a text index as `_fts`/`_ftsx` keys plus weights, so its
+    text fields are restored from the weights and sorted on both sides.
+    """
+    text_fields = sorted(weights) if weights else sorted(field for field, direction in keys.items() if direction == TEXT)
+    key = []
+    for field, direction in keys.items():
+        if field == "_ftsx":
+            continue
+        if field == "_fts" or direction == TEXT:
+            if text_fields:
+                key.extend((name, TEXT) for name in text_fields)
+                text_fields = []
+            continue
+        key.append((field, direction))
+    return tuple(key)
+
+
+class IndexManager:
+    """Creates the indexes declared in JSON_db.json plus the ones the controllers need.
+
+    Creation is idempotent: indexes that already exist with the same keys are
+    left alone, and in dry-run mode nothing is written, only reported.
+    """
+
+    def __init__(self, schema_file: str = SCHEMA_FILE):
+        self.db = AsyncMongoDBConnection().get_database()
+        self.schema_file = schema_file
+
+    def load_schema(self) -> List[Dict]:
+        """Read the collection definitions from the schema file"""
+        with open(self.schema_file, 'r') as file:
+            return json.load(file)
+
+    def planned_indexes(self) -> Dict[str, List[IndexModel]]:
+        """Build the full index plan per collection, schema first, then query indexes"""
+        plan: Dict[str, Dict[Tuple, IndexModel]] = {}
+        for collection in self.load_schema():
+            models = plan.setdefault(collection["name"], {})
+            for field in collection.get("fields", []):
+                if field["name"] == "_id":
+                    continue
+                if field.get("unique"):
+                    models[((field["name"], ASCENDING),)] = IndexModel([(field["name"], ASCENDING)], unique=True)
+                elif field.get("index"):
+                    models[((field["name"], ASCENDING),)] = IndexModel([(field["name"], ASCENDING)])
+
+        for collection_name, indexes in QUERY_INDEXES.items():
+            models = plan.setdefault(collection_name, {})
+            for index in indexes:
+                key = _key_of(index.document["key"])
+                existing = models.get(key)
+                # A unique declaration wins over a plain one for the same keys
+                if existing is None or index.document.get("unique"):
+                    models[key] = index
+
+        return {name: list(models.values()) for name, models in plan.items()}
+
+    async def diff(self) -> Dict[str, Dict[str, List[Dict]]]:
+        """Compare the plan with the database and return missing and extra indexes per collection"""
+        report = {}
+        for collection_name, planned in self.planned_indexes().items():
+            existing = {}
+            async for index in self.db[collection_name].list_indexes():
+                if index["name"] != "_id_":
+                    existing[_key_of(index["key"], index.get("weights"))] = index
+
+            planned_keys = {_key_of(model.document["key"]): model for model in planned}
+            missing = []
+            for key, model in planned_keys.items():
+                current = existing.get(key)
+                wanted_unique = bool(model.document.get("unique"))
+                if current is None:
+                    missing.append({"keys": list(key), "unique": wanted_unique})
+                elif bool(current.get("unique")) != wanted_unique:
+                    missing.append({"keys": list(key), "unique": wanted_unique, "conflicts_with": current["name"]})
+            extra = [
+                {"name": index["name"], "keys": list(key), "unique": bool(index.get("unique"))}
+                for key, index in existing.items() if key not in planned_keys
+            ]
+            report[collection_name] = {"missing": missing, "extra": extra}
+        return report
+
+    async def ensure_indexes(self, dry_run: bool = False) -> Dict[str, Dict[str, List[Dict]]]:
+        """Create every missing index (or only report them when dry_run is set)"""
+        report = await self.diff()
+        plan = self.planned_indexes()
+        for collection_name, changes in report.items():
+            for index in changes["extra"]:
+                print(f"[indexes] {collection_name}: extra index {index['name']} is not in the plan")
+            for index in changes["missing"]:
+                label = f"{collection_name} {index['keys']}{' unique' if index['unique'] else ''}"
+                if "conflicts_with" in index:
+                    print(f"[indexes] {label}: conflicts with existing index {index['conflicts_with']}, drop it manually")
+                    continue
+                if dry_run:
+                    print(f"[indexes] {label}: missing (dry run, not created)")
+                    continue
+                model = next(m for m in plan[collection_name] if list(_key_of(m.document["key"])) == index["keys"])
+                try:
+                    await self.db[collection_name].create_indexes([model])
+                    print(f"[indexes] {label}: created")
+                except OperationFailure as e:
+                    # e.g. duplicate values already stored under a unique field
+                    index["error"] = str(e)
+                    print(f"[indexes] {label}: could not be created: {str(e)}")
+        return report
+
+    async def require_indexes(self, required: Dict[str, List[Tuple]] = REQUIRED_INDEXES):
+        """Raise RuntimeError unless every required index exists with the options the plan gives it"""
+        plan = self.planned_indexes()
+        problems = []
+        for collection_name, keys in required.items():
+            existing = {}
+            async for index in self.db[collection_name].list_indexes():
+                existing[_key_of(index["key"], index.get("weights"))] = index
+            for key in keys:
+                model = next(m for m in plan[collection_name] if _key_of(m.document["key"]) == key)
+                current = existing.get(key)
+                label = f"{collection_name} {list(key)}"
+                if current is None:
+                    problems.append(f"{label} is missing")
+                elif bool(current.get("unique")) != bool(model.document.get("unique")):
+                    problems.append(f"{label} exists without the unique option")
+        if problems:
+            raise RuntimeError(
+                "Required indexes are not in place: " + "; ".join(problems)
+                + ". Resolve the reported index errors (python -m app.connection.indexes) before starting the API."
+            )
+
+
+def index_dry_run_enabled() -> bool:
+    """Whether the startup hook should only report index changes"""
+    return os.getenv("MONGODB_INDEX_DRY_RUN", "").lower() in ("1", "true", "yes")
+
+
+async def _main(dry_run: bool):
+    report = await IndexManager().ensure_indexes(dry_run=dry_run)
+    print(json.dumps(report, indent=2))
+    AsyncMongoDBConnection().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the MongoDB indexes described by JSON_db.json")
+    parser.add_argument("--dry-run", action="store_true", help="Only report missing and extra indexes")
+    args = parser.parse_args()
+    asyncio.run(_main(args.dry_run))
@@ -0,0 +1,114 @@
+from app.connection.connection import AsyncMongoDBConnection
+from app.controller.grade_stats_controller import GradeStatsController
+from app.controller.sync_controller import SEQ_FIELD, SYNC_COLLECTIONS, SyncController
+from app.utils.emails import NORMALIZED_EMAIL_FIELD, normalize_email
+from pymongo import UpdateOne
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+async def backfill_normalized_emails(batch_size: int = BACKFILL_BATCH_SIZE) -> Dict:
+    """Set email_normalized on users that are missing it or have a stale value.
+
+    Safe to run repeatedly; only users that need a change are written, in
+    unordered batches. Emails that collide once normalized are reported,
+    because the unique index on email_normalized cannot be built until they
+    are resolved by hand.
+    """
+    users = AsyncMongoDBConnection().get_collection('users')
+    updated = 0
+    seen: Dict[str, int] = {}
+    collisions: List[Dict] = []
+    batch: List[UpdateOne] = []
+
+    cursor = users.find({}, {"_id": 1, "id": 1, "email": 1, NORMALIZED_EMAIL_FIELD: 1}).batch_size(batch_size)
+    async for user in cursor:
+        email = user.get("email")
+        if not isinstance(email, str):
+            continue
+        normalized = normalize_email(email)
+        if normalized in seen:
+            collisions.append({"email": normalized, "ids": [seen[normalized], user.get("id")]})
+        else:
+            seen[normalized] = user.get("id")
+        if user.get(NORMALIZED_EMAIL_FIELD) != normalized:
+            batch.append(UpdateOne({"_id": user["_id"]}, {"$set": {NORMALIZED_EMAIL_FIELD: normalized}}))
+        if len(batch) >= batch_size:
+            result = await users.bulk_write(batch, ordered=False)
+            updated += result.modified_count
+            batch = []
+    if batch:
+        result = await users.bulk_write(batch, ordered=False)
+        updated += result.modified_count
+
+    for collision in collisions:
+        print(f"[migrations] users {collision['ids']} share the email {collision['email']}")
+    return {"updated": updated, "collisions": collisions}
+
+
+async def backfill_updated_seq(batch_size: int = BACKFILL_BATCH_SIZE) -> Dict:
+    """Give records written before delta sync an updated_seq.
+
+    Safe to run repeatedly; only records without one are written. It walks
+    each collection once in _id order, so it runs before the indexes are
+    built without rescanning the records already stamped. Each batch takes a
+    block of numbers from the change sequence, so the next /sync of every
+    client picks the records up as changes.
+    """
+    sync = SyncController()
+    stamped = {}
+    for name in SYNC_COLLECTIONS:
+        collection = AsyncMongoDBConnection().get_collection(name)
+        missing = {SEQ_FIELD: {"$exists": False}}
+        stamped[name] = 0
+        last_id = None
+        while True:
+            query = missing if last_id is None else {**missing, "_id": {"$gt": last_id}}
+            ids = [record["_id"] async for record in collection.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+            if not ids:
+                break
+            last_id = ids[-1]
+            async with sync.reserve(name, len(ids)) as seqs:
+                result = await collection.bulk_write([
+                    UpdateOne({"_id": _id, **missing}, {"$set": {SEQ_FIELD: seq}}) for _id, seq in zip(ids, seqs)
+                ], ordered=False)
+            stamped[name] += result.modified_count
+    return stamped
+
+
+async def build_grade_stats(force: bool = False) -> Dict:
+    """Build the grade_stats summaries from the documents collection.
+
+    Only runs when there are none yet (first start after upgrading), unless
+    `force` is set; after that DocumentController keeps them up to date.
+    """
+    grade_stats = GradeStatsController()
+    if not force and not await grade_stats.is_empty():
+        return {"skipped": "already built"}
+    return await grade_stats.rebuild()
+
+
+async def run_migrations(rebuild_grade_stats: bool = False) -> Dict:
+    """Apply every data migration; run before indexes that depend on them are built"""
+    return {
+        "backfill_normalized_emails": await backfill_normalized_emails(),
+        "backfill_updated_seq": await backfill_updated_seq(),
+        "build_grade_stats": await build_grade_stats(force=rebuild_grade_stats),
+    }
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Apply data migrations")
+    parser.add_argument("--rebuild-grade-stats", action="store_true",
+                        help="Recompute the grade summaries even if they already exist")
+    args = parser.parse_args()
+    print(json.dumps(await run_migrations(rebuild_grade_stats=args.rebuild_grade_stats), indent=2))
+    AsyncMongoDBConnection().close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
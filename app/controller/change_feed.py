@@ -0,0 +1,200 @@
+from app.connection.connection import AsyncMongoDBConnection
+from app.models.course import Course
+from app.models.document import Document
+from app.models.subject import Subject
+from app.models.user import User
+from app.utils.serialization import RowShape
+from collections import deque
+from pymongo.errors import OperationFailure
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import contextvars
+import orjson
+import os
+
+# Collections whose changes are published, and how their records are shaped for clients
+CHANGE_FEED_SHAPES = {
+    "users": RowShape(User),
+    "documents": RowShape(Document),
+    "subjects": RowShape(Subject),
+    "courses": RowShape(Course),
+}
+# Events queued per connected client; a client that falls this far behind is disconnected
+# and, on reconnecting, catches up from the replay buffer
+SSE_CLIENT_BUFFER_SIZE = int(os.getenv("SSE_CLIENT_BUFFER_SIZE", "256"))
+# Recent events kept for clients reconnecting with Last-Event-ID
+SSE_REPLAY_SIZE = int(os.getenv("SSE_REPLAY_SIZE", "1000"))
+# Seconds to wait before reopening the change stream after an error
+CHANGE_FEED_RETRY_SECONDS = 2.0
+# Server error code for a resume token that has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+
+
+class ChangeFeedUnavailable(Exception):
+    """The change stream cannot be opened, e.g. because MongoDB is not a replica set"""
+
+
+class Subscriber:
+    """One connected client: the collections it follows and its bounded queue of SSE frames.
+
+    A None in the queue ends the client's stream.
+    """
+
+    def __init__(self, collections: Set[str], buffer_size: int):
+        self.collections = collections
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+    def offer(self, frame: bytes):
+        """Queue a frame without waiting; a full queue disconnects the client instead of growing"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self):
+        """End the client's stream now: drop what is still queued and leave only the closing None"""
+        self.overflowed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class ChangeFeed:
+    """Fans MongoDB change-stream events for the API's collections out to SSE clients.
+
+    One change stream per process watches the whole database, started when
+    the first client connects. Each event is shaped and encoded once, kept
+    in a replay buffer and offered to every interested client's queue. The
+    event id is the change's resume token, so a reconnecting client sends
+    it back as Last-Event-ID and gets what it missed from the buffer, or a
+    `reset` event telling it to reload when that is no longer there. The
+    stream itself reopens after errors from the last token it saw.
+    """
+
+    def __init__(self, buffer_size: int = SSE_CLIENT_BUFFER_SIZE, replay_size: int = SSE_REPLAY_SIZE):
+        self.buffer_size = buffer_size
+        self.subscribers: Set[Subscriber] = set()
+        self.recent: Deque[Tuple[str, str, bytes]] = deque(maxlen=replay_size)
+        self.published = 0
+        self._token: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Future] = None
+
+    async def start(self):
+        """Open the change stream if it is not running; raises ChangeFeedUnavailable if it cannot be opened"""
+        if self._task is None or self._task.done():
+            self._ready = asyncio.get_running_loop().create_future()
+            # A fresh context, so the long-lived task does not inherit the first request's timings
+            self._task = contextvars.Context().run(asyncio.create_task, self._run())
+        try:
+            await asyncio.shield(self._ready)
+        except Exception as e:
+            raise ChangeFeedUnavailable(str(e))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        for subscriber in list(self.subscribers):
+            subscriber.close()
+        self.subscribers.clear()
+
+    async def subscribe(self, collections: Iterable[str], last_event_id: Optional[str] = None) -> Subscriber:
+        """Register a client; with `last_event_id`, first queue the events it missed"""
+        await self.start()
+        subscriber = Subscriber(set(collections), self.buffer_size)
+        if last_event_id:
+            missed = self._events_after(last_event_id)
+            if missed is None:
+                subscriber.offer(RESET_FRAME)
+            else:
+                for collection, frame in missed:
+                    if collection in subscriber.collections:
+                        subscriber.offer(frame)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def _events_after(self, token: str) -> Optional[List[Tuple[str, bytes]]]:
+        """Buffered events newer than `token`, or None if it is no longer in the buffer"""
+        events = list(self.recent)
+        for index in range(len(events) - 1, -1, -1):
+            if events[index][0] == token:
+                return [(collection, frame) for _, collection, frame in events[index + 1:]]
+        return None
+
+    def _pipeline(self) -> List[Dict]:
+        return [{"$match": {
+            "ns.coll": {"$in": list(CHANGE_FEED_SHAPES)},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+        }}]
+
+    async def _run(self):
+        db = AsyncMongoDBConnection().get_database()
+        while True:
+            try:
+                async with db.watch(self._pipeline(), full_document="updateLookup", resume_after=self._token) as stream:
+                    if not self._ready.done():
+                        self._ready.set_result(True)
+                    print(f"[events] change stream open{' (resumed)' if self._token else ''}")
+                    async for change in stream:
+                        self._token = change["_id"]
+                        self._publish(change)
+            except Exception as e:
+                if not self._ready.done():
+                    # Never opened (e.g. standalone server): report it to the waiting client and stop
+                    print(f"[events] change stream unavailable: {str(e)}")
+                    self._ready.set_exception(e)
+                    return
+                if isinstance(e, OperationFailure) and e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # Too far behind to resume; clients have to reload
+                    self._token = None
+                    self.recent.clear()
+                    for subscriber in list(self.subscribers):
+                        subscriber.offer(RESET_FRAME)
+                print(f"[events] change stream error, reopening in {CHANGE_FEED_RETRY_SECONDS}s: {str(e)}")
+                await asyncio.sleep(CHANGE_FEED_RETRY_SECONDS)
+
+    def _publish(self, change: Dict):
+        collection = change["ns"]["coll"]
+        operation = change["operationType"]
+        document = change.get("fullDocument")
+        description = change.get("updateDescription") or {}
+        event = {
+            "collection": collection,
+            "operation": "update" if operation == "replace" else operation,
+            "_id": str(change["documentKey"]["_id"]),
+            # Deletes only carry the MongoDB _id; updates of a record deleted meanwhile carry no document
+            "id": document.get("id") if document else None,
+            "document": CHANGE_FEED_SHAPES[collection](document) if document else None,
+            "updated_fields": list(description.get("updatedFields", {})) or None,
+        }
+        token = change["_id"]["_data"]
+        frame = b"id: " + token.encode() + b"\nevent: change\ndata: " + orjson.dumps(event, default=str) + b"\n\n"
+        self.recent.append((token, collection, frame))
+        self.published += 1
+        for subscriber in list(self.subscribers):
+            if collection in subscriber.collections:
+                subscriber.offer(frame)
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "clients": len(self.subscribers),
+            "published": self.published,
+            "buffered": len(self.recent),
+        }
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,59 @@
+from app.connection.connection import AsyncMongoDBConnection
+from app.utils.slow_ops import traced
+from app.utils.timing import timed
+from typing import Dict, List
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+@timed("db")
+@traced
+class CounterController:
+    """Hands out integer ids from the counters collection.
+
+    Each sequence is a single document ``{"_id": <name>, "seq": <last id>}``
+    bumped atomically with ``$inc``, so concurrent creates never share an id
+    and a whole block of ids costs one round-trip.
+    """
+
+    def __init__(self):
+        self.db = AsyncMongoDBConnection().get_database()
+        self.collection = self.db.counters
+
+    async def next_id(self, name: str) -> int:
+        """Get the next id of a sequence"""
+        ids = await self.reserve_ids(name, 1)
+        return ids[0]
+
+    async def reserve_ids(self, name: str, count: int) -> range:
+        """Reserve a contiguous block of ``count`` ids and return them as a range"""
+        if count < 1:
+            raise ValueError("Number of ids to reserve must be at least 1")
+        counter = await self._find_one_and_upsert(name, {"$inc": {"seq": count}})
+        last_id = counter["seq"]
+        return range(last_id - count + 1, last_id + 1)
+
+    async def seed_from_max(self, name: str) -> int:
+        """Move a sequence past the highest id already stored in its collection.
+
+        Uses ``$max`` so it is safe to run repeatedly and never moves a
+        counter backwards.
+        """
+        last = await self.db[name].find_one(sort=[("id", -1)], projection={"id": 1})
+        max_id = last["id"] if last and isinstance(last.get("id"), int) else 0
+        counter = await self._find_one_and_upsert(name, {"$max": {"seq": max_id}})
+        return counter["seq"]
+
+    async def seed_all(self, names: List[str]) -> Dict[str, int]:
+        """Seed several sequences from their collections"""
+        return {name: await self.seed_from_max(name) for name in names}
+
+    async def _find_one_and_upsert(self, name: str, update: Dict) -> Dict:
+        try:
+            return await self.collection.find_one_and_update(
+                {"_id": name}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two first-time upserts raced; the counter exists now, so retry as a plain update
+            return await self.collection.find_one_and_update(
+                {"_id": name}, update, return_document=ReturnDocument.AFTER
+            )
@@ -1,32 +1,62 @@
-from app.connection.connection import MongoDBConnection
-from typing import List, Optional, Dict
+from app.connection.connection import AsyncMongoDBConnection
+from app.controller.counter_controller import CounterController
+from app.controller.reference_cache import reference_cache
+from app.controller.sync_controller import SEQ_FIELD, SyncController, deleted_seqs
+from app.utils.bulk import PlannedDelete, PlannedUpdate, delete_batch, insert_batch, update_batch
+from app.utils.concurrency import INITIAL_VERSION, VERSION_FIELD, delete_versioned, update_versioned
+from app.utils.errors import ConflictError
+from app.utils.pagination import keyset_filter
+from app.utils.projection import apply_projection, to_projection
+from app.utils.streaming import STREAM_BATCH_SIZE
+from app.utils.slow_ops import traced
+from app.utils.timing import timed
+from typing import AsyncIterator, List, Optional, Dict, Tuple
 from bson import ObjectId
 
+@timed("db")
+@traced
 class CourseController:
     def __init__(self):
-        self.db = MongoDBConnection().get_database()
+        self.db = AsyncMongoDBConnection().get_database()
         self.collection = self.db.courses
+        self.counters = CounterController()
+        self.sync = SyncController()
 
-    def get_all_courses(self) -> List[Dict]:
-        """Get all courses from the database"""
-        courses = list(self.collection.find())
-        # Convert ObjectId to string for _id field
-        for course in courses:
+    async def get_all_courses(self, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all courses (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        return snapshot.page(snapshot.courses, after, limit, fields)
+
+    async def stream_courses(self, after: Optional[int] = None, subject_id: Optional[int] = None,
+                             fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Yield matching courses one by one, reading the cursor in batches"""
+        query = {"subjects": subject_id} if subject_id is not None else {}
+        cursor = self.collection.find(keyset_filter(query, after), to_projection(fields)).sort("id", 1).batch_size(STREAM_BATCH_SIZE)
+        async for course in cursor:
             if '_id' in course:
                 course['_id'] = str(course['_id'])
-        return courses
+            yield course
+
+    async def get_course_by_id(self, id: int, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """Get a course by its ID (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        course = snapshot.courses_by_id.get(id)
+        return apply_projection(course, fields) if course else None
 
-    def get_course_by_id(self, id: int) -> Optional[Dict]:
-        """Get a course by its ID"""
-        course = self.collection.find_one({"id": id})
-        if course and '_id' in course:
-            course['_id'] = str(course['_id'])
-        return course
+    async def get_courses_by_ids(self, ids: List[int], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get courses by ID, in the order asked for (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        return snapshot.pick(snapshot.courses_by_id, ids, fields)
 
-    def get_course_by_mongo_id(self, mongo_id: str) -> Optional[Dict]:
+    async def get_courses_by_mongo_ids(self, mongo_ids: List[str], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get courses by MongoDB _id, in the order asked for (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        return snapshot.pick(snapshot.courses_by_mongo_id, mongo_ids, fields)
+
+    async def get_course_by_mongo_id(self, mongo_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get a course by its MongoDB _id"""
         try:
-            course = self.collection.find_one({"_id": ObjectId(mongo_id)})
+            course = await self.collection.find_one({"_id": ObjectId(mongo_id)}, to_projection(fields))
             if course and '_id' in course:
                 course['_id'] = str(course['_id'])
             return course
@@ -34,78 +64,96 @@ class CourseController:
             print(f"Error searching for course by MongoDB ID: {str(e)}")
             return None
 
-    def get_courses_by_subject(self, subject_id: int) -> List[Dict]:
-        """Get all courses that include a specific subject"""
-        courses = list(self.collection.find({"subjects": subject_id}))
-        for course in courses:
-            if '_id' in course:
-                course['_id'] = str(course['_id'])
-        return courses
+    async def get_courses_by_subject(self, subject_id: int, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all courses that include a specific subject (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        return snapshot.page(snapshot.courses_by_subject.get(subject_id, []), after, limit, fields)
 
-    def create_course(self, course_data: Dict) -> Dict:
+    async def create_course(self, course_data: Dict) -> Dict:
         """Create a new course in the database"""
         try:
             # Get the next available ID
-            last_course = self.collection.find_one(sort=[("id", -1)])
-            next_id = 1 if not last_course else last_course["id"] + 1
-
-            # Prepare course data
-            course = {
-                "id": next_id,
-                "name": course_data["name"],
-                "subjects": course_data["subjects"]
-            }
-
-            # Insert course into database
-            result = self.collection.insert_one(course)
-            
-            # Get the created course
-            created_course = self.collection.find_one({"_id": result.inserted_id})
-            
-            # Convert ObjectId to string for response
-            if created_course and '_id' in created_course:
-                created_course["_id"] = str(created_course["_id"])
-            
-            return created_course
+            next_id = await self.counters.next_id("courses")
+
+            async with self.sync.reserve("courses") as seqs:
+                # Prepare course data
+                course = {
+                    "id": next_id,
+                    "name": course_data["name"],
+                    "subjects": course_data["subjects"],
+                    VERSION_FIELD: INITIAL_VERSION,
+                    SEQ_FIELD: seqs.start
+                }
+
+                # Insert course into database; insert_one fills in _id, so no read-back is needed
+                result = await self.collection.insert_one(course)
+            course["_id"] = str(result.inserted_id)
+            return course
         except Exception as e:
             print(f"Error creating course: {str(e)}")
             raise ValueError(f"Failed to create course: {str(e)}")
 
-    def update_course(self, course_id: int, course_data: Dict) -> Optional[Dict]:
-        """Update a course by ID"""
+    async def update_course(self, course_id: int, course_data: Dict, expected_version: Optional[int] = None) -> Optional[Dict]:
+        """Update a course by ID, optionally only if it is still at `expected_version`"""
         try:
-            # Check if course exists
-            existing_course = self.get_course_by_id(course_id)
-            if not existing_course:
+            # Update and read back the course in one round-trip
+            async with self.sync.reserve("courses") as seqs:
+                course_data[SEQ_FIELD] = seqs.start
+                updated_course = await update_versioned(
+                    self.collection, {"id": course_id}, course_data, expected_version, label=f"Course {course_id}"
+                )
+            if not updated_course:
                 return None
-
-            # Update course in database
-            update_result = self.collection.update_one(
-                {"id": course_id},
-                {"$set": course_data}
-            )
-
-            if update_result.modified_count == 0:
-                return None
-
-            # Get updated course
-            updated_course = self.get_course_by_id(course_id)
+            updated_course["_id"] = str(updated_course["_id"])
             return updated_course
+        except ConflictError:
+            raise
         except Exception as e:
             print(f"Error updating course: {str(e)}")
             raise ValueError(f"Failed to update course: {str(e)}")
 
-    def delete_course(self, course_id: int) -> bool:
-        """Delete a course by ID"""
+    async def delete_course(self, course_id: int, expected_version: Optional[int] = None) -> bool:
+        """Delete a course by ID, optionally only if it is still at `expected_version`"""
         try:
-            # Check if course exists
-            existing_course = self.get_course_by_id(course_id)
-            if not existing_course:
-                return False
-
-            # Delete course from database
-            result = self.collection.delete_one({"id": course_id})
-            return result.deleted_count > 0
+            async with self.sync.reserve("courses") as seqs:
+                deleted = await delete_versioned(self.collection, {"id": course_id}, expected_version, label=f"Course {course_id}")
+                if deleted:
+                    await self.sync.record_deletes("courses", [(course_id, seqs.start)])
+            return deleted
+        except ConflictError:
+            raise
         except Exception as e:
             print(f"Error deleting course: {str(e)}")
-            raise ValueError(f"Failed to delete course: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to delete course: {str(e)}")
+
+    async def create_courses_bulk(self, courses: List[Tuple[int, Dict]]) -> List[Dict]:
+        """Create many courses with one id reservation and one unordered insert_many"""
+        ids = await self.counters.reserve_ids("courses", len(courses))
+        docs = []
+        async with self.sync.reserve("courses", len(courses)) as seqs:
+            for (_, course_data), course_id, seq in zip(courses, ids, seqs):
+                course = {
+                    "id": course_id,
+                    "name": course_data["name"],
+                    "subjects": course_data["subjects"],
+                    VERSION_FIELD: INITIAL_VERSION,
+                    SEQ_FIELD: seq
+                }
+                docs.append(course)
+            results = await insert_batch(self.collection, [index for index, _ in courses], docs)
+        return results
+
+    async def update_courses_bulk(self, updates: List[PlannedUpdate]) -> List[Dict]:
+        """Apply many course updates with one unordered bulk_write"""
+        async with self.sync.reserve("courses", len(updates)) as seqs:
+            for (_, _, course_data, _), seq in zip(updates, seqs):
+                course_data[SEQ_FIELD] = seq
+            results = await update_batch(self.collection, updates, label="Course")
+        return results
+
+    async def delete_courses_bulk(self, deletes: List[PlannedDelete]) -> List[Dict]:
+        """Delete many courses with one unordered bulk_write"""
+        async with self.sync.reserve("courses", len(deletes)) as seqs:
+            results = await delete_batch(self.collection, deletes, label="Course")
+            await self.sync.record_deletes("courses", deleted_seqs(deletes, seqs, results))
+        return results
@@ -1,17 +1,58 @@
-from app.connection.connection import MongoDBConnection
-from typing import List, Optional, Dict
+from app.connection.connection import AsyncMongoDBConnection
+from app.controller.counter_controller import CounterController
+from app.controller.sync_controller import SEQ_FIELD, SyncController, deleted_seqs
+from app.controller.grade_stats_controller import GradeStatsController
+from app.controller.reference_cache import reference_cache
+from app.utils.bulk import PlannedDelete, PlannedUpdate, any_applied, delete_batch, insert_batch, read_current, update_batch
+from app.utils.concurrency import INITIAL_VERSION, VERSION_FIELD, delete_versioned_returning, update_versioned
+from app.utils.document_query import DocumentQuery
+from app.utils.errors import ConflictError
+from app.utils.grade_stats import TRACKED_FIELDS
+from app.utils.lookup import in_request_order, object_ids, with_mongo_id
+from app.utils.pagination import keyset_filter
+from app.utils.projection import apply_projection, to_projection
+from app.utils.search import SearchPosition, text_search_pipeline
+from app.utils.streaming import STREAM_BATCH_SIZE
+from app.utils.slow_ops import traced
+from app.utils.timing import timed
+from typing import Any, AsyncIterator, List, Optional, Dict, Tuple
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument
 
+# References that ?expand= can resolve, and the document field each one is stored in
+REFERENCE_FIELDS = {"teacher": "teacher_id", "subject": "subject_id", "owner": "owner"}
+USER_SUMMARY_FIELDS = ("_id", "id", "name", "email", "type")
+SUBJECT_SUMMARY_FIELDS = ("_id", "id", "name")
+# Fields of a document returned as a search hit
+SEARCH_HIT_FIELDS = ("_id", "id", "title", "type", "teacher_id", "subject_id", "upload_date")
+
+def _summary(record: Optional[Dict], keys) -> Optional[Dict]:
+    """The embedded summary of a referenced record (None if the reference is dangling)"""
+    if not record:
+        return None
+    summary = {key: record[key] for key in keys if key in record}
+    if "_id" in summary:
+        summary["_id"] = str(summary["_id"])
+    return summary
+
+@timed("db")
+@traced
 class DocumentController:
     def __init__(self):
-        self.db = MongoDBConnection().get_database()
+        self.db = AsyncMongoDBConnection().get_database()
         self.collection = self.db.documents
+        self.counters = CounterController()
+        self.sync = SyncController()
+        self.grade_stats = GradeStatsController()
 
-    def get_all_documents(self) -> List[Dict]:
-        """Get all documents from the database"""
-        documents = list(self.collection.find())
-        print(f"Total documents in database: {len(documents)}")  # Debug print
+    async def get_all_documents(self, query: DocumentQuery, limit: Optional[int] = None, after: Optional[Tuple[Any, int]] = None,
+                                fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get the documents matching a query, in its sort order"""
+        mongo_filter = query.filter()
+        if mongo_filter is None:
+            return []
+        documents = await self.collection.find(query.keyset(mongo_filter, after), to_projection(fields)).sort(query.mongo_sort()).limit(limit or 0).to_list(length=None)
         # Convert ObjectId to string for _id and owner fields
         for doc in documents:
             if '_id' in doc:
@@ -20,9 +61,23 @@ class DocumentController:
                 doc['owner'] = str(doc['owner'])
         return documents
 
-    def get_document_by_id(self, id: int) -> Optional[Dict]:
+    async def stream_documents(self, query: DocumentQuery, after: Optional[Tuple[Any, int]] = None,
+                               fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Yield the documents matching a query one by one, reading the cursor in batches"""
+        mongo_filter = query.filter()
+        if mongo_filter is None:
+            return
+        cursor = self.collection.find(query.keyset(mongo_filter, after), to_projection(fields)).sort(query.mongo_sort()).batch_size(STREAM_BATCH_SIZE)
+        async for doc in cursor:
+            if '_id' in doc:
+                doc['_id'] = str(doc['_id'])
+            if 'owner' in doc and isinstance(doc['owner'], ObjectId):
+                doc['owner'] = str(doc['owner'])
+            yield doc
+
+    async def get_document_by_id(self, id: int, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get a document by its ID"""
-        document = self.collection.find_one({"id": id})
+        document = await self.collection.find_one({"id": id}, to_projection(fields))
         if document:
             if '_id' in document:
                 document['_id'] = str(document['_id'])
@@ -30,9 +85,106 @@ class DocumentController:
                 document['owner'] = str(document['owner'])
         return document
 
-    def get_documents_by_type(self, type: str) -> List[Dict]:
+    async def get_document_expanded(self, id: int, expand: List[str], fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """Get a document with its teacher and owner joined in by $lookup, in one aggregation"""
+        pipeline = [{"$match": {"id": id}}, {"$limit": 1}]
+        if fields:
+            pipeline.append({"$project": to_projection(fields)})
+        if "teacher" in expand:
+            pipeline.append({"$lookup": {"from": "users", "localField": "teacher_id", "foreignField": "id", "as": "_teacher"}})
+        if "owner" in expand:
+            pipeline.append({"$lookup": {"from": "users", "localField": "owner", "foreignField": "_id", "as": "_owner"}})
+        documents = await self.collection.aggregate(pipeline).to_list(length=1)
+        if not documents:
+            return None
+        document = documents[0]
+        joined = {name: document.pop(f"_{name}", None) or [None] for name in ("teacher", "owner")}
+        expanded = {}
+        for name in REFERENCE_FIELDS:
+            if name not in expand:
+                continue
+            if name == "subject":
+                # Subjects are already in memory; no need to join them
+                snapshot = await reference_cache.get()
+                expanded[name] = _summary(snapshot.subjects_by_id.get(document.get("subject_id")), SUBJECT_SUMMARY_FIELDS)
+            else:
+                expanded[name] = _summary(joined[name][0], USER_SUMMARY_FIELDS)
+        if '_id' in document:
+            document['_id'] = str(document['_id'])
+        if isinstance(document.get("owner"), ObjectId):
+            document["owner"] = str(document["owner"])
+        document["expanded"] = expanded
+        return document
+
+    async def expand_documents(self, documents: List[Dict], expand: List[str]) -> List[Dict]:
+        """Attach `expanded` summaries to already-loaded documents.
+
+        Teachers and owners of the whole list come from one users query with
+        $in on both keys, subjects from the reference snapshot, so the cost
+        does not grow with the number of documents.
+        """
+        teacher_ids = {doc["teacher_id"] for doc in documents if "teacher" in expand and doc.get("teacher_id") is not None}
+        owner_ids = {doc["owner"] for doc in documents if "owner" in expand and ObjectId.is_valid(doc.get("owner") or "")}
+        clauses = []
+        if teacher_ids:
+            clauses.append({"id": {"$in": list(teacher_ids)}})
+        if owner_ids:
+            clauses.append({"_id": {"$in": [ObjectId(owner) for owner in owner_ids]}})
+        users_by_id, users_by_mongo_id = {}, {}
+        if clauses:
+            projection = {field: 1 for field in USER_SUMMARY_FIELDS}
+            async for user in self.db.users.find({"$or": clauses}, projection):
+                users_by_id[user.get("id")] = user
+                users_by_mongo_id[str(user["_id"])] = user
+        subjects_by_id = (await reference_cache.get()).subjects_by_id if "subject" in expand else {}
+
+        for doc in documents:
+            expanded = {}
+            if "teacher" in expand:
+                expanded["teacher"] = _summary(users_by_id.get(doc.get("teacher_id")), USER_SUMMARY_FIELDS)
+            if "subject" in expand:
+                expanded["subject"] = _summary(subjects_by_id.get(doc.get("subject_id")), SUBJECT_SUMMARY_FIELDS)
+            if "owner" in expand:
+                expanded["owner"] = _summary(users_by_mongo_id.get(doc.get("owner")), USER_SUMMARY_FIELDS)
+            doc["expanded"] = expanded
+        return documents
+
+    async def get_documents_by_ids(self, ids: List[int], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get documents by ID with one $in query, in the order asked for (None where missing)"""
+        documents = await self.collection.find({"id": {"$in": ids}}, to_projection(fields)).to_list(length=None)
+        for document in documents:
+            if '_id' in document:
+                document['_id'] = str(document['_id'])
+            if isinstance(document.get("owner"), ObjectId):
+                document["owner"] = str(document["owner"])
+        return in_request_order(documents, ids)
+
+    async def get_documents_by_mongo_ids(self, mongo_ids: List[str], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get documents by MongoDB _id with one $in query, in the order asked for (None where missing)"""
+        documents = await self.collection.find({"_id": {"$in": object_ids(mongo_ids)}}, to_projection(with_mongo_id(fields))).to_list(length=None)
+        for document in documents:
+            document['_id'] = str(document['_id'])
+            if isinstance(document.get("owner"), ObjectId):
+                document["owner"] = str(document["owner"])
+        return [apply_projection(document, fields) if document else None for document in in_request_order(documents, mongo_ids, key="_id")]
+
+    async def search_documents(self, text: str, type: Optional[str] = None, subject_id: Optional[int] = None,
+                               after: Optional[SearchPosition] = None, limit: int = 20) -> List[Dict]:
+        """Documents whose title matches a text search, most relevant first"""
+        query = {}
+        if type is not None:
+            query["type"] = type
+        if subject_id is not None:
+            query["subject_id"] = subject_id
+        pipeline = text_search_pipeline(text, query, SEARCH_HIT_FIELDS, after, limit)
+        documents = await self.collection.aggregate(pipeline).to_list(length=None)
+        for doc in documents:
+            doc['_id'] = str(doc['_id'])
+        return documents
+
+    async def get_documents_by_type(self, type: str, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all documents of a specific type"""
-        documents = list(self.collection.find({"type": type}))
+        documents = await self.collection.find(keyset_filter({"type": type}, after), to_projection(fields)).sort("id", 1).limit(limit or 0).to_list(length=None)
         for doc in documents:
             if '_id' in doc:
                 doc['_id'] = str(doc['_id'])
@@ -40,9 +192,9 @@ class DocumentController:
                 doc['owner'] = str(doc['owner'])
         return documents
 
-    def get_documents_by_teacher(self, teacher_id: int) -> List[Dict]:
+    async def get_documents_by_teacher(self, teacher_id: int, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all documents created by a specific teacher"""
-        documents = list(self.collection.find({"teacher_id": teacher_id}))
+        documents = await self.collection.find(keyset_filter({"teacher_id": teacher_id}, after), to_projection(fields)).sort("id", 1).limit(limit or 0).to_list(length=None)
         for doc in documents:
             if '_id' in doc:
                 doc['_id'] = str(doc['_id'])
@@ -50,9 +202,9 @@ class DocumentController:
                 doc['owner'] = str(doc['owner'])
         return documents
 
-    def get_documents_by_subject(self, subject_id: int) -> List[Dict]:
+    async def get_documents_by_subject(self, subject_id: int, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all documents related to a specific subject"""
-        documents = list(self.collection.find({"subject_id": subject_id}))
+        documents = await self.collection.find(keyset_filter({"subject_id": subject_id}, after), to_projection(fields)).sort("id", 1).limit(limit or 0).to_list(length=None)
         for doc in documents:
             if '_id' in doc:
                 doc['_id'] = str(doc['_id'])
@@ -60,106 +212,157 @@ class DocumentController:
                 doc['owner'] = str(doc['owner'])
         return documents
 
-    def get_documents_by_owner(self, owner_id: str) -> List[Dict]:
-        """Get all documents owned by a specific user"""
-        try:
-            print(f"Searching for documents with owner_id: {owner_id}")  # Debug print
-            
-            # Convert string ID to ObjectId for query
-            owner_object_id = ObjectId(owner_id)
-            print(f"Converted to ObjectId: {owner_object_id}")  # Debug print
-            
-            # Search directly in documents collection by owner field
-            documents = list(self.collection.find({"owner": owner_object_id}))
-            print(f"Found {len(documents)} documents")  # Debug print
-            
-            # Convert ObjectId to string in response
-            for doc in documents:
-                if '_id' in doc:
-                    doc['_id'] = str(doc['_id'])
-                if 'owner' in doc and isinstance(doc['owner'], ObjectId):
-                    doc['owner'] = str(doc['owner'])
-            return documents
-        except Exception as e:
-            print(f"Error searching for documents by owner: {str(e)}")
+    async def get_documents_by_owner(self, owner_id: str, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all documents owned by a specific user (none for an id that is not an ObjectId)"""
+        if not ObjectId.is_valid(owner_id):
             return []
+        documents = await self.collection.find(keyset_filter({"owner": ObjectId(owner_id)}, after), to_projection(fields)).sort("id", 1).limit(limit or 0).to_list(length=None)
+        for doc in documents:
+            if '_id' in doc:
+                doc['_id'] = str(doc['_id'])
+            if 'owner' in doc and isinstance(doc['owner'], ObjectId):
+                doc['owner'] = str(doc['owner'])
+        return documents
 
-    def create_document(self, document_data: Dict) -> Dict:
+    async def create_document(self, document_data: Dict) -> Dict:
         """Create a new document in the database"""
         try:
             # Get the next available ID
-            last_document = self.collection.find_one(sort=[("id", -1)])
-            next_id = 1 if not last_document else last_document["id"] + 1
-
-            # Prepare document data
-            document = {
-                "id": next_id,
-                "title": document_data["title"],
-                "file_url": document_data["file_url"],
-                "type": document_data["type"],
-                "grade": document_data.get("grade"),
-                "teacher_id": document_data["teacher_id"],
-                "subject_id": document_data["subject_id"],
-                "owner": ObjectId(document_data["owner"]),
-                "upload_date": datetime.utcnow()
-            }
-
-            # Insert document into database
-            result = self.collection.insert_one(document)
-            
-            # Get the created document
-            created_document = self.collection.find_one({"_id": result.inserted_id})
-            
-            # Convert ObjectId to string for response
-            if created_document:
-                created_document["_id"] = str(created_document["_id"])
-                if "owner" in created_document and isinstance(created_document["owner"], ObjectId):
-                    created_document["owner"] = str(created_document["owner"])
-            
-            return created_document
+            next_id = await self.counters.next_id("documents")
+
+            async with self.sync.reserve("documents") as seqs:
+                # Prepare document data
+                document = {
+                    "id": next_id,
+                    "title": document_data["title"],
+                    "file_url": document_data["file_url"],
+                    "type": document_data["type"],
+                    "grade": document_data.get("grade"),
+                    "teacher_id": document_data["teacher_id"],
+                    "subject_id": document_data["subject_id"],
+                    "owner": ObjectId(document_data["owner"]),
+                    "upload_date": datetime.utcnow(),
+                    VERSION_FIELD: INITIAL_VERSION,
+                    SEQ_FIELD: seqs.start
+                }
+
+                # Insert document into database; insert_one fills in _id, so no read-back is needed
+                result = await self.collection.insert_one(document)
+                await self.grade_stats.record(None, document)
+
+            # Convert ObjectIds to string for response
+            document["_id"] = str(result.inserted_id)
+            document["owner"] = str(document["owner"])
+            return document
         except Exception as e:
             print(f"Error creating document: {str(e)}")
             raise ValueError(f"Failed to create document: {str(e)}")
 
-    def update_document(self, document_id: int, document_data: Dict) -> Optional[Dict]:
-        """Update a document by ID"""
+    async def update_document(self, document_id: int, document_data: Dict, expected_version: Optional[int] = None) -> Optional[Dict]:
+        """Update a document by ID, optionally only if it is still at `expected_version`"""
         try:
-            # Check if document exists
-            existing_document = self.get_document_by_id(document_id)
-            if not existing_document:
-                return None
-
             # Convert owner string to ObjectId if it's being updated
             if "owner" in document_data:
                 document_data["owner"] = ObjectId(document_data["owner"])
 
-            # Update document in database
-            update_result = self.collection.update_one(
-                {"id": document_id},
-                {"$set": document_data}
-            )
-
-            if update_result.modified_count == 0:
-                return None
+            # Update in one round-trip, reading the document as it was before so the
+            # grade summaries can be moved; the updated one follows from the changes
+            async with self.sync.reserve("documents") as seqs:
+                document_data[SEQ_FIELD] = seqs.start
+                previous = await update_versioned(
+                    self.collection, {"id": document_id}, document_data, expected_version,
+                    label=f"Document {document_id}", return_document=ReturnDocument.BEFORE
+                )
+                if not previous:
+                    return None
+                updated_document = {**previous, **document_data, VERSION_FIELD: (previous.get(VERSION_FIELD) or 0) + 1}
+                await self.grade_stats.record(previous, updated_document)
 
-            # Get updated document
-            updated_document = self.get_document_by_id(document_id)
+            updated_document["_id"] = str(updated_document["_id"])
+            if isinstance(updated_document.get("owner"), ObjectId):
+                updated_document["owner"] = str(updated_document["owner"])
             return updated_document
+        except ConflictError:
+            raise
         except Exception as e:
             print(f"Error updating document: {str(e)}")
             raise ValueError(f"Failed to update document: {str(e)}")
 
-    def delete_document(self, document_id: int) -> bool:
-        """Delete a document by ID"""
+    async def delete_document(self, document_id: int, expected_version: Optional[int] = None) -> bool:
+        """Delete a document by ID, optionally only if it is still at `expected_version`"""
         try:
-            # Check if document exists
-            existing_document = self.get_document_by_id(document_id)
-            if not existing_document:
-                return False
-
-            # Delete document from database
-            result = self.collection.delete_one({"id": document_id})
-            return result.deleted_count > 0
+            async with self.sync.reserve("documents") as seqs:
+                deleted = await delete_versioned_returning(
+                    self.collection, {"id": document_id}, expected_version,
+                    label=f"Document {document_id}", projection={field: 1 for field in TRACKED_FIELDS}
+                )
+                if not deleted:
+                    return False
+                await self.sync.record_deletes("documents", [(document_id, seqs.start)])
+                await self.grade_stats.record(deleted, None)
+            return True
+        except ConflictError:
+            raise
         except Exception as e:
             print(f"Error deleting document: {str(e)}")
-            raise ValueError(f"Failed to delete document: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to delete document: {str(e)}")
+
+    async def create_documents_bulk(self, documents: List[Tuple[int, Dict]]) -> List[Dict]:
+        """Create many documents with one id reservation and one unordered insert_many"""
+        ids = await self.counters.reserve_ids("documents", len(documents))
+        upload_date = datetime.utcnow()
+        docs = []
+        async with self.sync.reserve("documents", len(documents)) as seqs:
+            for (_, document_data), document_id, seq in zip(documents, ids, seqs):
+                document = {
+                    "id": document_id,
+                    "title": document_data["title"],
+                    "file_url": document_data["file_url"],
+                    "type": document_data["type"],
+                    "grade": document_data.get("grade"),
+                    "teacher_id": document_data["teacher_id"],
+                    "subject_id": document_data["subject_id"],
+                    "owner": ObjectId(document_data["owner"]),
+                    "upload_date": upload_date,
+                    VERSION_FIELD: INITIAL_VERSION,
+                    SEQ_FIELD: seq
+                }
+                docs.append(document)
+            results = await insert_batch(self.collection, [index for index, _ in documents], docs)
+            if any_applied(results):
+                await self.grade_stats.record_many(
+                    (None, document) for document, result in zip(docs, results) if result["status"] == "created"
+                )
+        return results
+
+    async def update_documents_bulk(self, updates: List[PlannedUpdate]) -> List[Dict]:
+        """Apply many document updates with one unordered bulk_write"""
+        for _, _, document_data, _ in updates:
+            if "owner" in document_data:
+                document_data["owner"] = ObjectId(document_data["owner"])
+        # Read the grade fields along with the versions: the guarded writes only
+        # apply to documents still in exactly this state
+        current = await read_current(self.collection, [id for _, id, _, _ in updates], TRACKED_FIELDS)
+        async with self.sync.reserve("documents", len(updates)) as seqs:
+            for (_, _, document_data, _), seq in zip(updates, seqs):
+                document_data[SEQ_FIELD] = seq
+            results = await update_batch(self.collection, updates, label="Document", current=current)
+            if any_applied(results):
+                changes = {index: document_data for index, _, document_data, _ in updates}
+                await self.grade_stats.record_many(
+                    (current[result["id"]], {**current[result["id"]], **changes[result["index"]]})
+                    for result in results if result["status"] == "updated"
+                )
+        return results
+
+    async def delete_documents_bulk(self, deletes: List[PlannedDelete]) -> List[Dict]:
+        """Delete many documents with one unordered bulk_write"""
+        current = await read_current(self.collection, [id for _, id, _ in deletes], TRACKED_FIELDS)
+        async with self.sync.reserve("documents", len(deletes)) as seqs:
+            results = await delete_batch(self.collection, deletes, label="Document", current=current)
+            await self.sync.record_deletes("documents", deleted_seqs(deletes, seqs, results))
+            if any_applied(results):
+                await self.grade_stats.record_many(
+                    (current[result["id"]], None) for result in results if result["status"] == "deleted"
+                )
+        return results
@@ -0,0 +1,108 @@
+from app.connection.connection import AsyncMongoDBConnection
+from app.utils.grade_stats import GRADE_DIMENSIONS, OVERALL, deltas, summary_id, summary_pipeline
+from app.utils.slow_ops import traced
+from app.utils.timing import timed
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+
+
+# A summary no document contributes to any more ($inc leaves such counters at 0)
+EMPTY_SUMMARY = {"count": {"$not": {"$gt": 0}}, "ungraded": {"$not": {"$gt": 0}}}
+
+
+@timed("db")
+@traced
+class GradeStatsController:
+    """Keeps the grade_stats collection: one running summary of document grades
+    per subject, teacher, document type and overall.
+
+    DocumentController reports every write here as (before, after) pairs, and
+    the counters are moved with $inc, so reading analytics never scans the
+    documents collection. The summaries are written after the document
+    itself but before its change is released, so the ETag only moves once
+    they are current; if that second write fails they drift until `rebuild`
+    is run (python -m app.connection.migrations --rebuild-grade-stats).
+    """
+
+    def __init__(self):
+        self.db = AsyncMongoDBConnection().get_database()
+        self.collection = self.db.grade_stats
+
+    async def record(self, before: Optional[Dict], after: Optional[Dict]):
+        """Move the summaries from one version of a document to the next (None for create/delete)"""
+        await self.record_many([(before, after)])
+
+    async def record_many(self, changes: Iterable[Tuple[Optional[Dict], Optional[Dict]]]):
+        """Apply many document changes to the summaries with one unordered bulk_write.
+
+        When documents left a summary, those that now count nothing are
+        deleted, so a subject or teacher without documents drops out of the
+        listings. The filter is checked per summary at delete time, so one
+        that a concurrent write has just added to is kept.
+        """
+        try:
+            changed = deltas(changes)
+            ops = [
+                UpdateOne(
+                    {"_id": summary_id(dimension, key)},
+                    {"$inc": counters, "$setOnInsert": {"dimension": dimension, "key": key}},
+                    upsert=True
+                )
+                for (dimension, key), counters in changed.items()
+            ]
+            if not ops:
+                return
+            shrunk = [summary_id(dimension, key) for (dimension, key), counters in changed.items()
+                      if any(value < 0 for value in counters.values())]
+            await self.collection.bulk_write(ops, ordered=False)
+            if shrunk:
+                await self.collection.delete_many({"_id": {"$in": shrunk}, **EMPTY_SUMMARY})
+        except Exception as e:
+            # The document write already succeeded; report the drift rather than fail it
+            print(f"Error updating grade stats (rebuild them to resync): {str(e)}")
+
+    async def get_summary(self, dimension: str, key) -> Optional[Dict]:
+        """The stored summary of one subject, teacher, type or overall"""
+        return await self.collection.find_one({"_id": summary_id(dimension, key)})
+
+    async def get_summaries(self, dimension: str, keys: Optional[List] = None) -> List[Dict]:
+        """Stored summaries of a dimension (optionally only some keys), in key order"""
+        query = {"dimension": dimension}
+        if keys is not None:
+            query["key"] = {"$in": keys}
+        return await self.collection.find(query).sort("key", 1).to_list(length=None)
+
+    async def rebuild(self) -> Dict:
+        """Recompute every summary from the documents collection.
+
+        Each dimension is one aggregation run by the server (see
+        `summary_pipeline`), all of them at once, so only the summaries come
+        back. They are replaced in place and stale ones removed afterwards,
+        so readers never see an empty collection.
+        """
+        dimensions = [(OVERALL[0], None)] + list(GRADE_DIMENSIONS.items())
+        runs = await asyncio.gather(*[
+            self.db.documents.aggregate(summary_pipeline(field), allowDiskUse=True).to_list(length=None)
+            for _, field in dimensions
+        ])
+        summaries = {
+            summary_id(dimension, row["_id"]): {"dimension": dimension, "key": row["_id"], **_summary(row)}
+            for (dimension, _), rows in zip(dimensions, runs) for row in rows
+        }
+        ops = [ReplaceOne({"_id": _id}, summary, upsert=True) for _id, summary in summaries.items()]
+        ops.append(DeleteMany({"_id": {"$nin": list(summaries)}}))
+        await self.collection.bulk_write(ops, ordered=True)
+        overall = summaries.get(summary_id(*OVERALL), {})
+        return {"summaries": len(summaries), "documents": int(overall.get("count", 0) + overall.get("ungraded", 0))}
+
+    async def is_empty(self) -> bool:
+        """Whether no summary has been stored yet"""
+        return await self.collection.find_one({}, {"_id": 1}) is None
+
+
+def _summary(row: Dict) -> Dict:
+    """Stored form of one row of `summary_pipeline`: the counters, with the histogram keyed by bucket"""
+    # $floor keeps a double grade a double; bucket names are whole numbers, as in contributions()
+    histogram = {str(int(entry["bucket"])): entry["n"] for entry in row["histogram"] if entry["bucket"] is not None and entry["n"]}
+    return {**{counter: row[counter] for counter in ("count", "sum", "sum_sq", "ungraded")}, "histogram": histogram}
@@ -0,0 +1,130 @@
+from app.connection.connection import AsyncMongoDBConnection
+from app.controller.sync_controller import SyncController
+from app.utils.projection import apply_projection
+from app.utils.versions import Versions, covers, request_versions
+from app.utils.slow_ops import traced
+from app.utils.timing import phase
+from typing import Dict, List, Optional
+import asyncio
+import os
+import time
+
+# Longest a snapshot is served before it is reloaded, even if the versions say
+# it is current (a write that bypassed SyncController does not move them)
+REFERENCE_CACHE_TTL_SECONDS = float(os.getenv("REFERENCE_CACHE_TTL_SECONDS", "60"))
+REFERENCE_COLLECTIONS = ("subjects", "courses")
+
+
+class ReferenceSnapshot:
+    """Immutable copy of the subjects and courses collections with lookup indexes"""
+
+    def __init__(self, subjects: List[Dict], courses: List[Dict], versions: Versions):
+        self.subjects = sorted(subjects, key=lambda subject: subject["id"])
+        self.courses = sorted(courses, key=lambda course: course["id"])
+        self.subjects_by_id = {subject["id"]: subject for subject in self.subjects}
+        self.courses_by_id = {course["id"]: course for course in self.courses}
+        self.subjects_by_mongo_id = {subject["_id"]: subject for subject in self.subjects}
+        self.courses_by_mongo_id = {course["_id"]: course for course in self.courses}
+        self.courses_by_subject: Dict[int, List[Dict]] = {}
+        for course in self.courses:
+            for subject_id in set(course.get("subjects", [])):
+                self.courses_by_subject.setdefault(subject_id, []).append(course)
+        self.versions = versions
+        self.loaded_at = time.monotonic()
+
+    def subjects_of_course(self, course_id: int) -> Optional[List[Dict]]:
+        """Subjects listed on a course, in id order (None if the course does not exist)"""
+        course = self.courses_by_id.get(course_id)
+        if course is None:
+            return None
+        ids = sorted(set(course.get("subjects", [])))
+        return [self.subjects_by_id[id] for id in ids if id in self.subjects_by_id]
+
+    @staticmethod
+    def pick(index: Dict, keys: List, fields: Optional[List[str]]) -> List[Optional[Dict]]:
+        """Look up each key in one of the indexes, in request order, None where missing"""
+        return [apply_projection(index[key], fields) if key in index else None for key in keys]
+
+    @staticmethod
+    def page(items: List[Dict], after: Optional[int], limit: Optional[int], fields: Optional[List[str]]) -> List[Dict]:
+        """Keyset-paginate and project id-ordered records the same way the Mongo queries do"""
+        rows = [item for item in items if after is None or item["id"] > after]
+        if limit:
+            rows = rows[:limit]
+        return [apply_projection(row, fields) for row in rows]
+
+
+@traced
+class ReferenceDataCache:
+    """Serves subjects and courses from an in-memory snapshot.
+
+    The snapshot is tagged with the shared collection versions it was read
+    at and rebuilt on the first read asking for newer ones, whichever
+    process made the write, or once it is older than the TTL. A read asks
+    for the versions its request's ETag was built from, so a body is never
+    older than the tag it is sent with; outside a conditional GET the
+    versions are read from MongoDB.
+    """
+
+    def __init__(self, ttl: float = REFERENCE_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.sync = SyncController()
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self, snapshot: Optional[ReferenceSnapshot], versions: Versions) -> bool:
+        return (
+            snapshot is not None
+            and covers(snapshot.versions, versions, REFERENCE_COLLECTIONS)
+            and time.monotonic() - snapshot.loaded_at < self.ttl
+        )
+
+    async def get(self) -> ReferenceSnapshot:
+        """Current snapshot, reloading it from MongoDB first if it is older than the request's versions"""
+        versions = request_versions.get() or await self.sync.versions()
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, versions):
+            self.hits += 1
+            return snapshot
+        async with self._lock:
+            # Another request may have reloaded it while we waited for the lock
+            if self._is_fresh(self._snapshot, versions):
+                self.hits += 1
+                return self._snapshot
+            self.misses += 1
+            self._snapshot = await self._load()
+            return self._snapshot
+
+    def invalidate(self):
+        """Drop the snapshot so the next read reloads it"""
+        self._snapshot = None
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and the age of the current snapshot"""
+        snapshot = self._snapshot
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "subjects": len(snapshot.subjects) if snapshot else 0,
+            "courses": len(snapshot.courses) if snapshot else 0,
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 3) if snapshot else None,
+        }
+
+    async def _load(self) -> ReferenceSnapshot:
+        # Read the versions first: a write that lands during the load bumps them
+        # again, so this snapshot is already stale on the next read
+        versions = await self.sync.versions()
+        db = AsyncMongoDBConnection().get_database()
+        # Only the reload is database time; a hit never leaves the process
+        with phase("db"):
+            subjects = await db.subjects.find({}).to_list(length=None)
+            courses = await db.courses.find({}).to_list(length=None)
+        for doc in subjects + courses:
+            if '_id' in doc:
+                doc['_id'] = str(doc['_id'])
+        return ReferenceSnapshot(subjects, courses, versions)
+
+
+reference_cache = ReferenceDataCache()
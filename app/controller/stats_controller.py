@@ -0,0 +1,62 @@
+from app.connection.connection import AsyncMongoDBConnection
+from app.models.document import DOCUMENT_TYPES
+from app.models.user import USER_TYPES
+from app.utils.slow_ops import traced
+from app.utils.timing import timed
+from typing import Dict, Optional
+from datetime import datetime
+import asyncio
+import os
+import time
+
+# How long one set of counts is served before it is taken again
+STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "10"))
+COUNTED_COLLECTIONS = ("users", "courses", "subjects", "documents")
+
+
+@timed("db")
+@traced
+class StatsController:
+    """Collection counts for the dashboard, cached for a few seconds.
+
+    Totals come from estimated_document_count, which reads collection
+    metadata instead of scanning. The per-type breakdowns need a filter, so
+    they use count_documents, answered from the (type, id) indexes. All
+    queries run concurrently, and none of it grows with the size of the data
+    the way downloading the collections did.
+    """
+
+    def __init__(self, ttl: float = STATS_CACHE_TTL_SECONDS):
+        self.db = AsyncMongoDBConnection().get_database()
+        self.ttl = ttl
+        self._stats: Optional[Dict] = None
+        self._taken_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_stats(self) -> Dict:
+        """Current counts, taken again only once the cached ones are older than the TTL"""
+        if self._is_fresh():
+            return self._stats
+        async with self._lock:
+            # Another request may have refreshed them while we waited for the lock
+            if not self._is_fresh():
+                self._stats = await self._count()
+                self._taken_at = time.monotonic()
+            return self._stats
+
+    def _is_fresh(self) -> bool:
+        return self._stats is not None and time.monotonic() - self._taken_at < self.ttl
+
+    async def _count(self) -> Dict:
+        totals = [self.db[name].estimated_document_count() for name in COUNTED_COLLECTIONS]
+        users_by_type = [self.db.users.count_documents({"type": user_type}) for user_type in USER_TYPES]
+        documents_by_type = [self.db.documents.count_documents({"type": doc_type}) for doc_type in DOCUMENT_TYPES]
+        counts = await asyncio.gather(*totals, *users_by_type, *documents_by_type)
+
+        stats = dict(zip(COUNTED_COLLECTIONS, counts))
+        counts = counts[len(COUNTED_COLLECTIONS):]
+        stats["users_by_type"] = dict(zip(USER_TYPES, counts))
+        stats["documents_by_type"] = dict(zip(DOCUMENT_TYPES, counts[len(USER_TYPES):]))
+        stats["generated_at"] = datetime.utcnow()
+        stats["max_age_seconds"] = self.ttl
+        return stats
@@ -1,46 +1,96 @@
-from app.connection.connection import MongoDBConnection
-from typing import List, Optional, Dict
+from app.connection.connection import AsyncMongoDBConnection
+from app.controller.counter_controller import CounterController
+from app.controller.reference_cache import reference_cache
+from app.controller.sync_controller import SEQ_FIELD, SyncController, deleted_seqs
+from app.utils.bulk import PlannedDelete, PlannedUpdate, delete_batch, insert_batch, update_batch
+from app.utils.concurrency import INITIAL_VERSION, VERSION_FIELD, delete_versioned, update_versioned
+from app.utils.errors import ConflictError
+from app.utils.pagination import keyset_filter
+from app.utils.projection import apply_projection, to_projection
+from app.utils.search import SearchPosition, text_search_pipeline
+from app.utils.streaming import STREAM_BATCH_SIZE
+from app.utils.slow_ops import traced
+from app.utils.timing import timed
+from typing import AsyncIterator, List, Optional, Dict, Tuple
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
+# Fields of a subject returned as a search hit
+SEARCH_HIT_FIELDS = ("_id", "id", "name", "description")
+
+def _is_name_conflict(error: DuplicateKeyError) -> bool:
+    """Whether a duplicate-key error came from the unique index on subject names"""
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    return "name" in key_pattern or "name_1" in str(error)
+
+@timed("db")
+@traced
 class SubjectController:
     def __init__(self):
-        self.db = MongoDBConnection().get_database()
+        self.db = AsyncMongoDBConnection().get_database()
         self.collection = self.db.subjects
+        self.counters = CounterController()
+        self.sync = SyncController()
 
-    def get_all_subjects(self) -> List[Dict]:
-        """Get all subjects from the database"""
-        subjects = list(self.collection.find())
-        # Convert ObjectId to string for _id field
-        for subject in subjects:
+    async def get_all_subjects(self, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all subjects (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        return snapshot.page(snapshot.subjects, after, limit, fields)
+
+    async def stream_subjects(self, after: Optional[int] = None, course_id: Optional[int] = None,
+                              fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Yield matching subjects one by one, reading the cursor in batches"""
+        query = {}
+        if course_id is not None:
+            course = await self.db.courses.find_one({"id": course_id})
+            if not course:
+                return
+            query = {"id": {"$in": course.get('subjects', [])}}
+
+        cursor = self.collection.find(keyset_filter(query, after), to_projection(fields)).sort("id", 1).batch_size(STREAM_BATCH_SIZE)
+        async for subject in cursor:
             if '_id' in subject:
                 subject['_id'] = str(subject['_id'])
-        return subjects
+            yield subject
 
-    def get_subject_by_id(self, id: int) -> Optional[Dict]:
-        """Get a subject by its ID"""
-        subject = self.collection.find_one({"id": id})
-        if subject and '_id' in subject:
-            subject['_id'] = str(subject['_id'])
-        return subject
+    async def get_subject_by_id(self, id: int, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """Get a subject by its ID (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        subject = snapshot.subjects_by_id.get(id)
+        return apply_projection(subject, fields) if subject else None
+
+    async def get_subjects_by_ids(self, ids: List[int], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get subjects by ID, in the order asked for (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        return snapshot.pick(snapshot.subjects_by_id, ids, fields)
+
+    async def get_subjects_by_mongo_ids(self, mongo_ids: List[str], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get subjects by MongoDB _id, in the order asked for (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        return snapshot.pick(snapshot.subjects_by_mongo_id, mongo_ids, fields)
 
-    def get_subjects_by_course(self, course_id: int) -> List[Dict]:
-        """Get all subjects related to a specific course"""
-        # First get the course to get its subjects list
-        course = self.db.courses.find_one({"id": course_id})
-        if not course:
+    async def get_subjects_by_course(self, course_id: int, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all subjects related to a specific course (served from the reference data snapshot)"""
+        snapshot = await reference_cache.get()
+        subjects = snapshot.subjects_of_course(course_id)
+        if subjects is None:
             return []
-        
-        # Then get all subjects that are in the course's subjects list
-        subjects = list(self.collection.find({"id": {"$in": course.get('subjects', [])}}))
+        return snapshot.page(subjects, after, limit, fields)
+
+    async def search_subjects(self, text: str, subject_id: Optional[int] = None,
+                              after: Optional[SearchPosition] = None, limit: int = 20) -> List[Dict]:
+        """Subjects whose name or description matches a text search, most relevant first"""
+        query = {"id": subject_id} if subject_id is not None else {}
+        pipeline = text_search_pipeline(text, query, SEARCH_HIT_FIELDS, after, limit)
+        subjects = await self.collection.aggregate(pipeline).to_list(length=None)
         for subject in subjects:
-            if '_id' in subject:
-                subject['_id'] = str(subject['_id'])
+            subject['_id'] = str(subject['_id'])
         return subjects
 
-    def get_subject_by_mongo_id(self, mongo_id: str) -> Optional[Dict]:
+    async def get_subject_by_mongo_id(self, mongo_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get a subject by its MongoDB _id"""
         try:
-            subject = self.collection.find_one({"_id": ObjectId(mongo_id)})
+            subject = await self.collection.find_one({"_id": ObjectId(mongo_id)}, to_projection(fields))
             if subject and '_id' in subject:
                 subject['_id'] = str(subject['_id'])
             return subject
@@ -48,70 +98,106 @@ class SubjectController:
             print(f"Error searching for subject by MongoDB ID: {str(e)}")
             return None
 
-    def create_subject(self, subject_data: Dict) -> Dict:
+    async def create_subject(self, subject_data: Dict) -> Dict:
         """Create a new subject in the database"""
         try:
             # Get the next available ID
-            last_subject = self.collection.find_one(sort=[("id", -1)])
-            next_id = 1 if not last_subject else last_subject["id"] + 1
-
-            # Prepare subject data
-            subject = {
-                "id": next_id,
-                "name": subject_data["name"],
-                "description": subject_data["description"]
-            }
-
-            # Insert subject into database
-            result = self.collection.insert_one(subject)
-            
-            # Get the created subject
-            created_subject = self.collection.find_one({"_id": result.inserted_id})
-            
-            # Convert ObjectId to string for response
-            if created_subject and '_id' in created_subject:
-                created_subject["_id"] = str(created_subject["_id"])
-            
-            return created_subject
+            next_id = await self.counters.next_id("subjects")
+
+            async with self.sync.reserve("subjects") as seqs:
+                # Prepare subject data
+                subject = {
+                    "id": next_id,
+                    "name": subject_data["name"],
+                    "description": subject_data["description"],
+                    VERSION_FIELD: INITIAL_VERSION,
+                    SEQ_FIELD: seqs.start
+                }
+
+                # Insert subject into database; insert_one fills in _id, so no read-back is needed
+                result = await self.collection.insert_one(subject)
+            subject["_id"] = str(result.inserted_id)
+            return subject
+        except DuplicateKeyError as e:
+            if not _is_name_conflict(e):
+                raise ValueError(f"Failed to create subject: {str(e)}")
+            raise ConflictError(f"Subject {subject_data['name']} already exists")
         except Exception as e:
             print(f"Error creating subject: {str(e)}")
             raise ValueError(f"Failed to create subject: {str(e)}")
 
-    def update_subject(self, subject_id: int, subject_data: Dict) -> Optional[Dict]:
-        """Update a subject by ID"""
+    async def update_subject(self, subject_id: int, subject_data: Dict, expected_version: Optional[int] = None) -> Optional[Dict]:
+        """Update a subject by ID, optionally only if it is still at `expected_version`"""
         try:
-            # Check if subject exists
-            existing_subject = self.get_subject_by_id(subject_id)
-            if not existing_subject:
+            # Update and read back the subject in one round-trip
+            async with self.sync.reserve("subjects") as seqs:
+                subject_data[SEQ_FIELD] = seqs.start
+                updated_subject = await update_versioned(
+                    self.collection, {"id": subject_id}, subject_data, expected_version, label=f"Subject {subject_id}"
+                )
+            if not updated_subject:
                 return None
-
-            # Update subject in database
-            update_result = self.collection.update_one(
-                {"id": subject_id},
-                {"$set": subject_data}
-            )
-
-            if update_result.modified_count == 0:
-                return None
-
-            # Get updated subject
-            updated_subject = self.get_subject_by_id(subject_id)
+            updated_subject["_id"] = str(updated_subject["_id"])
             return updated_subject
+        except ConflictError:
+            raise
+        except DuplicateKeyError as e:
+            if not _is_name_conflict(e):
+                raise ValueError(f"Failed to update subject: {str(e)}")
+            raise ConflictError(f"Subject {subject_data['name']} already exists")
         except Exception as e:
             print(f"Error updating subject: {str(e)}")
             raise ValueError(f"Failed to update subject: {str(e)}")
 
-    def delete_subject(self, subject_id: int) -> bool:
-        """Delete a subject by ID"""
+    async def delete_subject(self, subject_id: int, expected_version: Optional[int] = None) -> bool:
+        """Delete a subject by ID, optionally only if it is still at `expected_version`"""
         try:
-            # Check if subject exists
-            existing_subject = self.get_subject_by_id(subject_id)
-            if not existing_subject:
-                return False
-
-            # Delete subject from database
-            result = self.collection.delete_one({"id": subject_id})
-            return result.deleted_count > 0
+            async with self.sync.reserve("subjects") as seqs:
+                deleted = await delete_versioned(self.collection, {"id": subject_id}, expected_version, label=f"Subject {subject_id}")
+                if deleted:
+                    await self.sync.record_deletes("subjects", [(subject_id, seqs.start)])
+            return deleted
+        except ConflictError:
+            raise
         except Exception as e:
             print(f"Error deleting subject: {str(e)}")
-            raise ValueError(f"Failed to delete subject: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to delete subject: {str(e)}")
+
+    async def create_subjects_bulk(self, subjects: List[Tuple[int, Dict]]) -> List[Dict]:
+        """Create many subjects with one id reservation and one unordered insert_many"""
+        ids = await self.counters.reserve_ids("subjects", len(subjects))
+        docs = []
+        async with self.sync.reserve("subjects", len(subjects)) as seqs:
+            for (_, subject_data), subject_id, seq in zip(subjects, ids, seqs):
+                subject = {
+                    "id": subject_id,
+                    "name": subject_data["name"],
+                    "description": subject_data["description"],
+                    VERSION_FIELD: INITIAL_VERSION,
+                    SEQ_FIELD: seq
+                }
+                docs.append(subject)
+            results = await insert_batch(self.collection, [index for index, _ in subjects], docs)
+        for result, subject in zip(results, docs):
+            if result["status"] == "conflict":
+                result["error"] = f"Subject {subject['name']} already exists"
+        return results
+
+    async def update_subjects_bulk(self, updates: List[PlannedUpdate]) -> List[Dict]:
+        """Apply many subject updates with one unordered bulk_write"""
+        async with self.sync.reserve("subjects", len(updates)) as seqs:
+            for (_, _, subject_data, _), seq in zip(updates, seqs):
+                subject_data[SEQ_FIELD] = seq
+            results = await update_batch(self.collection, updates, label="Subject")
+        names = {index: subject_data.get("name") for index, _, subject_data, _ in updates}
+        for result in results:
+            if result["status"] == "conflict" and result["error"].startswith("E11000"):
+                result["error"] = f"Subject {names[result['index']]} already exists"
+        return results
+
+    async def delete_subjects_bulk(self, deletes: List[PlannedDelete]) -> List[Dict]:
+        """Delete many subjects with one unordered bulk_write"""
+        async with self.sync.reserve("subjects", len(deletes)) as seqs:
+            results = await delete_batch(self.collection, deletes, label="Subject")
+            await self.sync.record_deletes("subjects", deleted_seqs(deletes, seqs, results))
+        return results
@@ -0,0 +1,176 @@
+from app.connection.connection import AsyncMongoDBConnection
+from app.utils.bulk import PlannedDelete
+from app.utils.slow_ops import traced
+from app.utils.timing import timed
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import os
+import uuid
+
+# Change sequence stamped on every record when it is created or updated, and on
+# the tombstone left when it is deleted. One sequence (a counter named after the
+# field) spans all synced collections, so a single number says how far a client is.
+SEQ_FIELD = "updated_seq"
+SYNC_COLLECTIONS = ("users", "documents", "subjects", "courses")
+TOMBSTONES = "tombstones"
+# Tombstones expire after this long; a sync token older than that has to start over
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+# Seconds after which a reservation that was never released (its process died
+# mid-write) stops holding back the sync horizon
+SYNC_PENDING_TIMEOUT_SECONDS = float(os.getenv("SYNC_PENDING_TIMEOUT_SECONDS", "60"))
+
+
+@timed("db")
+@traced
+class SyncController:
+    """Hands out change sequence numbers, reads changes by them and records tombstones for deletes.
+
+    The sequence is one document in the counters collection, shared by every
+    API process: `{"_id": "updated_seq", "seq": <last number>, "epoch": <id
+    of this counter's lifetime>, "pending": {<token>: {"start", "at"}},
+    "versions": {<collection>: <finished writes>}}`.
+
+    A number is taken before the write that carries it, so writes can commit
+    out of order: seq 8 may become visible before seq 7, and a reader that
+    moved past 8 would never see 7. Each reservation is therefore recorded
+    under `pending` by the same single update that takes it and removed by
+    one more once its write is done, and `horizon` stops short of the lowest
+    one still pending, whichever process made it. Releasing also bumps the
+    collection's entry in `versions`, which ETags are built from.
+    """
+
+    def __init__(self):
+        self.db = AsyncMongoDBConnection().get_database()
+        self.counters = self.db.counters
+        self.tombstones = self.db[TOMBSTONES]
+
+    @asynccontextmanager
+    async def reserve(self, collection: str, count: int = 1) -> AsyncIterator[range]:
+        """Reserve `count` consecutive numbers for the writes to `collection` made inside the block"""
+        token = uuid.uuid4().hex
+        seqs = await self._take(token, count)
+        try:
+            yield seqs
+        finally:
+            await self._release(token, collection)
+
+    async def _take(self, token: str, count: int) -> range:
+        """Move the sequence forward and record the numbers as pending, in one update.
+
+        A pipeline update reads the current number on the server, so no
+        writer ever waits on or retries against another. The same update
+        creates the document on first use and drops pending entries older
+        than SYNC_PENDING_TIMEOUT_SECONDS, which `horizon` already ignores,
+        so reservations of a process that died mid-write do not pile up.
+        """
+        if count < 1:
+            raise ValueError("Number of sequence numbers to reserve must be at least 1")
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=SYNC_PENDING_TIMEOUT_SECONDS)
+        last = {"$ifNull": ["$seq", 0]}
+        pipeline = [
+            {"$set": {
+                "seq": {"$add": [last, count]},
+                "epoch": {"$ifNull": ["$epoch", uuid.uuid4().hex[:12]]},
+                f"pending.{token}": {"start": {"$add": [last, 1]}, "at": now},
+            }},
+            {"$set": {"pending": {"$arrayToObject": {"$filter": {
+                "input": {"$objectToArray": "$pending"},
+                "cond": {"$gt": ["$$this.v.at", cutoff]},
+            }}}}},
+        ]
+        try:
+            state = await self.counters.find_one_and_update(
+                {"_id": SEQ_FIELD}, pipeline, projection={"seq": 1}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two first-time upserts raced; the document exists now, so this one updates it
+            state = await self.counters.find_one_and_update(
+                {"_id": SEQ_FIELD}, pipeline, projection={"seq": 1}, return_document=ReturnDocument.AFTER
+            )
+        last = state["seq"]
+        return range(last - count + 1, last + 1)
+
+    async def _release(self, token: str, collection: str):
+        await self.counters.update_one(
+            {"_id": SEQ_FIELD},
+            {"$unset": {f"pending.{token}": ""}, "$inc": {f"versions.{collection}": 1}},
+        )
+
+    async def state(self) -> Dict:
+        """The sequence document, created on first use"""
+        state = await self.counters.find_one({"_id": SEQ_FIELD})
+        if state is None:
+            try:
+                await self.counters.insert_one({"_id": SEQ_FIELD, "seq": 0, "epoch": uuid.uuid4().hex[:12],
+                                                "pending": {}, "versions": {}})
+            except DuplicateKeyError:
+                # Another process created it first
+                pass
+            state = await self.counters.find_one({"_id": SEQ_FIELD})
+        return state
+
+    async def versions(self) -> Tuple[Optional[str], Dict[str, int]]:
+        """The counter's epoch and finished writes per collection (None and {} before the first write)"""
+        state = await self.counters.find_one({"_id": SEQ_FIELD}, {"epoch": 1, "versions": 1})
+        if state is None:
+            return None, {}
+        return state.get("epoch"), state.get("versions") or {}
+
+    async def horizon(self) -> int:
+        """Highest number up to which every write, from any process, is visible"""
+        state = await self.state()
+        cutoff = datetime.utcnow() - timedelta(seconds=SYNC_PENDING_TIMEOUT_SECONDS)
+        held = [entry["start"] for entry in (state.get("pending") or {}).values() if entry["at"] > cutoff]
+        return min(state["seq"], min(held) - 1) if held else state["seq"]
+
+    async def record_deletes(self, collection: str, deleted: List[Tuple[int, int]]):
+        """Leave a tombstone for each (record id, seq) deleted from `collection`"""
+        if not deleted:
+            return
+        deleted_at = datetime.utcnow()
+        await self.tombstones.insert_many([
+            {"collection": collection, "id": id, SEQ_FIELD: seq, "deleted_at": deleted_at}
+            for id, seq in deleted
+        ], ordered=False)
+
+    async def changes_between(self, since: int, until: int, collections: List[str], limit: int,
+                              deletes: bool = True) -> List[Dict]:
+        """Up to `limit` changes with since < seq <= until across `collections`, lowest seq first.
+
+        Each change is `{"collection", "seq", "record"}` for a created or
+        updated record, or `{"collection", "seq", "id"}` for a deleted one.
+        Every source is read through its `updated_seq` index, at most `limit`
+        rows each, and the sorted runs are merged.
+        """
+        window = {SEQ_FIELD: {"$gt": since, "$lte": until}}
+
+        async def records(name: str) -> List[Dict]:
+            rows = await self.db[name].find(window).sort(SEQ_FIELD, 1).limit(limit).to_list(length=None)
+            changes = []
+            for row in rows:
+                row["_id"] = str(row["_id"])
+                changes.append({"collection": name, "seq": row[SEQ_FIELD], "record": row})
+            return changes
+
+        async def tombstones() -> List[Dict]:
+            query = {**window, "collection": {"$in": collections}}
+            rows = await self.tombstones.find(query, {"_id": 0, "deleted_at": 0}).sort(SEQ_FIELD, 1).limit(limit).to_list(length=None)
+            return [{"collection": row["collection"], "seq": row[SEQ_FIELD], "id": row["id"]} for row in rows]
+
+        sources = [records(name) for name in collections]
+        if deletes:
+            sources.append(tombstones())
+        runs = await asyncio.gather(*sources)
+        return list(heapq.merge(*runs, key=lambda change: change["seq"]))[:limit]
+
+
+def deleted_seqs(deletes: List[PlannedDelete], seqs: range, results: List[Dict]) -> List[Tuple[int, int]]:
+    """(record id, seq) of the items of a delete batch that were deleted, given one seq per planned delete"""
+    seq_of = {index: seq for (index, _, _), seq in zip(deletes, seqs)}
+    return [(result["id"], seq_of[result["index"]]) for result in results if result["status"] == "deleted"]
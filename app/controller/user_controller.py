@@ -1,110 +1,191 @@
-from app.connection.connection import MongoDBConnection
-from typing import List, Optional, Dict
+from app.connection.connection import AsyncMongoDBConnection
+from app.controller.counter_controller import CounterController
+from app.controller.sync_controller import SEQ_FIELD, SyncController, deleted_seqs
+from app.utils.bulk import PlannedDelete, PlannedUpdate, delete_batch, insert_batch, update_batch
+from app.utils.emails import NORMALIZED_EMAIL_FIELD, normalize_email
+from app.utils.concurrency import INITIAL_VERSION, VERSION_FIELD, delete_versioned, update_versioned
+from app.utils.errors import ConflictError
+from app.utils.lookup import in_request_order, object_ids, with_mongo_id
+from app.utils.pagination import keyset_filter
+from app.utils.projection import apply_projection, to_projection
+from app.utils.streaming import STREAM_BATCH_SIZE
+from app.utils.slow_ops import traced
+from app.utils.timing import timed
+from typing import AsyncIterator, List, Optional, Dict, Tuple
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
+def _is_email_conflict(error: DuplicateKeyError) -> bool:
+    """Whether a duplicate-key error came from one of the email unique indexes"""
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    return any(key.startswith("email") for key in key_pattern) or "email" in str(error)
+
+@timed("db")
+@traced
 class UserController:
     def __init__(self):
-        self.db_connection = MongoDBConnection()
+        self.db_connection = AsyncMongoDBConnection()
         self.collection = self.db_connection.get_collection('users')
+        self.counters = CounterController()
+        self.sync = SyncController()
 
-    def get_all_users(self) -> List[dict]:
+    async def get_all_users(self, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[dict]:
         """Get all users from the database"""
-        users = list(self.collection.find())
+        users = await self.collection.find(keyset_filter({}, after), to_projection(fields)).sort("id", 1).limit(limit or 0).to_list(length=None)
         # Convert ObjectId to string for _id field
         for user in users:
             if '_id' in user:
                 user['_id'] = str(user['_id'])
         return users
 
-    def get_user_by_id(self, user_id: int) -> Optional[dict]:
+    async def stream_users(self, after: Optional[int] = None, user_type: Optional[str] = None,
+                           fields: Optional[List[str]] = None) -> AsyncIterator[dict]:
+        """Yield matching users one by one, reading the cursor in batches"""
+        query = {"type": user_type} if user_type is not None else {}
+        cursor = self.collection.find(keyset_filter(query, after), to_projection(fields)).sort("id", 1).batch_size(STREAM_BATCH_SIZE)
+        async for user in cursor:
+            if '_id' in user:
+                user['_id'] = str(user['_id'])
+            yield user
+
+    async def get_user_by_id(self, user_id: int, fields: Optional[List[str]] = None) -> Optional[dict]:
         """Get a user by their ID"""
-        user = self.collection.find_one({"id": user_id})
+        user = await self.collection.find_one({"id": user_id}, to_projection(fields))
         if user and '_id' in user:
             user['_id'] = str(user['_id'])
         return user
 
-    def get_users_by_type(self, user_type: str) -> List[dict]:
+    async def get_users_by_ids(self, ids: List[int], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get users by ID with one $in query, in the order asked for (None where missing)"""
+        users = await self.collection.find({"id": {"$in": ids}}, to_projection(fields)).to_list(length=None)
+        for user in users:
+            if '_id' in user:
+                user['_id'] = str(user['_id'])
+        return in_request_order(users, ids)
+
+    async def get_users_by_mongo_ids(self, mongo_ids: List[str], fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get users by MongoDB _id with one $in query, in the order asked for (None where missing)"""
+        users = await self.collection.find({"_id": {"$in": object_ids(mongo_ids)}}, to_projection(with_mongo_id(fields))).to_list(length=None)
+        for user in users:
+            user['_id'] = str(user['_id'])
+        return [apply_projection(user, fields) if user else None for user in in_request_order(users, mongo_ids, key="_id")]
+
+    async def get_users_by_type(self, user_type: str, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[dict]:
         """Get all users of a specific type (teacher/student)"""
-        users = list(self.collection.find({"type": user_type}))
+        users = await self.collection.find(keyset_filter({"type": user_type}, after), to_projection(fields)).sort("id", 1).limit(limit or 0).to_list(length=None)
         for user in users:
             if '_id' in user:
                 user['_id'] = str(user['_id'])
         return users
 
-    def get_user_by_email(self, email: str) -> Optional[dict]:
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
         """Get a user by their email (case-insensitive)"""
-        # Convert email to lowercase for case-insensitive comparison
-        user = self.collection.find_one({"email": {"$regex": f"^{email}$", "$options": "i"}})
+        user = await self.collection.find_one({NORMALIZED_EMAIL_FIELD: normalize_email(email)})
         if user and '_id' in user:
             user['_id'] = str(user['_id'])
         return user
 
-    def get_next_id(self) -> int:
+    async def get_next_id(self) -> int:
         """Get the next available user ID"""
-        last_user = self.collection.find_one(sort=[("id", -1)])
-        return (last_user["id"] + 1) if last_user else 1
+        return await self.counters.next_id("users")
 
-    def create_user(self, user_data: Dict) -> dict:
+    async def create_user(self, user_data: Dict) -> dict:
         """Create a new user"""
-        # Check if email already exists (case-insensitive)
-        existing_user = self.get_user_by_email(user_data["email"])
-        if existing_user:
-            print(f"Email {user_data['email']} already exists in database")
-            raise ValueError(f"Email {user_data['email']} already registered")
-
-        # Add ID to user data
-        user_data["id"] = self.get_next_id()
-        
-        # Insert user into database
-        result = self.collection.insert_one(user_data)
-        
-        # Get the created user
-        created_user = self.collection.find_one({"_id": result.inserted_id})
-        if created_user and '_id' in created_user:
-            created_user['_id'] = str(created_user['_id'])
-        return created_user
-
-    def update_user(self, user_id: int, user_data: Dict) -> Optional[Dict]:
-        """Update a user by ID"""
-        try:
-            # Check if user exists
-            existing_user = self.get_user_by_id(user_id)
-            if not existing_user:
-                return None
+        # Add ID, initial version and the normalized email the unique index is on
+        user_data["id"] = await self.get_next_id()
+        user_data[VERSION_FIELD] = INITIAL_VERSION
+        user_data[NORMALIZED_EMAIL_FIELD] = normalize_email(user_data["email"])
 
-            # If email is being updated, check if it's already in use
-            if "email" in user_data and user_data["email"] != existing_user["email"]:
-                email_exists = self.get_user_by_email(user_data["email"])
-                if email_exists:
-                    raise ValueError(f"Email {user_data['email']} already registered")
+        # Insert user into database; the unique index rejects emails already
+        # registered (in any case), and insert_one fills in _id, so no read-back is needed
+        try:
+            async with self.sync.reserve("users") as seqs:
+                user_data[SEQ_FIELD] = seqs.start
+                result = await self.collection.insert_one(user_data)
+        except DuplicateKeyError as e:
+            if not _is_email_conflict(e):
+                raise
+            print(f"Email {user_data['email']} already exists in database")
+            raise ConflictError(f"Email {user_data['email']} already registered")
+        user_data['_id'] = str(result.inserted_id)
+        return user_data
 
-            # Update user in database
-            update_result = self.collection.update_one(
-                {"id": user_id},
-                {"$set": user_data}
-            )
+    async def update_user(self, user_id: int, user_data: Dict, expected_version: Optional[int] = None) -> Optional[Dict]:
+        """Update a user by ID, optionally only if it is still at `expected_version`"""
+        try:
+            # Keep the normalized email in step; the unique index rejects one already in use
+            if "email" in user_data:
+                user_data[NORMALIZED_EMAIL_FIELD] = normalize_email(user_data["email"])
 
-            if update_result.modified_count == 0:
+            # Update and read back the user in one round-trip
+            try:
+                async with self.sync.reserve("users") as seqs:
+                    user_data[SEQ_FIELD] = seqs.start
+                    updated_user = await update_versioned(
+                        self.collection, {"id": user_id}, user_data, expected_version, label=f"User {user_id}"
+                    )
+            except DuplicateKeyError as e:
+                if not _is_email_conflict(e):
+                    raise
+                raise ConflictError(f"Email {user_data['email']} already registered")
+            if not updated_user:
                 return None
-
-            # Get updated user
-            updated_user = self.get_user_by_id(user_id)
+            updated_user['_id'] = str(updated_user['_id'])
             return updated_user
+        except ConflictError:
+            raise
         except Exception as e:
             print(f"Error updating user: {str(e)}")
             raise ValueError(f"Failed to update user: {str(e)}")
 
-    def delete_user(self, user_id: int) -> bool:
-        """Delete a user by ID"""
+    async def delete_user(self, user_id: int, expected_version: Optional[int] = None) -> bool:
+        """Delete a user by ID, optionally only if it is still at `expected_version`"""
         try:
-            # Check if user exists
-            existing_user = self.get_user_by_id(user_id)
-            if not existing_user:
-                return False
-
-            # Delete user from database
-            result = self.collection.delete_one({"id": user_id})
-            return result.deleted_count > 0
+            async with self.sync.reserve("users") as seqs:
+                deleted = await delete_versioned(self.collection, {"id": user_id}, expected_version, label=f"User {user_id}")
+                if deleted:
+                    await self.sync.record_deletes("users", [(user_id, seqs.start)])
+            return deleted
+        except ConflictError:
+            raise
         except Exception as e:
             print(f"Error deleting user: {str(e)}")
-            raise ValueError(f"Failed to delete user: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to delete user: {str(e)}")
+
+    async def create_users_bulk(self, users: List[Tuple[int, Dict]]) -> List[Dict]:
+        """Create many users with one id reservation and one unordered insert_many"""
+        ids = await self.counters.reserve_ids("users", len(users))
+        docs = []
+        async with self.sync.reserve("users", len(users)) as seqs:
+            for (_, user_data), user_id, seq in zip(users, ids, seqs):
+                user_data["id"] = user_id
+                user_data[VERSION_FIELD] = INITIAL_VERSION
+                user_data[NORMALIZED_EMAIL_FIELD] = normalize_email(user_data["email"])
+                user_data[SEQ_FIELD] = seq
+                docs.append(user_data)
+            results = await insert_batch(self.collection, [index for index, _ in users], docs)
+        for result, user_data in zip(results, docs):
+            if result["status"] == "conflict":
+                result["error"] = f"Email {user_data['email']} already registered"
+        return results
+
+    async def update_users_bulk(self, updates: List[PlannedUpdate]) -> List[Dict]:
+        """Apply many user updates with one unordered bulk_write"""
+        async with self.sync.reserve("users", len(updates)) as seqs:
+            for (_, _, user_data, _), seq in zip(updates, seqs):
+                if "email" in user_data:
+                    user_data[NORMALIZED_EMAIL_FIELD] = normalize_email(user_data["email"])
+                user_data[SEQ_FIELD] = seq
+            results = await update_batch(self.collection, updates, label="User")
+        emails = {index: user_data.get("email") for index, _, user_data, _ in updates}
+        for result in results:
+            if result["status"] == "conflict" and result["error"].startswith("E11000"):
+                result["error"] = f"Email {emails[result['index']]} already registered"
+        return results
+
+    async def delete_users_bulk(self, deletes: List[PlannedDelete]) -> List[Dict]:
+        """Delete many users with one unordered bulk_write"""
+        async with self.sync.reserve("users", len(deletes)) as seqs:
+            results = await delete_batch(self.collection, deletes, label="User")
+            await self.sync.record_deletes("users", deleted_seqs(deletes, seqs, results))
+        return results
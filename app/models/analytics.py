@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Optional, Union
+
+class GradeStats(BaseModel):
+    dimension: str = Field(..., description="What the documents are grouped by: overall, subject, teacher, type or course")
+    key: Union[int, str] = Field(..., description="Subject, teacher or course ID, document type, or 'all'")
+    count: int = Field(..., description="Number of graded documents")
+    ungraded: int = Field(..., description="Number of documents without a grade")
+    mean: Optional[float] = Field(None, description="Average grade")
+    median: Optional[float] = Field(None, description="Median grade, to whole-grade resolution")
+    stddev: Optional[float] = Field(None, description="Population standard deviation of the grades")
+    distribution: Dict[str, int] = Field(..., description="Number of graded documents in each 10-point band")
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class BulkDeleteItem(BaseModel):
+    id: int = Field(..., description="ID of the record to delete")
+    version: Optional[int] = Field(None, ge=0, description="Only delete if the record is still at this version")
+
+class BulkItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request batch")
+    status: str = Field(..., description="created, updated, deleted, invalid, not_found, conflict or error")
+    id: Optional[int] = Field(None, description="ID of the record the item was applied to")
+    mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID of a created record")
+    version: Optional[int] = Field(None, description="Version of the record after the write")
+    error: Optional[str] = Field(None, description="Why the item was not applied")
+
+class BulkResponse(BaseModel):
+    succeeded: int = Field(..., description="Number of items applied")
+    failed: int = Field(..., description="Number of items rejected")
+    items: List[BulkItemResult] = Field(..., description="Per-item outcome, in request order")
@@ -12,10 +12,12 @@ class CourseCreate(CourseBase):
 class CourseUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100, description="Course name")
     subjects: Optional[List[int]] = Field(None, description="List of subject IDs")
+    version: Optional[int] = Field(None, ge=0, description="Version the update was based on; if the stored course has changed since, the update is rejected with 409")
 
 class Course(CourseBase):
     id: int = Field(..., description="Course's unique identifier")
     mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
+    version: int = Field(0, description="Revision number, incremented on every update")
 
     model_config = ConfigDict(
         from_attributes=True,
@@ -3,6 +3,8 @@ from typing import Optional, Annotated
 from datetime import datetime
 from bson import ObjectId
 
+DOCUMENT_TYPES = ['Lecture Notes', 'Assignment', 'Exam', 'Project', 'Study Guide']
+
 class DocumentBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=200, description="Document title")
     file_url: str = Field(..., description="URL or path to the document file")
@@ -14,9 +16,8 @@ class DocumentBase(BaseModel):
 
     @validator('type')
     def validate_type(cls, v):
-        valid_types = ['Lecture Notes', 'Assignment', 'Exam', 'Project', 'Study Guide']
-        if v not in valid_types:
-            raise ValueError(f'Type must be one of: {", ".join(valid_types)}')
+        if v not in DOCUMENT_TYPES:
+            raise ValueError(f'Type must be one of: {", ".join(DOCUMENT_TYPES)}')
         return v
 
 class DocumentCreate(DocumentBase):
@@ -30,19 +31,20 @@ class DocumentUpdate(BaseModel):
     teacher_id: Optional[int] = Field(None, description="ID of the teacher who created the document")
     subject_id: Optional[int] = Field(None, description="ID of the subject the document belongs to")
     owner: Optional[str] = Field(None, description="ID of the user who owns the document (MongoDB ObjectId)")
+    version: Optional[int] = Field(None, ge=0, description="Version the update was based on; if the stored document has changed since, the update is rejected with 409")
 
     @validator('type')
     def validate_type(cls, v):
         if v is not None:
-            valid_types = ['Lecture Notes', 'Assignment', 'Exam', 'Project', 'Study Guide']
-            if v not in valid_types:
-                raise ValueError(f'Type must be one of: {", ".join(valid_types)}')
+            if v not in DOCUMENT_TYPES:
+                raise ValueError(f'Type must be one of: {", ".join(DOCUMENT_TYPES)}')
         return v
 
 class Document(DocumentBase):
     id: int = Field(..., description="Document's unique identifier")
     upload_date: datetime = Field(default_factory=datetime.utcnow, description="Document upload date")
     mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
+    version: int = Field(0, description="Revision number, incremented on every update")
 
     model_config = ConfigDict(
         from_attributes=True,
@@ -63,4 +65,29 @@ class Document(DocumentBase):
                 "upload_date": "2024-02-14T12:00:00"
             }
         }
-    ) 
\ No newline at end of file
+    )
+
+class UserSummary(BaseModel):
+    id: int = Field(..., description="User's unique identifier")
+    name: str = Field(..., description="User's full name")
+    email: Optional[str] = Field(None, description="User's email address")
+    type: Optional[str] = Field(None, description="User type (teacher or student)")
+    mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+class SubjectSummary(BaseModel):
+    id: int = Field(..., description="Subject's unique identifier")
+    name: str = Field(..., description="Subject name")
+    mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+class DocumentRelations(BaseModel):
+    teacher: Optional[UserSummary] = Field(None, description="The user referenced by teacher_id")
+    subject: Optional[SubjectSummary] = Field(None, description="The subject referenced by subject_id")
+    owner: Optional[UserSummary] = Field(None, description="The user referenced by owner")
+
+class ExpandedDocument(Document):
+    expanded: Optional[DocumentRelations] = Field(None, description="Summaries of the references named in ?expand= (null where a reference is dangling)")
+
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+class DocumentHit(BaseModel):
+    id: int = Field(..., description="Document's unique identifier")
+    mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
+    title: str = Field(..., description="Document title")
+    type: str = Field(..., description="Document type")
+    teacher_id: int = Field(..., description="ID of the teacher who created the document")
+    subject_id: int = Field(..., description="ID of the subject the document belongs to")
+    upload_date: Optional[datetime] = Field(None, description="When the document was uploaded")
+    score: float = Field(..., description="Text relevance; hits are ordered by it, highest first")
+
+class SubjectHit(BaseModel):
+    id: int = Field(..., description="Subject's unique identifier")
+    mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
+    name: str = Field(..., description="Subject name")
+    description: str = Field(..., description="Subject description")
+    score: float = Field(..., description="Text relevance; hits are ordered by it, highest first")
+
+class SearchResults(BaseModel):
+    query: str = Field(..., description="The search text as received")
+    documents: List[DocumentHit] = Field(default_factory=list, description="Matching documents, most relevant first")
+    subjects: List[SubjectHit] = Field(default_factory=list, description="Matching subjects, most relevant first")
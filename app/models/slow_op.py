@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+class SlowOp(BaseModel):
+    at: datetime = Field(..., description="When the command finished")
+    origin: Optional[str] = Field(None, description="Controller method that issued it, e.g. DocumentController.get_documents_by_teacher")
+    database: str = Field(..., description="Database the command ran against")
+    collection: Optional[str] = Field(None, description="Collection queried")
+    command: str = Field(..., description="find or aggregate")
+    shape: Dict[str, Any] = Field(..., description="Filter/sort or pipeline with every value replaced by \"?\"")
+    duration_ms: float = Field(..., description="Round-trip time reported by the driver")
+    docs_returned: Optional[int] = Field(None, description="Documents returned (first batch until the explain has run)")
+    docs_examined: Optional[int] = Field(None, description="Documents the server examined, from the sampled explain")
+    keys_examined: Optional[int] = Field(None, description="Index keys the server examined, from the sampled explain")
+    plan: Optional[str] = Field(None, description="Winning plan stages, e.g. \"FETCH > IXSCAN {teacher_id: 1, id: 1}\" or \"COLLSCAN\"")
+    winning_plan: Optional[Dict[str, Any]] = Field(None, description="The winning plan as returned by explain")
+    explain_error: Optional[str] = Field(None, description="Why the explain failed, if it did")
+
+class SlowOpLogStats(BaseModel):
+    threshold_ms: float = Field(..., description="Commands at least this slow are recorded (SLOW_OP_THRESHOLD_MS)")
+    size: int = Field(..., description="How many entries the log keeps (SLOW_OP_LOG_SIZE)")
+    entries: int = Field(..., description="Entries currently in the log")
+    recorded: int = Field(..., description="Slow commands recorded since startup")
+    explain_interval_seconds: float = Field(..., description="Minimum time between explains of the same query shape")
+
+class SlowOpReport(BaseModel):
+    log: SlowOpLogStats
+    items: List[SlowOp]
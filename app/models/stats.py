@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import Dict
+from datetime import datetime
+
+class Stats(BaseModel):
+    users: int = Field(..., description="Number of users (estimated from collection metadata)")
+    courses: int = Field(..., description="Number of courses (estimated from collection metadata)")
+    subjects: int = Field(..., description="Number of subjects (estimated from collection metadata)")
+    documents: int = Field(..., description="Number of documents (estimated from collection metadata)")
+    users_by_type: Dict[str, int] = Field(..., description="Exact number of users of each type")
+    documents_by_type: Dict[str, int] = Field(..., description="Exact number of documents of each type")
+    generated_at: datetime = Field(..., description="When the counts were taken; they may be up to max_age_seconds old")
+    max_age_seconds: float = Field(..., description="How long the counts are reused before being taken again")
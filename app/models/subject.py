@@ -12,10 +12,12 @@ class SubjectCreate(SubjectBase):
 class SubjectUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100, description="Subject name")
     description: Optional[str] = Field(None, min_length=1, max_length=500, description="Subject description")
+    version: Optional[int] = Field(None, ge=0, description="Version the update was based on; if the stored subject has changed since, the update is rejected with 409")
 
 class Subject(SubjectBase):
     id: int = Field(..., description="Subject's unique identifier")
     mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
+    version: int = Field(0, description="Revision number, incremented on every update")
 
     model_config = ConfigDict(
         from_attributes=True,
@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+class SyncChange(BaseModel):
+    collection: str = Field(..., description="users, documents, subjects or courses")
+    operation: str = Field(..., description="upsert (created or updated) or delete")
+    id: int = Field(..., description="ID of the record")
+    seq: int = Field(..., description="Position of the change; changes are ordered by it")
+    record: Optional[Dict[str, Any]] = Field(None, description="The record as the read routes return it (upserts only)")
+
+class SyncPage(BaseModel):
+    changes: List[SyncChange] = Field(default_factory=list, description="Changes since the token, oldest first")
+    next: str = Field(..., description="Token to pass as `since` next time")
+    has_more: bool = Field(..., description="Whether more changes are waiting; if so, ask again with `next` right away")
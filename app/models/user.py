@@ -4,6 +4,8 @@ from datetime import datetime
 import re
 from bson import ObjectId
 
+USER_TYPES = ['teacher', 'student']
+
 class UserBase(BaseModel):
     name: str = Field(..., min_length=2, max_length=100, description="User's full name")
     email: EmailStr = Field(..., description="User's email address")
@@ -13,7 +15,7 @@ class UserBase(BaseModel):
 
     @validator('type')
     def type_must_be_valid(cls, v):
-        if v not in ['teacher', 'student']:
+        if v not in USER_TYPES:
             raise ValueError('Type must be either "teacher" or "student"')
         return v
 
@@ -26,16 +28,18 @@ class UserUpdate(BaseModel):
     type: Optional[str] = Field(None, description="User type (teacher/student)")
     courses: Optional[List[int]] = Field(None, description="List of course IDs")
     documents: Optional[List[int]] = Field(None, description="List of document IDs")
+    version: Optional[int] = Field(None, ge=0, description="Version the update was based on; if the stored user has changed since, the update is rejected with 409")
 
     @validator('type')
     def type_must_be_valid(cls, v):
-        if v is not None and v not in ['teacher', 'student']:
+        if v is not None and v not in USER_TYPES:
             raise ValueError('Type must be either "teacher" or "student"')
         return v
 
 class User(UserBase):
     id: int = Field(..., description="User's unique identifier")
     mongo_id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
+    version: int = Field(0, description="Revision number, incremented on every update")
 
     model_config = ConfigDict(
         from_attributes=True,
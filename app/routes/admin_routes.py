@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, Query
+from app.models.slow_op import SlowOpReport
+from app.utils.admin import require_admin
+from app.utils.slow_ops import slow_op_log
+from typing import Optional
+from pydantic import BaseModel
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+class ClearResponse(BaseModel):
+    cleared: int
+
+@router.get("/slow-ops", response_model=SlowOpReport)
+async def get_slow_ops(collection: Optional[str] = Query(None, description="Only this collection"),
+                       origin: Optional[str] = Query(None, description="Only origins containing this, e.g. DocumentController"),
+                       min_duration_ms: Optional[float] = Query(None, ge=0, description="Only commands at least this slow"),
+                       collscan: Optional[bool] = Query(None, description="Only (true) or never (false) collection scans; needs the explain to have run"),
+                       limit: int = Query(50, ge=1, le=1000, description="Maximum number of entries to return")):
+    """
+    Recent find/aggregate commands slower than SLOW_OP_THRESHOLD_MS, newest first.
+
+    Each entry names the controller method that issued it, the redacted query
+    shape and its duration; for a sample of each shape, the winning plan and
+    documents examined versus returned come from a background explain.
+    Requires the X-Admin-Token header.
+    """
+    return {
+        "log": slow_op_log.stats(),
+        "items": slow_op_log.entries(collection, origin, min_duration_ms, collscan, limit),
+    }
+
+@router.delete("/slow-ops", response_model=ClearResponse)
+async def clear_slow_ops():
+    """Empty the slow-op log"""
+    return ClearResponse(cleared=slow_op_log.clear())
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from app.services.analytics_service import AnalyticsService
+from app.models.analytics import GradeStats
+from app.utils.etag import PRIVATE_REVALIDATE, conditional_get
+from app.utils.serialization import respond
+from typing import List, Union
+
+router = APIRouter()
+analytics_service = AnalyticsService()
+
+# Grade statistics change with documents, and per-course ones with course membership
+not_modified = conditional_get("documents", "courses", cache_control=PRIVATE_REVALIDATE)
+
+# Dimensions that can be listed, and whether their keys are integer IDs
+DIMENSION_KEY_IS_INT = {"subject": True, "teacher": True, "course": True, "type": False}
+
+def _check_dimension(dimension: str):
+    if dimension not in DIMENSION_KEY_IS_INT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Dimension must be one of: {', '.join(DIMENSION_KEY_IS_INT)}"
+        )
+
+@router.get("/grades", response_model=GradeStats, dependencies=[Depends(not_modified)])
+async def get_overall_grade_stats(response: Response):
+    """Average, median, standard deviation and distribution of grades over all documents"""
+    return respond(response, await analytics_service.get_overall_grade_stats())
+
+@router.get("/grades/{dimension}", response_model=List[GradeStats], dependencies=[Depends(not_modified)])
+async def list_grade_stats(dimension: str, response: Response):
+    """
+    Grade statistics for every subject, teacher, course or document type.
+
+    Served from summaries kept up to date on every document write, so this
+    never scans the documents collection.
+    """
+    _check_dimension(dimension)
+    return respond(response, await analytics_service.list_grade_stats(dimension))
+
+@router.get("/grades/{dimension}/{key}", response_model=GradeStats, dependencies=[Depends(not_modified)])
+async def get_grade_stats(dimension: str, key: str, response: Response):
+    """Grade statistics for one subject, teacher or course (by ID) or document type (by name)"""
+    _check_dimension(dimension)
+    parsed: Union[int, str] = key
+    if DIMENSION_KEY_IS_INT[dimension]:
+        try:
+            parsed = int(key)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{dimension.capitalize()} ID must be an integer"
+            )
+    stats = await analytics_service.get_grade_stats(dimension, parsed)
+    if stats is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Course with ID {parsed} not found"
+        )
+    return respond(response, stats)
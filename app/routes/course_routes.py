@@ -1,52 +1,124 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 from app.services.course_service import CourseService
-from typing import List
+from typing import Any, Dict, List, Optional
 from app.models.course import Course, CourseCreate, CourseUpdate
+from app.models.bulk import BulkResponse
+from app.utils.bulk import check_batch_size
+from app.utils.errors import ConflictError
+from app.utils.etag import SHARED_REVALIDATE, conditional_get
+from app.utils.lookup import IdListParams
+from app.utils.pagination import PageParams
+from app.utils.projection import fields_param
+from app.utils.serialization import respond
+from app.utils.streaming import ndjson_response, wants_ndjson
 from pydantic import BaseModel
 
 router = APIRouter()
 course_service = CourseService()
 
+# ETag / 304 handling for the read routes
+not_modified = conditional_get("courses", cache_control=SHARED_REVALIDATE)
+
 class DeleteResponse(BaseModel):
     message: str
 
-@router.get("/", response_model=List[Course], tags=["courses"])
-async def get_courses():
-    """Get all courses"""
-    return course_service.get_all_courses()
+@router.get("/", response_model=List[Course], dependencies=[Depends(not_modified)], tags=["courses"])
+async def get_courses(request: Request, response: Response, page: PageParams = Depends(), lookup: IdListParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(Course))):
+    """
+    Get all courses, one page at a time (or as an NDJSON stream with Accept: application/x-ndjson).
 
-@router.get("/id/{id}", response_model=Course, tags=["courses"])
-async def get_course_by_id(id: int):
+    With ?ids=1,2,3 or ?mongo_ids=..., returns just those courses from one lookup:
+    one entry per requested id, in request order, null where it does not exist.
+    """
+    if lookup.requested:
+        return respond(response, await course_service.get_many_courses(lookup.ids, lookup.mongo_ids, fields))
+    if wants_ndjson(request):
+        return ndjson_response(course_service.stream_courses(page.after, fields=fields), response=response)
+    courses = await course_service.get_all_courses(page.fetch_limit, page.after, fields)
+    return respond(response, page.paginate(response, courses))
+
+@router.get("/id/{id}", response_model=Course, dependencies=[Depends(not_modified)], tags=["courses"])
+async def get_course_by_id(id: int, response: Response, fields: Optional[List[str]] = Depends(fields_param(Course))):
     """Get a course by its ID"""
-    course = course_service.get_course_by_id(id)
+    course = await course_service.get_course_by_id(id, fields)
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Course with ID {id} not found"
         )
-    return course
+    return respond(response, course)
 
-@router.get("/mongo/{mongo_id}", response_model=Course, tags=["courses"])
-async def get_course_by_mongo_id(mongo_id: str):
+@router.get("/mongo/{mongo_id}", response_model=Course, dependencies=[Depends(not_modified)], tags=["courses"])
+async def get_course_by_mongo_id(mongo_id: str, response: Response, fields: Optional[List[str]] = Depends(fields_param(Course))):
     """Get a course by its MongoDB _id"""
-    course = course_service.get_course_by_mongo_id(mongo_id)
+    course = await course_service.get_course_by_mongo_id(mongo_id, fields)
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Course with MongoDB ID {mongo_id} not found"
         )
-    return course
+    return respond(response, course)
 
-@router.get("/subject/{subject_id}", response_model=List[Course], tags=["courses"])
-async def get_courses_by_subject(subject_id: int):
+@router.get("/subject/{subject_id}", response_model=List[Course], dependencies=[Depends(not_modified)], tags=["courses"])
+async def get_courses_by_subject(subject_id: int, request: Request, response: Response, page: PageParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(Course))):
     """Get all courses that include a specific subject"""
-    courses = course_service.get_courses_by_subject(subject_id)
+    if wants_ndjson(request):
+        return ndjson_response(course_service.stream_courses(page.after, subject_id, fields=fields), response=response)
+    courses = await course_service.get_courses_by_subject(subject_id, page.fetch_limit, page.after, fields)
     if not courses:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No courses found for subject ID {subject_id}"
         )
-    return courses
+    return respond(response, page.paginate(response, courses))
+
+@router.post("/bulk", response_model=BulkResponse, tags=["courses"])
+async def create_courses_bulk(courses: List[Dict[str, Any]] = Body(..., description="Courses to create, each shaped like the body of POST /")):
+    """
+    Create many courses in one request (at most API_BULK_MAX_BATCH_SIZE).
+
+    Every item is validated before anything is written. Ids are reserved in one
+    step and the valid items are inserted together; `items` reports each one's
+    outcome in request order, so one bad item does not fail the batch.
+    """
+    check_batch_size(courses)
+    try:
+        return await course_service.create_courses_bulk(courses)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.put("/bulk", response_model=BulkResponse, tags=["courses"])
+async def update_courses_bulk(courses: List[Dict[str, Any]] = Body(..., description="Updates, each the body of PUT /{id} plus the course's `id`")):
+    """
+    Update many courses in one request (at most API_BULK_MAX_BATCH_SIZE).
+
+    An item with a `version` is only applied if the course is still at that
+    version; items for missing courses or stale versions are reported as
+    `not_found` or `conflict` without affecting the rest.
+    """
+    check_batch_size(courses)
+    try:
+        return await course_service.update_courses_bulk(courses)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/bulk/delete", response_model=BulkResponse, tags=["courses"])
+async def delete_courses_bulk(courses: List[Dict[str, Any]] = Body(..., description="Courses to delete, each `{\"id\": ..., \"version\": ...}` (version optional)")):
+    """Delete many courses in one request (at most API_BULK_MAX_BATCH_SIZE)"""
+    check_batch_size(courses)
+    try:
+        return await course_service.delete_courses_bulk(courses)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 @router.post("/", response_model=Course, status_code=status.HTTP_201_CREATED, tags=["courses"])
 async def create_course(course: CourseCreate):
@@ -57,7 +129,7 @@ async def create_course(course: CourseCreate):
     - **subjects**: List of subject IDs
     """
     try:
-        return course_service.create_course(course)
+        return await course_service.create_course(course)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -78,13 +150,20 @@ async def update_course(course_id: int, course: CourseUpdate):
     - **subjects**: List of subject IDs
     """
     try:
-        updated_course = course_service.update_course(course_id, course)
+        updated_course = await course_service.update_course(course_id, course)
         if not updated_course:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Course with ID {course_id} not found"
             )
         return updated_course
+    except HTTPException:
+        raise
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -97,16 +176,23 @@ async def update_course(course_id: int, course: CourseUpdate):
         )
 
 @router.delete("/{course_id}", response_model=DeleteResponse, tags=["courses"])
-async def delete_course(course_id: int):
+async def delete_course(course_id: int, version: Optional[int] = Query(None, ge=0, description="Only delete if the course is still at this version")):
     """Delete a course by ID"""
     try:
-        deleted = course_service.delete_course(course_id)
+        deleted = await course_service.delete_course(course_id, version)
         if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Course with ID {course_id} not found"
             )
         return DeleteResponse(message=f"Course with ID {course_id} has been successfully deleted")
+    except HTTPException:
+        raise
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
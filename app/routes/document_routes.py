@@ -1,56 +1,176 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 from app.services.document_service import DocumentService
-from app.models.document import Document, DocumentCreate, DocumentUpdate
-from typing import List
+from app.models.document import DOCUMENT_TYPES, Document, DocumentCreate, DocumentUpdate, ExpandedDocument
+from app.models.bulk import BulkResponse
+from app.utils.bulk import check_batch_size
+from app.utils.document_query import DocumentQuery, document_query
+from app.utils.errors import ConflictError
+from app.utils.etag import PRIVATE_REVALIDATE, conditional_get
+from app.utils.lookup import IdListParams
+from app.utils.pagination import PageParams
+from app.utils.projection import expand_param, fields_param
+from app.utils.serialization import respond
+from app.utils.streaming import ndjson_response, wants_ndjson
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 router = APIRouter()
 document_service = DocumentService()
 
+# ETag / 304 handling for the read routes
+not_modified = conditional_get("documents", cache_control=PRIVATE_REVALIDATE)
+not_modified_expanded = conditional_get("documents", "users", "subjects", cache_control=PRIVATE_REVALIDATE)
+
+# References ?expand= can embed
+expand_documents = expand_param(["teacher", "subject", "owner"])
+
+async def not_modified_expandable(request: Request, response: Response):
+    """ETag over documents, plus users and subjects when ?expand= embeds them"""
+    check = not_modified_expanded if request.query_params.get("expand") else not_modified
+    await check(request, response)
+
 class DeleteResponse(BaseModel):
     message: str
 
-@router.get("/", response_model=List[Document])
-async def get_documents():
-    """Get all documents"""
-    return document_service.get_all_documents()
+def _resume_after(query: DocumentQuery, page: PageParams):
+    """Where the page starts in the query's sort order; a cursor from another sort order is a 400"""
+    try:
+        return query.parse_cursor(page.cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/", response_model=List[ExpandedDocument], dependencies=[Depends(not_modified_expandable)])
+async def get_documents(request: Request, response: Response, page: PageParams = Depends(), lookup: IdListParams = Depends(),
+                        query: DocumentQuery = Depends(document_query),
+                        fields: Optional[List[str]] = Depends(fields_param(Document)), expand: Optional[List[str]] = Depends(expand_documents)):
+    """
+    Get documents, one page at a time (or as an NDJSON stream with Accept: application/x-ndjson).
+
+    Filters combine: type, teacher_id, subject_id, owner_id, an upload_date
+    range (uploaded_from inclusive, uploaded_before exclusive) and a grade
+    range (grade_min, grade_max, inclusive), compiled into one MongoDB query.
+    ?sort=upload_date or ?sort=grade (- prefix for descending) orders the
+    results, ties broken by id; the default is by id. With ?fields= the sort
+    field is always returned, because the next-page cursor is built from it.
 
-@router.get("/{id}", response_model=Document)
-async def get_document(id: int):
-    """Get a document by its ID"""
-    document = document_service.get_document_by_id(id)
+    With ?ids=1,2,3 or ?mongo_ids=..., returns just those documents from one lookup:
+    one entry per requested id, in request order, null where it does not exist.
+
+    With ?expand=teacher,subject,owner, each document also carries an `expanded`
+    object with summaries of those records, resolved with one batched query for
+    the whole page (not applied to NDJSON streams).
+    """
+    if lookup.requested:
+        return respond(response, await document_service.get_many_documents(lookup.ids, lookup.mongo_ids, fields, expand))
+    after = _resume_after(query, page)
+    if wants_ndjson(request):
+        return ndjson_response(document_service.stream_documents(query, after, fields), response=response)
+    documents = await document_service.get_all_documents(query, page.fetch_limit, after, fields, expand)
+    return respond(response, page.paginate(response, documents, query.position))
+
+@router.get("/{id}", response_model=ExpandedDocument, dependencies=[Depends(not_modified_expandable)])
+async def get_document(id: int, response: Response, fields: Optional[List[str]] = Depends(fields_param(Document)),
+                       expand: Optional[List[str]] = Depends(expand_documents)):
+    """Get a document by its ID; ?expand=teacher,subject,owner embeds summaries of those records, joined in the same query"""
+    document = await document_service.get_document_by_id(id, fields, expand)
     if not document:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Document with id {id} not found"
         )
-    return document
+    return respond(response, document)
 
-@router.get("/type/{doc_type}", response_model=List[Document])
-async def get_documents_by_type(doc_type: str):
-    """Get all documents of a specific type"""
-    valid_types = ['Lecture Notes', 'Assignment', 'Exam', 'Project', 'Study Guide']
-    if doc_type not in valid_types:
+@router.get("/type/{doc_type}", response_model=List[Document], dependencies=[Depends(not_modified)], deprecated=True)
+async def get_documents_by_type(doc_type: str, request: Request, response: Response, page: PageParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(Document))):
+    """Get all documents of a specific type (deprecated: use GET /documents/?type=..., which also combines filters)"""
+    if doc_type not in DOCUMENT_TYPES:
         raise HTTPException(
             status_code=400,
-            detail=f"Document type must be one of: {', '.join(valid_types)}"
+            detail=f"Document type must be one of: {', '.join(DOCUMENT_TYPES)}"
+        )
+    if wants_ndjson(request):
+        query = DocumentQuery(type=doc_type)
+        return ndjson_response(document_service.stream_documents(query, _resume_after(query, page), fields), response=response)
+    documents = await document_service.get_documents_by_type(doc_type, page.fetch_limit, page.after, fields)
+    return respond(response, page.paginate(response, documents))
+
+@router.get("/teacher/{teacher_id}", response_model=List[Document], dependencies=[Depends(not_modified)], deprecated=True)
+async def get_documents_by_teacher(teacher_id: int, request: Request, response: Response, page: PageParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(Document))):
+    """Get all documents created by a specific teacher (deprecated: use GET /documents/?teacher_id=..., which also combines filters)"""
+    if wants_ndjson(request):
+        query = DocumentQuery(teacher_id=teacher_id)
+        return ndjson_response(document_service.stream_documents(query, _resume_after(query, page), fields), response=response)
+    documents = await document_service.get_documents_by_teacher(teacher_id, page.fetch_limit, page.after, fields)
+    return respond(response, page.paginate(response, documents))
+
+@router.get("/subject/{subject_id}", response_model=List[Document], dependencies=[Depends(not_modified)], deprecated=True)
+async def get_documents_by_subject(subject_id: int, request: Request, response: Response, page: PageParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(Document))):
+    """Get all documents related to a specific subject (deprecated: use GET /documents/?subject_id=..., which also combines filters)"""
+    if wants_ndjson(request):
+        query = DocumentQuery(subject_id=subject_id)
+        return ndjson_response(document_service.stream_documents(query, _resume_after(query, page), fields), response=response)
+    documents = await document_service.get_documents_by_subject(subject_id, page.fetch_limit, page.after, fields)
+    return respond(response, page.paginate(response, documents))
+
+@router.get("/owner/{owner_id}", response_model=List[Document], dependencies=[Depends(not_modified)], deprecated=True)
+async def get_documents_by_owner(owner_id: str, request: Request, response: Response, page: PageParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(Document))):
+    """Get all documents owned by a specific user (deprecated: use GET /documents/?owner_id=..., which also combines filters)"""
+    if wants_ndjson(request):
+        query = DocumentQuery(owner_id=owner_id)
+        return ndjson_response(document_service.stream_documents(query, _resume_after(query, page), fields), response=response)
+    documents = await document_service.get_documents_by_owner(owner_id, page.fetch_limit, page.after, fields)
+    return respond(response, page.paginate(response, documents))
+
+@router.post("/bulk", response_model=BulkResponse, tags=["documents"])
+async def create_documents_bulk(documents: List[Dict[str, Any]] = Body(..., description="Documents to create, each shaped like the body of POST /")):
+    """
+    Create many documents in one request (at most API_BULK_MAX_BATCH_SIZE).
+
+    Every item is validated before anything is written. Ids are reserved in one
+    step and the valid items are inserted together; `items` reports each one's
+    outcome in request order, so one bad item does not fail the batch.
+    """
+    check_batch_size(documents)
+    try:
+        return await document_service.create_documents_bulk(documents)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-    return document_service.get_documents_by_type(doc_type)
 
-@router.get("/teacher/{teacher_id}", response_model=List[Document])
-async def get_documents_by_teacher(teacher_id: int):
-    """Get all documents created by a specific teacher"""
-    return document_service.get_documents_by_teacher(teacher_id)
+@router.put("/bulk", response_model=BulkResponse, tags=["documents"])
+async def update_documents_bulk(documents: List[Dict[str, Any]] = Body(..., description="Updates, each the body of PUT /{id} plus the document's `id`")):
+    """
+    Update many documents in one request (at most API_BULK_MAX_BATCH_SIZE).
 
-@router.get("/subject/{subject_id}", response_model=List[Document])
-async def get_documents_by_subject(subject_id: int):
-    """Get all documents related to a specific subject"""
-    return document_service.get_documents_by_subject(subject_id)
+    An item with a `version` is only applied if the document is still at that
+    version; items for missing documents or stale versions are reported as
+    `not_found` or `conflict` without affecting the rest.
+    """
+    check_batch_size(documents)
+    try:
+        return await document_service.update_documents_bulk(documents)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
-@router.get("/owner/{owner_id}", response_model=List[Document])
-async def get_documents_by_owner(owner_id: str):
-    """Get all documents owned by a specific user"""
-    return document_service.get_documents_by_owner(owner_id)
+@router.post("/bulk/delete", response_model=BulkResponse, tags=["documents"])
+async def delete_documents_bulk(documents: List[Dict[str, Any]] = Body(..., description="Documents to delete, each `{\"id\": ..., \"version\": ...}` (version optional)")):
+    """Delete many documents in one request (at most API_BULK_MAX_BATCH_SIZE)"""
+    check_batch_size(documents)
+    try:
+        return await document_service.delete_documents_bulk(documents)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 @router.post("/", response_model=Document, status_code=status.HTTP_201_CREATED, tags=["documents"])
 async def create_document(document: DocumentCreate):
@@ -66,7 +186,7 @@ async def create_document(document: DocumentCreate):
     - **owner**: ID of the user who owns the document (MongoDB ObjectId)
     """
     try:
-        return document_service.create_document(document)
+        return await document_service.create_document(document)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -92,13 +212,20 @@ async def update_document(document_id: int, document: DocumentUpdate):
     - **owner**: ID of the user who owns the document (MongoDB ObjectId)
     """
     try:
-        updated_document = document_service.update_document(document_id, document)
+        updated_document = await document_service.update_document(document_id, document)
         if not updated_document:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Document with ID {document_id} not found"
             )
         return updated_document
+    except HTTPException:
+        raise
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -111,16 +238,23 @@ async def update_document(document_id: int, document: DocumentUpdate):
         )
 
 @router.delete("/{document_id}", response_model=DeleteResponse, tags=["documents"])
-async def delete_document(document_id: int):
+async def delete_document(document_id: int, version: Optional[int] = Query(None, ge=0, description="Only delete if the document is still at this version")):
     """Delete a document by ID"""
     try:
-        deleted = document_service.delete_document(document_id)
+        deleted = await document_service.delete_document(document_id, version)
         if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Document with ID {document_id} not found"
             )
         return DeleteResponse(message=f"Document with ID {document_id} has been successfully deleted")
+    except HTTPException:
+        raise
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
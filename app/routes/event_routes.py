@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from app.controller.change_feed import ChangeFeedUnavailable
+from app.services.event_service import EVENT_COLLECTIONS, EventService
+from typing import Optional
+
+router = APIRouter()
+event_service = EventService()
+
+@router.get("/", response_class=StreamingResponse)
+async def stream_events(
+    collections: Optional[str] = Query(None, description=f"Comma-separated collections to follow (default all): {', '.join(EVENT_COLLECTIONS)}"),
+    last_event_id: Optional[str] = Header(None, description="Sent by EventSource on reconnect: the id of the last event received"),
+    after: Optional[str] = Query(None, description="Same as Last-Event-ID, for clients that cannot set headers"),
+):
+    """
+    Server-Sent Events stream of creates, updates and deletes (text/event-stream).
+
+    Each `change` event carries `collection`, `operation` (insert, update or
+    delete), `_id`, `id`, and for inserts and updates the record as the read
+    routes return it. Deletes only carry `_id`. Event ids are change-stream
+    resume tokens: reconnecting with Last-Event-ID replays what was missed,
+    or sends a `reset` event when that is too old, after which the client
+    should reload. Needs MongoDB running as a replica set.
+    """
+    selected = EVENT_COLLECTIONS
+    if collections:
+        selected = [name.strip() for name in collections.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in EVENT_COLLECTIONS]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Collections must be among: {', '.join(EVENT_COLLECTIONS)}"
+            )
+    try:
+        await event_service.open()
+    except ChangeFeedUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Change events are unavailable (MongoDB must run as a replica set): {str(e)}"
+        )
+    return StreamingResponse(
+        event_service.stream(selected, last_event_id or after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
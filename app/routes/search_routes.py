@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from app.services.search_service import SEARCH_ENTITIES, SearchService
+from app.models.document import DOCUMENT_TYPES
+from app.models.search import SearchResults
+from app.utils.etag import PRIVATE_REVALIDATE, conditional_get
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.utils.search import parse_position
+from app.utils.serialization import respond
+from typing import Optional
+
+router = APIRouter()
+search_service = SearchService()
+
+# Hits come from documents and subjects only
+not_modified = conditional_get("documents", "subjects", cache_control=PRIVATE_REVALIDATE)
+
+@router.get("/", response_model=SearchResults, dependencies=[Depends(not_modified)])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for; \"quoted phrases\" must match exactly and -word excludes"),
+    entity: Optional[str] = Query(None, description=f"Only search one entity type: {', '.join(SEARCH_ENTITIES)}"),
+    type: Optional[str] = Query(None, description="Only documents of this type"),
+    subject_id: Optional[int] = Query(None, description="Only documents of this subject (and only this subject among subjects)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of hits per entity type"),
+    after: Optional[str] = Query(None, description="Cursor taken from the X-Next-Cursor header of the previous page"),
+):
+    """
+    Full-text search over document titles and subject names and descriptions.
+
+    Hits are grouped by entity type and ranked by relevance in MongoDB, using
+    the text indexes on each collection. Each page holds up to `limit` hits
+    per group; X-Next-Cursor is set while any group has more, and a group
+    that is finished comes back empty on later pages.
+    """
+    if entity is not None and entity not in SEARCH_ENTITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Entity must be one of: {', '.join(SEARCH_ENTITIES)}"
+        )
+    if type is not None and type not in DOCUMENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Document type must be one of: {', '.join(DOCUMENT_TYPES)}"
+        )
+    positions = {}
+    if after:
+        try:
+            positions = {name: parse_position(value) for name, value in decode_cursor(after).items() if name in SEARCH_ENTITIES}
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    entities = [entity] if entity else list(SEARCH_ENTITIES)
+    results, next_positions = await search_service.search(q, entities, positions, limit, type, subject_id)
+    if any(position is not None for position in next_positions.values()):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(next_positions)
+    return respond(response, results)
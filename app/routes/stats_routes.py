@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Response, status
+from app.services.stats_service import StatsService
+from app.models.stats import Stats
+from app.utils.serialization import respond
+from datetime import datetime
+
+router = APIRouter()
+stats_service = StatsService()
+
+@router.get("/", response_model=Stats)
+async def get_stats(response: Response):
+    """
+    Get the number of users, courses, subjects and documents, plus users by
+    type and documents by type.
+
+    Counts are cached for STATS_CACHE_TTL_SECONDS, so the response may lag
+    recent writes by that much.
+    """
+    try:
+        stats = await stats_service.get_stats()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load stats: {str(e)}"
+        )
+    # Let the browser reuse them only for as long as the server still would
+    age = (datetime.utcnow() - stats["generated_at"]).total_seconds()
+    response.headers["Cache-Control"] = f"public, max-age={max(0, int(stats['max_age_seconds'] - age))}"
+    return respond(response, stats)
@@ -1,52 +1,125 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 from app.services.subject_service import SubjectService
-from typing import List
+from typing import Any, Dict, List, Optional
 from app.models.subject import Subject, SubjectCreate, SubjectUpdate
+from app.models.bulk import BulkResponse
+from app.utils.bulk import check_batch_size
+from app.utils.errors import ConflictError
+from app.utils.etag import SHARED_REVALIDATE, conditional_get
+from app.utils.lookup import IdListParams
+from app.utils.pagination import PageParams
+from app.utils.projection import fields_param
+from app.utils.serialization import respond
+from app.utils.streaming import ndjson_response, wants_ndjson
 from pydantic import BaseModel
 
 router = APIRouter()
 subject_service = SubjectService()
 
+# ETag / 304 handling for the read routes
+not_modified = conditional_get("subjects", cache_control=SHARED_REVALIDATE)
+not_modified_by_course = conditional_get("subjects", "courses", cache_control=SHARED_REVALIDATE)
+
 class DeleteResponse(BaseModel):
     message: str
 
-@router.get("/", response_model=List[Subject])
-async def get_subjects():
-    """Get all subjects"""
-    return subject_service.get_all_subjects()
+@router.get("/", response_model=List[Subject], dependencies=[Depends(not_modified)])
+async def get_subjects(request: Request, response: Response, page: PageParams = Depends(), lookup: IdListParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(Subject))):
+    """
+    Get all subjects, one page at a time (or as an NDJSON stream with Accept: application/x-ndjson).
 
-@router.get("/id/{id}", response_model=Subject)
-async def get_subject_by_id(id: int):
+    With ?ids=1,2,3 or ?mongo_ids=..., returns just those subjects from one lookup:
+    one entry per requested id, in request order, null where it does not exist.
+    """
+    if lookup.requested:
+        return respond(response, await subject_service.get_many_subjects(lookup.ids, lookup.mongo_ids, fields))
+    if wants_ndjson(request):
+        return ndjson_response(subject_service.stream_subjects(page.after, fields=fields), response=response)
+    subjects = await subject_service.get_all_subjects(page.fetch_limit, page.after, fields)
+    return respond(response, page.paginate(response, subjects))
+
+@router.get("/id/{id}", response_model=Subject, dependencies=[Depends(not_modified)])
+async def get_subject_by_id(id: int, response: Response, fields: Optional[List[str]] = Depends(fields_param(Subject))):
     """Get a subject by its ID"""
-    subject = subject_service.get_subject_by_id(id)
+    subject = await subject_service.get_subject_by_id(id, fields)
     if not subject:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Subject with id {id} not found"
         )
-    return subject
+    return respond(response, subject)
 
-@router.get("/mongo/{mongo_id}", response_model=Subject)
-async def get_subject_by_mongo_id(mongo_id: str):
+@router.get("/mongo/{mongo_id}", response_model=Subject, dependencies=[Depends(not_modified)])
+async def get_subject_by_mongo_id(mongo_id: str, response: Response, fields: Optional[List[str]] = Depends(fields_param(Subject))):
     """Get a subject by its MongoDB _id"""
-    subject = subject_service.get_subject_by_mongo_id(mongo_id)
+    subject = await subject_service.get_subject_by_mongo_id(mongo_id, fields)
     if not subject:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Subject with MongoDB id {mongo_id} not found"
         )
-    return subject
+    return respond(response, subject)
 
-@router.get("/course/{course_id}", response_model=List[Subject])
-async def get_subjects_by_course(course_id: int):
+@router.get("/course/{course_id}", response_model=List[Subject], dependencies=[Depends(not_modified_by_course)])
+async def get_subjects_by_course(course_id: int, request: Request, response: Response, page: PageParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(Subject))):
     """Get all subjects related to a specific course"""
-    subjects = subject_service.get_subjects_by_course(course_id)
+    if wants_ndjson(request):
+        return ndjson_response(subject_service.stream_subjects(page.after, course_id, fields=fields), response=response)
+    subjects = await subject_service.get_subjects_by_course(course_id, page.fetch_limit, page.after, fields)
     if not subjects:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No subjects found for course with id {course_id}"
         )
-    return subjects
+    return respond(response, page.paginate(response, subjects))
+
+@router.post("/bulk", response_model=BulkResponse, tags=["subjects"])
+async def create_subjects_bulk(subjects: List[Dict[str, Any]] = Body(..., description="Subjects to create, each shaped like the body of POST /")):
+    """
+    Create many subjects in one request (at most API_BULK_MAX_BATCH_SIZE).
+
+    Every item is validated before anything is written. Ids are reserved in one
+    step and the valid items are inserted together; `items` reports each one's
+    outcome in request order, so one bad item does not fail the batch.
+    """
+    check_batch_size(subjects)
+    try:
+        return await subject_service.create_subjects_bulk(subjects)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.put("/bulk", response_model=BulkResponse, tags=["subjects"])
+async def update_subjects_bulk(subjects: List[Dict[str, Any]] = Body(..., description="Updates, each the body of PUT /{id} plus the subject's `id`")):
+    """
+    Update many subjects in one request (at most API_BULK_MAX_BATCH_SIZE).
+
+    An item with a `version` is only applied if the subject is still at that
+    version; items for missing subjects or stale versions are reported as
+    `not_found` or `conflict` without affecting the rest.
+    """
+    check_batch_size(subjects)
+    try:
+        return await subject_service.update_subjects_bulk(subjects)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/bulk/delete", response_model=BulkResponse, tags=["subjects"])
+async def delete_subjects_bulk(subjects: List[Dict[str, Any]] = Body(..., description="Subjects to delete, each `{\"id\": ..., \"version\": ...}` (version optional)")):
+    """Delete many subjects in one request (at most API_BULK_MAX_BATCH_SIZE)"""
+    check_batch_size(subjects)
+    try:
+        return await subject_service.delete_subjects_bulk(subjects)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 @router.post("/", response_model=Subject, status_code=status.HTTP_201_CREATED, tags=["subjects"])
 async def create_subject(subject: SubjectCreate):
@@ -57,7 +130,12 @@ async def create_subject(subject: SubjectCreate):
     - **description**: Subject description (1-500 characters)
     """
     try:
-        return subject_service.create_subject(subject)
+        return await subject_service.create_subject(subject)
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -78,13 +156,20 @@ async def update_subject(subject_id: int, subject: SubjectUpdate):
     - **description**: Subject description (1-500 characters)
     """
     try:
-        updated_subject = subject_service.update_subject(subject_id, subject)
+        updated_subject = await subject_service.update_subject(subject_id, subject)
         if not updated_subject:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Subject with ID {subject_id} not found"
             )
         return updated_subject
+    except HTTPException:
+        raise
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -97,16 +182,23 @@ async def update_subject(subject_id: int, subject: SubjectUpdate):
         )
 
 @router.delete("/{subject_id}", response_model=DeleteResponse, tags=["subjects"])
-async def delete_subject(subject_id: int):
+async def delete_subject(subject_id: int, version: Optional[int] = Query(None, ge=0, description="Only delete if the subject is still at this version")):
     """Delete a subject by ID"""
     try:
-        deleted = subject_service.delete_subject(subject_id)
+        deleted = await subject_service.delete_subject(subject_id, version)
         if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Subject with ID {subject_id} not found"
             )
         return DeleteResponse(message=f"Subject with ID {subject_id} has been successfully deleted")
+    except HTTPException:
+        raise
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from app.controller.sync_controller import SYNC_COLLECTIONS
+from app.models.sync import SyncPage
+from app.services.sync_service import SyncService, SyncTokenExpired, parse_sync_token
+from app.utils.pagination import MAX_PAGE_SIZE
+from app.utils.serialization import respond
+from typing import Optional
+
+router = APIRouter()
+sync_service = SyncService()
+
+@router.get("/", response_model=SyncPage)
+async def sync(
+    response: Response,
+    since: Optional[str] = Query(None, description="Token from the `next` field of the previous sync; omit to fetch everything"),
+    collections: Optional[str] = Query(None, description=f"Comma-separated collections to sync (default all): {', '.join(SYNC_COLLECTIONS)}"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of changes to return"),
+):
+    """
+    Records created, updated or deleted since a sync token, across collections.
+
+    Without `since` every record is returned as an upsert (a first, full
+    sync). Store `next` and pass it as `since` on the next call; while
+    `has_more` is true, call again straight away. Upserts carry the record,
+    deletes only its id. Tokens older than the tombstone retention
+    (SYNC_TOMBSTONE_RETENTION_DAYS) get 410 Gone: start over without `since`.
+    Always pass the same `collections` with a token.
+    """
+    selected = list(SYNC_COLLECTIONS)
+    if collections:
+        selected = [name.strip() for name in collections.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in SYNC_COLLECTIONS]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Collections must be among: {', '.join(SYNC_COLLECTIONS)}"
+            )
+    position = None
+    if since:
+        try:
+            position = parse_sync_token(since)
+        except SyncTokenExpired as e:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail=str(e)
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    return respond(response, await sync_service.changes(position, selected, limit))
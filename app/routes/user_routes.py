@@ -1,7 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 from app.services.user_service import UserService
 from app.models.user import User, UserCreate, UserUpdate
-from typing import List
+from app.models.bulk import BulkResponse
+from app.utils.bulk import check_batch_size
+from app.utils.errors import ConflictError
+from app.utils.etag import PRIVATE_REVALIDATE, conditional_get
+from app.utils.lookup import IdListParams
+from app.utils.pagination import PageParams
+from app.utils.projection import fields_param
+from app.utils.serialization import respond
+from app.utils.streaming import ndjson_response, wants_ndjson
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 router = APIRouter(
@@ -15,28 +24,92 @@ router = APIRouter(
 
 user_service = UserService()
 
+# ETag / 304 handling for the read routes
+not_modified = conditional_get("users", cache_control=PRIVATE_REVALIDATE)
+
 class DeleteResponse(BaseModel):
     message: str
 
-@router.get("/", response_model=List[User])
-async def get_users():
-    """Get all users"""
-    return user_service.get_all_users()
+@router.get("/", response_model=List[User], dependencies=[Depends(not_modified)])
+async def get_users(request: Request, response: Response, page: PageParams = Depends(), lookup: IdListParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(User))):
+    """
+    Get all users, one page at a time (or as an NDJSON stream with Accept: application/x-ndjson).
+
+    With ?ids=1,2,3 or ?mongo_ids=..., returns just those users from one lookup:
+    one entry per requested id, in request order, null where it does not exist.
+    """
+    if lookup.requested:
+        return respond(response, await user_service.get_many_users(lookup.ids, lookup.mongo_ids, fields))
+    if wants_ndjson(request):
+        return ndjson_response(user_service.stream_users(page.after, fields=fields), response=response)
+    users = await user_service.get_all_users(page.fetch_limit, page.after, fields)
+    return respond(response, page.paginate(response, users))
 
-@router.get("/{user_id}", response_model=User)
-async def get_user(user_id: int):
+@router.get("/{user_id}", response_model=User, dependencies=[Depends(not_modified)])
+async def get_user(user_id: int, response: Response, fields: Optional[List[str]] = Depends(fields_param(User))):
     """Get a specific user by ID"""
-    user = user_service.get_user_by_id(user_id)
+    user = await user_service.get_user_by_id(user_id, fields)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return respond(response, user)
 
-@router.get("/type/{user_type}", response_model=List[User])
-async def get_users_by_type(user_type: str):
+@router.get("/type/{user_type}", response_model=List[User], dependencies=[Depends(not_modified)])
+async def get_users_by_type(user_type: str, request: Request, response: Response, page: PageParams = Depends(), fields: Optional[List[str]] = Depends(fields_param(User))):
     """Get all users of a specific type (teacher/student)"""
     if user_type not in ["teacher", "student"]:
         raise HTTPException(status_code=400, detail="User type must be 'teacher' or 'student'")
-    return user_service.get_users_by_type(user_type)
+    if wants_ndjson(request):
+        return ndjson_response(user_service.stream_users(page.after, user_type, fields=fields), response=response)
+    users = await user_service.get_users_by_type(user_type, page.fetch_limit, page.after, fields)
+    return respond(response, page.paginate(response, users))
+
+@router.post("/bulk", response_model=BulkResponse)
+async def create_users_bulk(users: List[Dict[str, Any]] = Body(..., description="Users to create, each shaped like the body of POST /")):
+    """
+    Create many users in one request (at most API_BULK_MAX_BATCH_SIZE).
+
+    Every item is validated before anything is written. Ids are reserved in one
+    step and the valid items are inserted together; `items` reports each one's
+    outcome in request order, so one bad item does not fail the batch.
+    """
+    check_batch_size(users)
+    try:
+        return await user_service.create_users_bulk(users)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.put("/bulk", response_model=BulkResponse)
+async def update_users_bulk(users: List[Dict[str, Any]] = Body(..., description="Updates, each the body of PUT /{id} plus the user's `id`")):
+    """
+    Update many users in one request (at most API_BULK_MAX_BATCH_SIZE).
+
+    An item with a `version` is only applied if the user is still at that
+    version; items for missing users or stale versions are reported as
+    `not_found` or `conflict` without affecting the rest.
+    """
+    check_batch_size(users)
+    try:
+        return await user_service.update_users_bulk(users)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/bulk/delete", response_model=BulkResponse)
+async def delete_users_bulk(users: List[Dict[str, Any]] = Body(..., description="Users to delete, each `{\"id\": ..., \"version\": ...}` (version optional)")):
+    """Delete many users in one request (at most API_BULK_MAX_BATCH_SIZE)"""
+    check_batch_size(users)
+    try:
+        return await user_service.delete_users_bulk(users)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
 async def create_user(user: UserCreate):
@@ -50,13 +123,13 @@ async def create_user(user: UserCreate):
     - **documents**: Optional list of document IDs
     """
     try:
-        return user_service.create_user(user)
+        return await user_service.create_user(user)
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
-        if "Email already registered" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Email already registered"
-            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -79,19 +152,21 @@ async def update_user(user_id: int, user: UserUpdate):
     - **documents**: Optional list of document IDs
     """
     try:
-        updated_user = user_service.update_user(user_id, user)
+        updated_user = await user_service.update_user(user_id, user)
         if not updated_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"User with ID {user_id} not found"
             )
         return updated_user
+    except HTTPException:
+        raise
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
-        if "Email already registered" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Email already registered"
-            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -103,16 +178,23 @@ async def update_user(user_id: int, user: UserUpdate):
         )
 
 @router.delete("/{user_id}", response_model=DeleteResponse, tags=["users"])
-async def delete_user(user_id: int):
+async def delete_user(user_id: int, version: Optional[int] = Query(None, ge=0, description="Only delete if the user is still at this version")):
     """Delete a user by ID"""
     try:
-        deleted = user_service.delete_user(user_id)
+        deleted = await user_service.delete_user(user_id, version)
         if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"User with ID {user_id} not found"
             )
         return DeleteResponse(message=f"User with ID {user_id} has been successfully deleted")
+    except HTTPException:
+        raise
+    except ConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -0,0 +1,40 @@
+from app.controller.grade_stats_controller import GradeStatsController
+from app.controller.reference_cache import reference_cache
+from app.utils.grade_stats import OVERALL, describe, merge
+from app.utils.timing import timed
+from typing import Dict, List, Optional
+
+@timed("service")
+class AnalyticsService:
+    def __init__(self):
+        self.grade_stats = GradeStatsController()
+
+    async def get_overall_grade_stats(self) -> Dict:
+        """Grade statistics over all documents"""
+        dimension, key = OVERALL
+        return describe(dimension, key, await self.grade_stats.get_summary(dimension, key))
+
+    async def get_grade_stats(self, dimension: str, key) -> Optional[Dict]:
+        """Grade statistics of one subject, teacher, document type or course (None if the course does not exist)"""
+        if dimension == "course":
+            snapshot = await reference_cache.get()
+            course = snapshot.courses_by_id.get(key)
+            if course is None:
+                return None
+            summaries = await self.grade_stats.get_summaries("subject", sorted(set(course.get("subjects", []))))
+            return describe(dimension, key, merge(summaries))
+        return describe(dimension, key, await self.grade_stats.get_summary(dimension, key))
+
+    async def list_grade_stats(self, dimension: str) -> List[Dict]:
+        """Grade statistics of every subject, teacher, document type or course that has documents"""
+        if dimension == "course":
+            # A course's documents are those of its subjects, so add up their summaries
+            snapshot = await reference_cache.get()
+            by_subject = {summary["key"]: summary for summary in await self.grade_stats.get_summaries("subject")}
+            stats = []
+            for course in snapshot.courses:
+                summaries = [by_subject[id] for id in sorted(set(course.get("subjects", []))) if id in by_subject]
+                if summaries:
+                    stats.append(describe(dimension, course["id"], merge(summaries)))
+            return stats
+        return [describe(dimension, summary["key"], summary) for summary in await self.grade_stats.get_summaries(dimension)]
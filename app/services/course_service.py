@@ -1,39 +1,58 @@
 from app.controller.course_controller import CourseController
 from app.models.course import Course, CourseCreate, CourseUpdate
-from typing import List, Optional
+from app.utils.bulk import plan_creates, plan_deletes, plan_updates, summarize
+from app.utils.errors import ConflictError
+from app.utils.serialization import RowShape
+from app.utils.timing import timed
+from typing import AsyncIterator, Dict, List, Optional
 
+@timed("service")
 class CourseService:
     def __init__(self):
         self.controller = CourseController()
+        self.shape = RowShape(Course)
 
-    def get_all_courses(self) -> List[Course]:
+    async def get_all_courses(self, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all courses"""
-        courses = self.controller.get_all_courses()
-        return [Course(**course) for course in courses]
+        courses = await self.controller.get_all_courses(limit, after, fields)
+        return [self.shape(course, fields) for course in courses]
 
-    def get_course_by_id(self, id: int) -> Optional[Course]:
+    async def stream_courses(self, after: Optional[int] = None, subject_id: Optional[int] = None, fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Stream courses, optionally only those that include one subject"""
+        async for course in self.controller.stream_courses(after, subject_id, fields=fields):
+            yield self.shape(course, fields)
+
+    async def get_course_by_id(self, id: int, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get a course by its ID"""
-        course = self.controller.get_course_by_id(id)
-        return Course(**course) if course else None
+        course = await self.controller.get_course_by_id(id, fields)
+        return self.shape(course, fields) if course else None
+
+    async def get_many_courses(self, ids: Optional[List[int]] = None, mongo_ids: Optional[List[str]] = None, fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get courses by ID (or by MongoDB _id) in one lookup, in request order with None for misses"""
+        if mongo_ids is not None:
+            courses = await self.controller.get_courses_by_mongo_ids(mongo_ids, fields)
+        else:
+            courses = await self.controller.get_courses_by_ids(ids or [], fields)
+        return [self.shape(course, fields) if course else None for course in courses]
 
-    def get_course_by_mongo_id(self, mongo_id: str) -> Optional[Course]:
+    async def get_course_by_mongo_id(self, mongo_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get a course by its MongoDB _id"""
-        course = self.controller.get_course_by_mongo_id(mongo_id)
-        return Course(**course) if course else None
+        course = await self.controller.get_course_by_mongo_id(mongo_id, fields)
+        return self.shape(course, fields) if course else None
 
-    def get_courses_by_subject(self, subject_id: int) -> List[Course]:
+    async def get_courses_by_subject(self, subject_id: int, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all courses that include a specific subject"""
-        courses = self.controller.get_courses_by_subject(subject_id)
-        return [Course(**course) for course in courses]
+        courses = await self.controller.get_courses_by_subject(subject_id, limit, after, fields)
+        return [self.shape(course, fields) for course in courses]
 
-    def create_course(self, course: CourseCreate) -> Course:
+    async def create_course(self, course: CourseCreate) -> Course:
         """Create a new course"""
         try:
             # Convert CourseCreate to dict for controller
             course_dict = course.model_dump()
             
             # Create course in database
-            created_course = self.controller.create_course(course_dict)
+            created_course = await self.controller.create_course(course_dict)
             
             # Convert to Course model
             return Course(**created_course)
@@ -42,33 +61,59 @@ class CourseService:
         except Exception as e:
             raise ValueError(f"Failed to create course: {str(e)}")
 
-    def update_course(self, course_id: int, course_data: CourseUpdate) -> Optional[Course]:
+    async def update_course(self, course_id: int, course_data: CourseUpdate) -> Optional[Course]:
         """Update a course"""
         try:
             # Convert Pydantic model to dict, excluding None values
             update_dict = {k: v for k, v in course_data.model_dump().items() if v is not None}
+            expected_version = update_dict.pop("version", None)
             
             if not update_dict:
                 raise ValueError("No valid fields to update")
 
             # Update course in controller
-            updated_course = self.controller.update_course(course_id, update_dict)
+            updated_course = await self.controller.update_course(course_id, update_dict, expected_version)
             
             if not updated_course:
                 return None
 
             # Convert to Course model and return
             return Course(**updated_course)
+        except ConflictError:
+            raise
         except ValueError as e:
             raise ValueError(str(e))
         except Exception as e:
             raise ValueError(f"Failed to update course: {str(e)}")
 
-    def delete_course(self, course_id: int) -> bool:
+    async def delete_course(self, course_id: int, expected_version: Optional[int] = None) -> bool:
         """Delete a course"""
         try:
-            return self.controller.delete_course(course_id)
+            return await self.controller.delete_course(course_id, expected_version)
+        except ConflictError:
+            raise
         except ValueError as e:
             raise ValueError(str(e))
         except Exception as e:
-            raise ValueError(f"Failed to delete course: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to delete course: {str(e)}")
+
+    async def create_courses_bulk(self, courses: List[Dict]) -> Dict:
+        """Create many courses; every item is validated before anything is written"""
+        planned, results = plan_creates(CourseCreate, courses)
+        if planned:
+            results += await self.controller.create_courses_bulk(planned)
+        return summarize(results)
+
+    async def update_courses_bulk(self, courses: List[Dict]) -> Dict:
+        """Update many courses; every item is validated before anything is written"""
+        planned, results = plan_updates(CourseUpdate, courses)
+        if planned:
+            results += await self.controller.update_courses_bulk(planned)
+        return summarize(results)
+
+    async def delete_courses_bulk(self, courses: List[Dict]) -> Dict:
+        """Delete many courses by id"""
+        planned, results = plan_deletes(courses)
+        if planned:
+            results += await self.controller.delete_courses_bulk(planned)
+        return summarize(results)
@@ -1,49 +1,104 @@
-from app.controller.document_controller import DocumentController
+from app.controller.document_controller import REFERENCE_FIELDS, DocumentController
 from app.models.document import Document, DocumentCreate, DocumentUpdate
-from typing import List, Optional
+from app.utils.bulk import item_result, plan_creates, plan_deletes, plan_updates, summarize
+from app.utils.document_query import DocumentQuery
+from app.utils.errors import ConflictError
+from app.utils.projection import apply_projection, with_fields
+from app.utils.serialization import RowShape
+from app.utils.timing import timed
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from bson import ObjectId
 
+def _valid_owner(owner: Optional[str]) -> bool:
+    """Whether a bulk item's owner is unset or a valid ObjectId"""
+    return owner is None or ObjectId.is_valid(owner)
+
+@timed("service")
 class DocumentService:
     def __init__(self):
         self.controller = DocumentController()
+        self.shape = RowShape(Document)
+
+    def _shape_expanded(self, document: Dict, fields: Optional[List[str]]) -> Dict:
+        """Shape a document that may carry `expanded` and reference fields read only to resolve it"""
+        shaped = self.shape(document, fields)
+        if fields:
+            shaped = apply_projection(shaped, fields)
+        if "expanded" in document:
+            shaped["expanded"] = document["expanded"]
+        return shaped
+
+    @staticmethod
+    def _read_fields(fields: Optional[List[str]], expand: Optional[List[str]]) -> Optional[List[str]]:
+        """Fields to read so that the requested references can be resolved"""
+        return with_fields(fields, [REFERENCE_FIELDS[name] for name in expand or []])
+
+    async def get_all_documents(self, query: DocumentQuery, limit: Optional[int] = None, after: Optional[Tuple[Any, int]] = None,
+                                fields: Optional[List[str]] = None, expand: Optional[List[str]] = None) -> List[Dict]:
+        """Get the documents matching a query, optionally with their references expanded.
+
+        With `fields`, the sort field is returned too, since the next-page cursor is built from it.
+        """
+        fields = query.read_fields(fields)
+        documents = await self.controller.get_all_documents(query, limit, after, self._read_fields(fields, expand))
+        if expand:
+            await self.controller.expand_documents(documents, expand)
+        return [self._shape_expanded(doc, fields) for doc in documents]
 
-    def get_all_documents(self) -> List[Document]:
-        """Get all documents"""
-        documents = self.controller.get_all_documents()
-        return [Document(**doc) for doc in documents]
+    async def stream_documents(self, query: DocumentQuery, after: Optional[Tuple[Any, int]] = None,
+                               fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Stream the documents matching a query"""
+        async for doc in self.controller.stream_documents(query, after, fields):
+            yield self.shape(doc, fields)
 
-    def get_document_by_id(self, document_id: int) -> Optional[Document]:
-        """Get a document by ID"""
-        document = self.controller.get_document_by_id(document_id)
-        return Document(**document) if document else None
+    async def get_document_by_id(self, document_id: int, fields: Optional[List[str]] = None, expand: Optional[List[str]] = None) -> Optional[Dict]:
+        """Get a document by ID, optionally with its references expanded"""
+        if expand:
+            document = await self.controller.get_document_expanded(document_id, expand, self._read_fields(fields, expand))
+        else:
+            document = await self.controller.get_document_by_id(document_id, fields)
+        return self._shape_expanded(document, fields) if document else None
 
-    def get_documents_by_type(self, doc_type: str) -> List[Document]:
+    async def get_many_documents(self, ids: Optional[List[int]] = None, mongo_ids: Optional[List[str]] = None, fields: Optional[List[str]] = None,
+                                 expand: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get documents by ID (or by MongoDB _id) in one lookup, in request order with None for misses"""
+        read_fields = self._read_fields(fields, expand)
+        if mongo_ids is not None:
+            documents = await self.controller.get_documents_by_mongo_ids(mongo_ids, read_fields)
+        else:
+            documents = await self.controller.get_documents_by_ids(ids or [], read_fields)
+        if expand:
+            await self.controller.expand_documents([document for document in documents if document], expand)
+        return [self._shape_expanded(document, fields) if document else None for document in documents]
+
+    async def get_documents_by_type(self, doc_type: str, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all documents of a specific type"""
-        documents = self.controller.get_documents_by_type(doc_type)
-        return [Document(**doc) for doc in documents]
+        documents = await self.controller.get_documents_by_type(doc_type, limit, after, fields)
+        return [self.shape(doc, fields) for doc in documents]
 
-    def get_documents_by_teacher(self, teacher_id: int) -> List[Document]:
+    async def get_documents_by_teacher(self, teacher_id: int, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all documents created by a specific teacher"""
-        documents = self.controller.get_documents_by_teacher(teacher_id)
-        return [Document(**doc) for doc in documents]
+        documents = await self.controller.get_documents_by_teacher(teacher_id, limit, after, fields)
+        return [self.shape(doc, fields) for doc in documents]
 
-    def get_documents_by_subject(self, subject_id: int) -> List[Document]:
+    async def get_documents_by_subject(self, subject_id: int, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all documents related to a specific subject"""
-        documents = self.controller.get_documents_by_subject(subject_id)
-        return [Document(**doc) for doc in documents]
+        documents = await self.controller.get_documents_by_subject(subject_id, limit, after, fields)
+        return [self.shape(doc, fields) for doc in documents]
 
-    def get_documents_by_owner(self, owner_id: str) -> List[Document]:
+    async def get_documents_by_owner(self, owner_id: str, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all documents owned by a specific user"""
-        documents = self.controller.get_documents_by_owner(owner_id)
-        return [Document(**doc) for doc in documents]
+        documents = await self.controller.get_documents_by_owner(owner_id, limit, after, fields)
+        return [self.shape(doc, fields) for doc in documents]
 
-    def create_document(self, document: DocumentCreate) -> Document:
+    async def create_document(self, document: DocumentCreate) -> Document:
         """Create a new document"""
         try:
             # Convert DocumentCreate to dict for controller
             document_dict = document.model_dump()
             
             # Create document in database
-            created_document = self.controller.create_document(document_dict)
+            created_document = await self.controller.create_document(document_dict)
             
             # Convert to Document model
             return Document(**created_document)
@@ -52,33 +107,65 @@ class DocumentService:
         except Exception as e:
             raise ValueError(f"Failed to create document: {str(e)}")
 
-    def update_document(self, document_id: int, document_data: DocumentUpdate) -> Optional[Document]:
+    async def update_document(self, document_id: int, document_data: DocumentUpdate) -> Optional[Document]:
         """Update a document"""
         try:
             # Convert Pydantic model to dict, excluding None values
             update_dict = {k: v for k, v in document_data.model_dump().items() if v is not None}
+            expected_version = update_dict.pop("version", None)
             
             if not update_dict:
                 raise ValueError("No valid fields to update")
 
             # Update document in controller
-            updated_document = self.controller.update_document(document_id, update_dict)
+            updated_document = await self.controller.update_document(document_id, update_dict, expected_version)
             
             if not updated_document:
                 return None
 
             # Convert to Document model and return
             return Document(**updated_document)
+        except ConflictError:
+            raise
         except ValueError as e:
             raise ValueError(str(e))
         except Exception as e:
             raise ValueError(f"Failed to update document: {str(e)}")
 
-    def delete_document(self, document_id: int) -> bool:
+    async def delete_document(self, document_id: int, expected_version: Optional[int] = None) -> bool:
         """Delete a document"""
         try:
-            return self.controller.delete_document(document_id)
+            return await self.controller.delete_document(document_id, expected_version)
+        except ConflictError:
+            raise
         except ValueError as e:
             raise ValueError(str(e))
         except Exception as e:
-            raise ValueError(f"Failed to delete document: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Failed to delete document: {str(e)}")
+
+    async def create_documents_bulk(self, documents: List[Dict]) -> Dict:
+        """Create many documents; every item is validated before anything is written"""
+        planned, results = plan_creates(DocumentCreate, documents)
+        results += [item_result(index, "invalid", error=f"owner: {data['owner']} is not a valid ObjectId")
+                    for index, data in planned if not _valid_owner(data["owner"])]
+        planned = [(index, data) for index, data in planned if _valid_owner(data["owner"])]
+        if planned:
+            results += await self.controller.create_documents_bulk(planned)
+        return summarize(results)
+
+    async def update_documents_bulk(self, documents: List[Dict]) -> Dict:
+        """Update many documents; every item is validated before anything is written"""
+        planned, results = plan_updates(DocumentUpdate, documents)
+        results += [item_result(index, "invalid", id, error=f"owner: {changes['owner']} is not a valid ObjectId")
+                    for index, id, changes, _ in planned if not _valid_owner(changes.get("owner"))]
+        planned = [update for update in planned if _valid_owner(update[2].get("owner"))]
+        if planned:
+            results += await self.controller.update_documents_bulk(planned)
+        return summarize(results)
+
+    async def delete_documents_bulk(self, documents: List[Dict]) -> Dict:
+        """Delete many documents by id"""
+        planned, results = plan_deletes(documents)
+        if planned:
+            results += await self.controller.delete_documents_bulk(planned)
+        return summarize(results)
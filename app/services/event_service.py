@@ -0,0 +1,40 @@
+from app.controller.change_feed import CHANGE_FEED_SHAPES, change_feed
+from typing import AsyncIterator, List, Optional
+import asyncio
+import os
+
+# A comment line is sent after this many idle seconds, so proxies keep the connection open
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# How long browsers wait before reconnecting a dropped stream
+SSE_RETRY_MS = 3000
+
+# Collections /events can follow
+EVENT_COLLECTIONS = list(CHANGE_FEED_SHAPES)
+
+class EventService:
+    async def open(self):
+        """Make sure changes can be followed (raises ChangeFeedUnavailable without a replica set)"""
+        await change_feed.start()
+
+    async def stream(self, collections: List[str], last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """SSE frames for one client until it disconnects or falls too far behind.
+
+        The client is registered when the response starts streaming, not
+        before, so a request dropped before its first byte leaves no
+        subscriber behind; the finally below removes it once it was added.
+        """
+        subscriber = await change_feed.subscribe(collections, last_event_id)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if frame is None:
+                    # Overflowed (or shutting down): the browser reconnects with Last-Event-ID and replays
+                    return
+                yield frame
+        finally:
+            change_feed.unsubscribe(subscriber)
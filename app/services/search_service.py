@@ -0,0 +1,49 @@
+from app.controller.document_controller import DocumentController
+from app.controller.subject_controller import SubjectController
+from app.models.search import DocumentHit, SubjectHit
+from app.utils.search import SearchPosition
+from app.utils.serialization import RowShape
+from app.utils.timing import timed
+from typing import Dict, List, Optional, Tuple
+import asyncio
+
+# Entity types /search returns, each as its own group of hits
+SEARCH_ENTITIES = ("documents", "subjects")
+
+@timed("service")
+class SearchService:
+    def __init__(self):
+        self.document_controller = DocumentController()
+        self.subject_controller = SubjectController()
+        self.shapes = {"documents": RowShape(DocumentHit), "subjects": RowShape(SubjectHit)}
+
+    async def search(self, text: str, entities: List[str], positions: Dict[str, Optional[SearchPosition]],
+                     limit: int, type: Optional[str] = None,
+                     subject_id: Optional[int] = None) -> Tuple[Dict, Dict[str, Optional[SearchPosition]]]:
+        """
+        Ranked hits per entity type, plus where each group's next page starts.
+
+        `positions` maps an entity to the (score, id) its page resumes after;
+        an entity mapped to None has no more hits and is skipped. In the
+        returned positions, None likewise marks a group as finished. `type`
+        only narrows documents; `subject_id` narrows both groups.
+        """
+        async def fetch(entity: str) -> List[Dict]:
+            if entity in positions and positions[entity] is None:
+                return []
+            after = positions.get(entity)
+            # One lookahead row tells whether the group has a next page
+            if entity == "documents":
+                return await self.document_controller.search_documents(text, type, subject_id, after, limit + 1)
+            return await self.subject_controller.search_subjects(text, subject_id, after, limit + 1)
+
+        groups = await asyncio.gather(*(fetch(entity) for entity in entities))
+        results: Dict = {"query": text, **{entity: [] for entity in SEARCH_ENTITIES}}
+        next_positions: Dict[str, Optional[SearchPosition]] = {}
+        for entity, hits in zip(entities, groups):
+            next_positions[entity] = None
+            if len(hits) > limit:
+                hits = hits[:limit]
+                next_positions[entity] = (hits[-1]["score"], hits[-1]["id"])
+            results[entity] = [self.shapes[entity](hit) for hit in hits]
+        return results, next_positions
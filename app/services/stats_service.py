@@ -0,0 +1,12 @@
+from app.controller.stats_controller import StatsController
+from app.utils.timing import timed
+from typing import Dict
+
+@timed("service")
+class StatsService:
+    def __init__(self):
+        self.controller = StatsController()
+
+    async def get_stats(self) -> Dict:
+        """Get collection counts and per-type breakdowns"""
+        return await self.controller.get_stats()
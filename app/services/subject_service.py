@@ -1,74 +1,121 @@
 from app.controller.subject_controller import SubjectController
 from app.models.subject import Subject, SubjectCreate, SubjectUpdate
-from typing import List, Optional
+from app.utils.bulk import plan_creates, plan_deletes, plan_updates, summarize
+from app.utils.errors import ConflictError
+from app.utils.serialization import RowShape
+from app.utils.timing import timed
+from typing import AsyncIterator, Dict, List, Optional
 
+@timed("service")
 class SubjectService:
     def __init__(self):
         self.controller = SubjectController()
+        self.shape = RowShape(Subject)
 
-    def get_all_subjects(self) -> List[Subject]:
+    async def get_all_subjects(self, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all subjects"""
-        subjects = self.controller.get_all_subjects()
-        return [Subject(**subject) for subject in subjects]
+        subjects = await self.controller.get_all_subjects(limit, after, fields)
+        return [self.shape(subject, fields) for subject in subjects]
 
-    def get_subject_by_id(self, id: int) -> Optional[Subject]:
+    async def stream_subjects(self, after: Optional[int] = None, course_id: Optional[int] = None, fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Stream subjects, optionally only those of one course"""
+        async for subject in self.controller.stream_subjects(after, course_id, fields=fields):
+            yield self.shape(subject, fields)
+
+    async def get_subject_by_id(self, id: int, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get a subject by its ID"""
-        subject = self.controller.get_subject_by_id(id)
-        return Subject(**subject) if subject else None
+        subject = await self.controller.get_subject_by_id(id, fields)
+        return self.shape(subject, fields) if subject else None
+
+    async def get_many_subjects(self, ids: Optional[List[int]] = None, mongo_ids: Optional[List[str]] = None, fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get subjects by ID (or by MongoDB _id) in one lookup, in request order with None for misses"""
+        if mongo_ids is not None:
+            subjects = await self.controller.get_subjects_by_mongo_ids(mongo_ids, fields)
+        else:
+            subjects = await self.controller.get_subjects_by_ids(ids or [], fields)
+        return [self.shape(subject, fields) if subject else None for subject in subjects]
 
-    def get_subjects_by_course(self, course_id: int) -> List[Subject]:
+    async def get_subjects_by_course(self, course_id: int, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all subjects related to a specific course"""
-        subjects = self.controller.get_subjects_by_course(course_id)
-        return [Subject(**subject) for subject in subjects]
+        subjects = await self.controller.get_subjects_by_course(course_id, limit, after, fields)
+        return [self.shape(subject, fields) for subject in subjects]
 
-    def get_subject_by_mongo_id(self, mongo_id: str) -> Optional[Subject]:
+    async def get_subject_by_mongo_id(self, mongo_id: str, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get a subject by its MongoDB _id"""
-        subject = self.controller.get_subject_by_mongo_id(mongo_id)
-        return Subject(**subject) if subject else None
+        subject = await self.controller.get_subject_by_mongo_id(mongo_id, fields)
+        return self.shape(subject, fields) if subject else None
 
-    def create_subject(self, subject: SubjectCreate) -> Subject:
+    async def create_subject(self, subject: SubjectCreate) -> Subject:
         """Create a new subject"""
         try:
             # Convert SubjectCreate to dict for controller
             subject_dict = subject.model_dump()
             
             # Create subject in database
-            created_subject = self.controller.create_subject(subject_dict)
+            created_subject = await self.controller.create_subject(subject_dict)
             
             # Convert to Subject model
             return Subject(**created_subject)
+        except ConflictError:
+            raise
         except ValueError as e:
             raise ValueError(str(e))
         except Exception as e:
             raise ValueError(f"Failed to create subject: {str(e)}")
 
-    def update_subject(self, subject_id: int, subject_data: SubjectUpdate) -> Optional[Subject]:
+    async def update_subject(self, subject_id: int, subject_data: SubjectUpdate) -> Optional[Subject]:
         """Update a subject"""
         try:
             # Convert Pydantic model to dict, excluding None values
             update_dict = {k: v for k, v in subject_data.model_dump().items() if v is not None}
+            expected_version = update_dict.pop("version", None)
             
             if not update_dict:
                 raise ValueError("No valid fields to update")
 
             # Update subject in controller
-            updated_subject = self.controller.update_subject(subject_id, update_dict)
+            updated_subject = await self.controller.update_subject(subject_id, update_dict, expected_version)
             
             if not updated_subject:
                 return None
 
             # Convert to Subject model and return
             return Subject(**updated_subject)
+        except ConflictError:
+            raise
         except ValueError as e:
             raise ValueError(str(e))
         except Exception as e:
             raise ValueError(f"Failed to update subject: {str(e)}")
 
-    def delete_subject(self, subject_id: int) -> bool:
+    async def delete_subject(self, subject_id: int, expected_version: Optional[int] = None) -> bool:
         """Delete a subject"""
         try:
-            return self.controller.delete_subject(subject_id)
+            return await self.controller.delete_subject(subject_id, expected_version)
+        except ConflictError:
+            raise
         except ValueError as e:
             raise ValueError(str(e))
         except Exception as e:
-            raise ValueError(f"Failed to delete subject: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to delete subject: {str(e)}")
+
+    async def create_subjects_bulk(self, subjects: List[Dict]) -> Dict:
+        """Create many subjects; every item is validated before anything is written"""
+        planned, results = plan_creates(SubjectCreate, subjects)
+        if planned:
+            results += await self.controller.create_subjects_bulk(planned)
+        return summarize(results)
+
+    async def update_subjects_bulk(self, subjects: List[Dict]) -> Dict:
+        """Update many subjects; every item is validated before anything is written"""
+        planned, results = plan_updates(SubjectUpdate, subjects)
+        if planned:
+            results += await self.controller.update_subjects_bulk(planned)
+        return summarize(results)
+
+    async def delete_subjects_bulk(self, subjects: List[Dict]) -> Dict:
+        """Delete many subjects by id"""
+        planned, results = plan_deletes(subjects)
+        if planned:
+            results += await self.controller.delete_subjects_bulk(planned)
+        return summarize(results)
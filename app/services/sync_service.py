@@ -0,0 +1,71 @@
+from app.controller.sync_controller import SYNC_TOMBSTONE_RETENTION_DAYS, SyncController
+from app.models.course import Course
+from app.models.document import Document
+from app.models.subject import Subject
+from app.models.user import User
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.serialization import RowShape
+from app.utils.timing import timed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+
+class SyncTokenExpired(Exception):
+    """The token is older than the tombstones are kept, so deletes since then may be lost"""
+
+
+def encode_sync_token(seq: int) -> str:
+    """Token for a position in the change sequence, stamped with when it was handed out"""
+    return encode_cursor({"seq": seq, "at": datetime.utcnow().isoformat()})
+
+
+def parse_sync_token(token: str) -> int:
+    """The position a token resumes from; ValueError if malformed, SyncTokenExpired if too old"""
+    try:
+        values = decode_cursor(token)
+        seq = int(values["seq"])
+        issued = datetime.fromisoformat(values["at"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid sync token")
+    if datetime.utcnow() - issued > timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS):
+        raise SyncTokenExpired(
+            f"Sync token is older than {SYNC_TOMBSTONE_RETENTION_DAYS} days; sync again without `since`"
+        )
+    return seq
+
+
+@timed("service")
+class SyncService:
+    def __init__(self):
+        self.controller = SyncController()
+        self.shapes = {"users": RowShape(User), "documents": RowShape(Document),
+                       "subjects": RowShape(Subject), "courses": RowShape(Course)}
+
+    async def changes(self, since: Optional[int], collections: List[str], limit: int) -> Dict:
+        """
+        One page of changes after position `since` (everything when None), oldest first.
+
+        Pages stop at the sync horizon, so a change still being written is
+        never skipped. Without `since` the client holds no records yet, so
+        deletes are left out.
+        """
+        start = since or 0
+        until = await self.controller.horizon()
+        # One lookahead row tells whether another page is waiting
+        changes = await self.controller.changes_between(start, until, collections, limit + 1, deletes=since is not None)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        position = changes[-1]["seq"] if has_more else max(start, until)
+        return {
+            "changes": [self._shape(change) for change in changes],
+            "next": encode_sync_token(position),
+            "has_more": has_more,
+        }
+
+    def _shape(self, change: Dict) -> Dict:
+        if "record" in change:
+            record = change["record"]
+            return {"collection": change["collection"], "operation": "upsert", "id": record["id"],
+                    "seq": change["seq"], "record": self.shapes[change["collection"]](record)}
+        return {"collection": change["collection"], "operation": "delete", "id": change["id"],
+                "seq": change["seq"], "record": None}
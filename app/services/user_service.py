@@ -1,37 +1,58 @@
 from app.controller.user_controller import UserController
 from app.models.user import User, UserCreate, UserUpdate
-from typing import List, Optional
+from app.utils.bulk import plan_creates, plan_deletes, plan_updates, summarize
+from app.utils.errors import ConflictError
+from app.utils.serialization import RowShape
+from app.utils.timing import timed
+from typing import AsyncIterator, Dict, List, Optional
 
+@timed("service")
 class UserService:
     def __init__(self):
         self.controller = UserController()
+        self.shape = RowShape(User)
 
-    def get_all_users(self) -> List[User]:
+    async def get_all_users(self, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all users"""
-        users = self.controller.get_all_users()
-        return [User(**{**user, "_id": user.get("_id")}) for user in users]
+        users = await self.controller.get_all_users(limit, after, fields)
+        return [self.shape(user, fields) for user in users]
 
-    def get_user_by_id(self, user_id: int) -> Optional[User]:
+    async def stream_users(self, after: Optional[int] = None, user_type: Optional[str] = None, fields: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """Stream users, optionally of a single type"""
+        async for user in self.controller.stream_users(after, user_type, fields=fields):
+            yield self.shape(user, fields)
+
+    async def get_user_by_id(self, user_id: int, fields: Optional[List[str]] = None) -> Optional[Dict]:
         """Get a user by ID"""
-        user = self.controller.get_user_by_id(user_id)
-        return User(**{**user, "_id": user.get("_id")}) if user else None
+        user = await self.controller.get_user_by_id(user_id, fields)
+        return self.shape(user, fields) if user else None
+
+    async def get_many_users(self, ids: Optional[List[int]] = None, mongo_ids: Optional[List[str]] = None, fields: Optional[List[str]] = None) -> List[Optional[Dict]]:
+        """Get users by ID (or by MongoDB _id) in one lookup, in request order with None for misses"""
+        if mongo_ids is not None:
+            users = await self.controller.get_users_by_mongo_ids(mongo_ids, fields)
+        else:
+            users = await self.controller.get_users_by_ids(ids or [], fields)
+        return [self.shape(user, fields) if user else None for user in users]
 
-    def get_users_by_type(self, user_type: str) -> List[User]:
+    async def get_users_by_type(self, user_type: str, limit: Optional[int] = None, after: Optional[int] = None, fields: Optional[List[str]] = None) -> List[Dict]:
         """Get all users of a specific type"""
-        users = self.controller.get_users_by_type(user_type)
-        return [User(**{**user, "_id": user.get("_id")}) for user in users]
+        users = await self.controller.get_users_by_type(user_type, limit, after, fields)
+        return [self.shape(user, fields) for user in users]
 
-    def create_user(self, user_data: UserCreate) -> User:
+    async def create_user(self, user_data: UserCreate) -> User:
         """Create a new user"""
         try:
             # Convert Pydantic model to dict
             user_dict = user_data.model_dump()
             
             # Create user in controller
-            created_user = self.controller.create_user(user_dict)
+            created_user = await self.controller.create_user(user_dict)
             
             # Convert to User model and return
-            return User(**{**created_user, "_id": created_user.get("_id")})
+            return User(**created_user)
+        except ConflictError:
+            raise
         except ValueError as e:
             print(f"Validation error while creating user: {str(e)}")
             raise ValueError(str(e))
@@ -39,23 +60,26 @@ class UserService:
             print(f"Unexpected error while creating user: {str(e)}")
             raise Exception(f"Error creating user: {str(e)}")
 
-    def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
+    async def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
         """Update a user"""
         try:
             # Convert Pydantic model to dict, excluding None values
             update_dict = {k: v for k, v in user_data.model_dump().items() if v is not None}
+            expected_version = update_dict.pop("version", None)
             
             if not update_dict:
                 raise ValueError("No valid fields to update")
 
             # Update user in controller
-            updated_user = self.controller.update_user(user_id, update_dict)
+            updated_user = await self.controller.update_user(user_id, update_dict, expected_version)
             
             if not updated_user:
                 return None
 
             # Convert to User model and return
-            return User(**{**updated_user, "_id": updated_user.get("_id")})
+            return User(**updated_user)
+        except ConflictError:
+            raise
         except ValueError as e:
             print(f"Validation error while updating user: {str(e)}")
             raise ValueError(str(e))
@@ -63,11 +87,34 @@ class UserService:
             print(f"Unexpected error while updating user: {str(e)}")
             raise Exception(f"Error updating user: {str(e)}")
 
-    def delete_user(self, user_id: int) -> bool:
+    async def delete_user(self, user_id: int, expected_version: Optional[int] = None) -> bool:
         """Delete a user"""
         try:
-            return self.controller.delete_user(user_id)
+            return await self.controller.delete_user(user_id, expected_version)
+        except ConflictError:
+            raise
         except ValueError as e:
             raise ValueError(str(e))
         except Exception as e:
-            raise ValueError(f"Failed to delete user: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to delete user: {str(e)}")
+
+    async def create_users_bulk(self, users: List[Dict]) -> Dict:
+        """Create many users; every item is validated before anything is written"""
+        planned, results = plan_creates(UserCreate, users)
+        if planned:
+            results += await self.controller.create_users_bulk(planned)
+        return summarize(results)
+
+    async def update_users_bulk(self, users: List[Dict]) -> Dict:
+        """Update many users; every item is validated before anything is written"""
+        planned, results = plan_updates(UserUpdate, users)
+        if planned:
+            results += await self.controller.update_users_bulk(planned)
+        return summarize(results)
+
+    async def delete_users_bulk(self, users: List[Dict]) -> Dict:
+        """Delete many users by id"""
+        planned, results = plan_deletes(users)
+        if planned:
+            results += await self.controller.delete_users_bulk(planned)
+        return summarize(results)
@@ -0,0 +1,28 @@
+from fastapi import Header, HTTPException, status
+from typing import Optional
+import hmac
+import os
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def admin_token_error(x_admin_token: Optional[str]) -> Optional[HTTPException]:
+    """Why a request with this X-Admin-Token may not use admin features, or None if it may"""
+    if not ADMIN_TOKEN:
+        return HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them"
+        )
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or wrong X-Admin-Token header"
+        )
+    return None
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, description="Must match the server's ADMIN_TOKEN")):
+    """Dependency guarding /admin routes; they are disabled while ADMIN_TOKEN is unset"""
+    error = admin_token_error(x_admin_token)
+    if error is not None:
+        raise error
@@ -0,0 +1,261 @@
+from fastapi import HTTPException, status
+from app.models.bulk import BulkDeleteItem
+from app.utils.concurrency import VERSION_FIELD, version_filter
+from pydantic import BaseModel, ValidationError
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Dict, List, Optional, Tuple, Type
+import os
+
+# Largest number of items accepted by one bulk request
+BULK_MAX_BATCH_SIZE = int(os.getenv("API_BULK_MAX_BATCH_SIZE", "1000"))
+DUPLICATE_KEY_ERROR = 11000
+SUCCESS_STATUSES = ("created", "updated", "deleted")
+
+# An update to apply: (position in the request, record id, fields to set, expected version)
+PlannedUpdate = Tuple[int, int, Dict, Optional[int]]
+# A delete to apply: (position in the request, record id, expected version)
+PlannedDelete = Tuple[int, int, Optional[int]]
+
+
+def check_batch_size(items: List) -> None:
+    """Reject empty batches and batches over BULK_MAX_BATCH_SIZE before any work is done"""
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch must contain at least one item")
+    if len(items) > BULK_MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch of {len(items)} items exceeds the maximum of {BULK_MAX_BATCH_SIZE}"
+        )
+
+
+def item_result(index: int, status: str, id: Optional[int] = None, **extra) -> Dict:
+    """One entry of a bulk response"""
+    return {"index": index, "status": status, "id": id, **extra}
+
+
+def validate_item(model: Type[BaseModel], index: int, item: Dict) -> Tuple[Optional[BaseModel], Optional[Dict]]:
+    """Validate one raw item; return (model, None) or (None, an 'invalid' result)"""
+    try:
+        return model(**item), None
+    except ValidationError as e:
+        message = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+        return None, item_result(index, "invalid", item.get("id") if isinstance(item, dict) else None, error=message)
+    except (TypeError, ValueError) as e:
+        return None, item_result(index, "invalid", error=str(e))
+
+
+def summarize(results: List[Dict]) -> Dict:
+    """Order results by request position and count successes and failures"""
+    results = sorted(results, key=lambda result: result["index"])
+    succeeded = sum(1 for result in results if result["status"] in SUCCESS_STATUSES)
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "items": results}
+
+
+def any_applied(results: List[Dict]) -> bool:
+    """Whether at least one item of a batch was written"""
+    return any(result["status"] in SUCCESS_STATUSES for result in results)
+
+
+def _write_errors(error: BulkWriteError) -> Dict[int, Dict]:
+    return {write_error["index"]: write_error for write_error in error.details.get("writeErrors", [])}
+
+
+def _failed_result(index: int, id: int, write_error: Dict) -> Dict:
+    status = "conflict" if write_error.get("code") == DUPLICATE_KEY_ERROR else "error"
+    return item_result(index, status, id, error=write_error.get("errmsg"))
+
+
+async def insert_batch(collection, positions: List[int], docs: List[Dict]) -> List[Dict]:
+    """Insert prepared documents with one unordered insert_many.
+
+    Unordered, so one rejected document (e.g. a duplicate email) does not stop
+    the rest; each failure is reported against its own position.
+    """
+    errors: Dict[int, Dict] = {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = _write_errors(e)
+    results = []
+    for offset, (index, doc) in enumerate(zip(positions, docs)):
+        if offset in errors:
+            results.append(_failed_result(index, None, errors[offset]))
+        else:
+            results.append(item_result(index, "created", doc["id"], _id=str(doc["_id"]), version=doc.get(VERSION_FIELD)))
+    return results
+
+
+async def read_current(collection, ids: List[int], fields: Tuple[str, ...] = ()) -> Dict[int, Dict]:
+    """Current _id, id, version and `fields` of the given records, keyed by id, in one query"""
+    projection = {"_id": 1, "id": 1, VERSION_FIELD: 1, **{field: 1 for field in fields}}
+    return {doc["id"]: doc async for doc in collection.find({"id": {"$in": ids}}, projection)}
+
+
+def _versions(current: Dict[int, Dict]) -> Dict[int, int]:
+    return {id: doc.get(VERSION_FIELD) or 0 for id, doc in current.items()}
+
+
+async def update_batch(collection, updates: List[PlannedUpdate], label: str,
+                       current: Optional[Dict[int, Dict]] = None) -> List[Dict]:
+    """Apply many updates with one unordered bulk_write.
+
+    Current versions are read in one query first (or taken from `current`,
+    as returned by read_current), to report missing records and stale
+    expected versions per item. Each write is guarded by the _id and version
+    read, so a record changed in between is reported as a conflict instead
+    of being overwritten, and an `updated` item is known to have started
+    from exactly the record in `current`.
+
+    If every guarded write matched, every item applied, whatever other
+    writes have landed since. Otherwise the records are read again, as in
+    delete_batch: a missing one was deleted in between, and one that is not
+    exactly the version this batch wrote, with its changes, was modified in
+    between.
+    """
+    if current is None:
+        current = await read_current(collection, [update[1] for update in updates])
+    object_ids = {id: doc["_id"] for id, doc in current.items()}
+    current = _versions(current)
+    results, ops, pending = [], [], []
+    for index, id, changes, expected_version in updates:
+        if id not in current:
+            results.append(item_result(index, "not_found", id, error=f"{label} {id} not found"))
+        elif expected_version is not None and current[id] != expected_version:
+            results.append(item_result(index, "conflict", id, version=current[id],
+                                       error=f"{label} {id} has been modified (expected version {expected_version}, current version {current[id]})"))
+        else:
+            ops.append(UpdateOne({"_id": object_ids[id], **version_filter(current[id])},
+                                 {"$set": changes, "$inc": {VERSION_FIELD: 1}}))
+            pending.append((index, id, changes, current[id]))
+    if not ops:
+        return results
+
+    errors: Dict[int, Dict] = {}
+    matched = 0
+    try:
+        matched = (await collection.bulk_write(ops, ordered=False)).matched_count
+    except BulkWriteError as e:
+        errors = _write_errors(e)
+        matched = e.details.get("nMatched", 0)
+
+    remaining = None
+    if matched < len(ops) - len(errors):
+        fields = tuple({field for _, _, changes, _ in pending for field in changes})
+        remaining = await read_current(collection, [id for _, id, _, _ in pending], fields)
+    for offset, (index, id, changes, before) in enumerate(pending):
+        if offset in errors:
+            results.append(_failed_result(index, id, errors[offset]))
+        elif remaining is not None and id not in remaining:
+            results.append(item_result(index, "not_found", id, error=f"{label} {id} was deleted while the batch was applied"))
+        elif remaining is not None and not _written(remaining[id], changes, before + 1):
+            results.append(item_result(index, "conflict", id, error=f"{label} {id} was modified while the batch was applied"))
+        else:
+            results.append(item_result(index, "updated", id, version=before + 1))
+    return results
+
+
+def _written(record: Dict, changes: Dict, version: int) -> bool:
+    """Whether a record is at `version` with `changes` applied, i.e. as the guarded update left it"""
+    return record.get(VERSION_FIELD) == version and all(record.get(field) == value for field, value in changes.items())
+
+
+async def delete_batch(collection, deletes: List[PlannedDelete], label: str,
+                       current: Optional[Dict[int, Dict]] = None) -> List[Dict]:
+    """Delete many records with one unordered bulk_write, reporting each item like update_batch"""
+    if current is None:
+        current = await read_current(collection, [delete[1] for delete in deletes])
+    current = _versions(current)
+    results, ops, pending = [], [], []
+    for index, id, expected_version in deletes:
+        if id not in current:
+            results.append(item_result(index, "not_found", id, error=f"{label} {id} not found"))
+        elif expected_version is not None and current[id] != expected_version:
+            results.append(item_result(index, "conflict", id, version=current[id],
+                                       error=f"{label} {id} has been modified (expected version {expected_version}, current version {current[id]})"))
+        else:
+            ops.append(DeleteOne({"id": id, **version_filter(current[id])}))
+            pending.append((index, id))
+    if not ops:
+        return results
+
+    errors: Dict[int, Dict] = {}
+    deleted = 0
+    try:
+        deleted = (await collection.bulk_write(ops, ordered=False)).deleted_count
+    except BulkWriteError as e:
+        errors = _write_errors(e)
+        deleted = e.details.get("nRemoved", 0)
+
+    remaining = None
+    if deleted < len(ops) - len(errors):
+        remaining = await read_current(collection, [id for _, id in pending])
+    for offset, (index, id) in enumerate(pending):
+        if offset in errors:
+            results.append(_failed_result(index, id, errors[offset]))
+        elif remaining is not None and id in remaining:
+            results.append(item_result(index, "conflict", id, error=f"{label} {id} was modified while the batch was applied"))
+        else:
+            results.append(item_result(index, "deleted", id))
+    return results
+
+
+
+def _split_ids(items: List[Dict]) -> Tuple[List[Tuple[int, Dict]], List[Dict]]:
+    """Pair each item with its position, rejecting items without an integer id or repeating one"""
+    seen = set()
+    accepted, rejected = [], []
+    for index, item in enumerate(items):
+        id = item.get("id") if isinstance(item, dict) else None
+        if not isinstance(id, int) or isinstance(id, bool):
+            rejected.append(item_result(index, "invalid", error="id: an integer id is required"))
+        elif id in seen:
+            rejected.append(item_result(index, "invalid", id, error=f"id {id} appears more than once in the batch"))
+        else:
+            seen.add(id)
+            accepted.append((index, item))
+    return accepted, rejected
+
+
+def plan_creates(model: Type[BaseModel], items: List[Dict]) -> Tuple[List[Tuple[int, Dict]], List[Dict]]:
+    """Validate a create batch up front: (position, fields) for valid items, results for the rest"""
+    planned, rejected = [], []
+    for index, item in enumerate(items):
+        data, invalid = validate_item(model, index, item)
+        if invalid:
+            rejected.append(invalid)
+        else:
+            planned.append((index, data.model_dump()))
+    return planned, rejected
+
+
+def plan_updates(model: Type[BaseModel], items: List[Dict]) -> Tuple[List[PlannedUpdate], List[Dict]]:
+    """Validate an update batch up front; each item is an update model body plus the record's `id`"""
+    accepted, rejected = _split_ids(items)
+    planned = []
+    for index, item in accepted:
+        data, invalid = validate_item(model, index, {key: value for key, value in item.items() if key != "id"})
+        if invalid:
+            invalid["id"] = item["id"]
+            rejected.append(invalid)
+            continue
+        changes = {key: value for key, value in data.model_dump().items() if value is not None}
+        expected_version = changes.pop(VERSION_FIELD, None)
+        if not changes:
+            rejected.append(item_result(index, "invalid", item["id"], error="No valid fields to update"))
+            continue
+        planned.append((index, item["id"], changes, expected_version))
+    return planned, rejected
+
+
+def plan_deletes(items: List[Dict]) -> Tuple[List[PlannedDelete], List[Dict]]:
+    """Validate a delete batch up front; each item is `{"id": ..., "version": ...}`"""
+    accepted, rejected = _split_ids(items)
+    planned = []
+    for index, item in accepted:
+        data, invalid = validate_item(BulkDeleteItem, index, item)
+        if invalid:
+            rejected.append(invalid)
+        else:
+            planned.append((index, data.id, data.version))
+    return planned, rejected
@@ -0,0 +1,69 @@
+from app.utils.errors import ConflictError
+from pymongo import ReturnDocument
+from typing import Dict, Optional
+
+# Per-record revision counter, incremented by every update
+VERSION_FIELD = "version"
+INITIAL_VERSION = 1
+
+# Which side of an update find_one_and_update returns: ReturnDocument.BEFORE or
+# ReturnDocument.AFTER. pymongo defines those as plain bools, not an enum, so
+# this is what its own signature (and a type checker) accepts for them.
+ReturnDocumentOption = bool
+
+
+def version_filter(expected_version: int) -> Dict:
+    """Match a record at the given version (records written before versioning count as 0)"""
+    if expected_version == 0:
+        return {VERSION_FIELD: {"$in": [0, None]}}
+    return {VERSION_FIELD: expected_version}
+
+
+async def update_versioned(collection, query: Dict, changes: Dict, expected_version: Optional[int] = None,
+                           label: str = "Record", return_document: ReturnDocumentOption = ReturnDocument.AFTER) -> Optional[Dict]:
+    """Apply `$set: changes` and bump the version in one round-trip, returning the updated record
+    (or, with `return_document=ReturnDocument.BEFORE`, the record as it was before the update).
+
+    Returns None if nothing matches `query`. With `expected_version`, the
+    update only applies if the stored version still matches; otherwise a
+    ConflictError is raised (telling the two cases apart costs a second
+    round-trip, but only when the update did not apply).
+    """
+    guarded = {**query, **version_filter(expected_version)} if expected_version is not None else query
+    updated = await collection.find_one_and_update(
+        guarded,
+        {"$set": changes, "$inc": {VERSION_FIELD: 1}},
+        return_document=return_document
+    )
+    if updated is None and expected_version is not None:
+        await _raise_if_exists(collection, query, expected_version, label)
+    return updated
+
+
+async def delete_versioned(collection, query: Dict, expected_version: Optional[int] = None,
+                           label: str = "Record") -> bool:
+    """Delete one record in a single round-trip; same version precondition as update_versioned"""
+    guarded = {**query, **version_filter(expected_version)} if expected_version is not None else query
+    result = await collection.delete_one(guarded)
+    if result.deleted_count == 0 and expected_version is not None:
+        await _raise_if_exists(collection, query, expected_version, label)
+    return result.deleted_count > 0
+
+
+async def delete_versioned_returning(collection, query: Dict, expected_version: Optional[int] = None,
+                                     label: str = "Record", projection: Optional[Dict] = None) -> Optional[Dict]:
+    """Like delete_versioned, but returns the deleted record (None if nothing matched)"""
+    guarded = {**query, **version_filter(expected_version)} if expected_version is not None else query
+    deleted = await collection.find_one_and_delete(guarded, projection=projection)
+    if deleted is None and expected_version is not None:
+        await _raise_if_exists(collection, query, expected_version, label)
+    return deleted
+
+
+async def _raise_if_exists(collection, query: Dict, expected_version: int, label: str):
+    current = await collection.find_one(query, {VERSION_FIELD: 1})
+    if current is not None:
+        raise ConflictError(
+            f"{label} has been modified (expected version {expected_version}, "
+            f"current version {current.get(VERSION_FIELD, 0)})"
+        )
@@ -0,0 +1,146 @@
+from fastapi import HTTPException, Query, status
+from app.models.document import DOCUMENT_TYPES
+from app.utils.projection import with_fields
+from bson import ObjectId
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Fields documents can be sorted by, and how a cursor value of each is read back
+SORT_FIELDS: Dict[str, Callable[[Any], Any]] = {"id": int, "upload_date": datetime.fromisoformat, "grade": float}
+
+
+class DocumentQuery:
+    """Filters and sort order of a document listing, compiled to one Mongo filter and sort.
+
+    Filters combine with AND. Sorting by upload_date or grade breaks ties by
+    id in the same direction, so every order is total and a page can resume
+    from the (value, id) of the last row. Missing values (ungraded documents)
+    sort as null: first ascending, last descending.
+    """
+
+    def __init__(self, type: Optional[str] = None, teacher_id: Optional[int] = None, subject_id: Optional[int] = None,
+                 owner_id: Optional[str] = None, uploaded_from: Optional[datetime] = None,
+                 uploaded_before: Optional[datetime] = None, grade_min: Optional[float] = None,
+                 grade_max: Optional[float] = None, sort: str = "id"):
+        if type is not None and type not in DOCUMENT_TYPES:
+            raise ValueError(f"Document type must be one of: {', '.join(DOCUMENT_TYPES)}")
+        if uploaded_from is not None and uploaded_before is not None and uploaded_from >= uploaded_before:
+            raise ValueError("uploaded_from must be earlier than uploaded_before")
+        if grade_min is not None and grade_max is not None and grade_min > grade_max:
+            raise ValueError("grade_min must not be greater than grade_max")
+        field = sort[1:] if sort.startswith("-") else sort
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Sort must be one of: {', '.join(SORT_FIELDS)} (prefix with - for descending)")
+        self.type = type
+        self.teacher_id = teacher_id
+        self.subject_id = subject_id
+        self.owner_id = owner_id
+        self.uploaded_from = uploaded_from
+        self.uploaded_before = uploaded_before
+        self.grade_min = grade_min
+        self.grade_max = grade_max
+        self.sort = sort
+        self.sort_field = field
+        self.descending = sort.startswith("-")
+
+    def filter(self) -> Optional[Dict]:
+        """The Mongo filter, or None when nothing can match (an invalid owner id, like /owner/{owner_id})"""
+        query: Dict[str, Any] = {}
+        if self.type is not None:
+            query["type"] = self.type
+        if self.teacher_id is not None:
+            query["teacher_id"] = self.teacher_id
+        if self.subject_id is not None:
+            query["subject_id"] = self.subject_id
+        if self.owner_id is not None:
+            if not ObjectId.is_valid(self.owner_id):
+                return None
+            query["owner"] = ObjectId(self.owner_id)
+        uploaded = {}
+        if self.uploaded_from is not None:
+            uploaded["$gte"] = self.uploaded_from
+        if self.uploaded_before is not None:
+            uploaded["$lt"] = self.uploaded_before
+        if uploaded:
+            query["upload_date"] = uploaded
+        grade = {}
+        if self.grade_min is not None:
+            grade["$gte"] = self.grade_min
+        if self.grade_max is not None:
+            grade["$lte"] = self.grade_max
+        if grade:
+            query["grade"] = grade
+        return query
+
+    def mongo_sort(self) -> List[Tuple[str, int]]:
+        direction = -1 if self.descending else 1
+        if self.sort_field == "id":
+            return [("id", direction)]
+        return [(self.sort_field, direction), ("id", direction)]
+
+    def read_fields(self, fields: Optional[List[str]]) -> Optional[List[str]]:
+        """Widen a field selection with the sort field, which the next-page cursor is built from"""
+        return with_fields(fields, [self.sort_field])
+
+    def position(self, row: Dict) -> Dict:
+        """Cursor values that resume a listing right after `row`"""
+        if self.sort == "id":
+            return {"id": row["id"]}
+        return {"id": row["id"], "sort": self.sort, "value": row.get(self.sort_field)}
+
+    def parse_cursor(self, cursor: Optional[Dict]) -> Optional[Tuple[Any, int]]:
+        """The (sort value, id) a page resumes after, read from cursor values made by `position`"""
+        if not cursor:
+            return None
+        if cursor.get("sort", "id") != self.sort:
+            raise ValueError("The cursor belongs to a listing with a different sort order")
+        try:
+            id = int(cursor["id"])
+            if self.sort_field == "id":
+                return id, id
+            value = cursor.get("value")
+            return (SORT_FIELDS[self.sort_field](value) if value is not None else None), id
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid pagination cursor")
+
+    def keyset(self, query: Dict, after: Optional[Tuple[Any, int]]) -> Dict:
+        """Restrict the filter to rows that sort after a position from `parse_cursor`"""
+        if after is None:
+            return query
+        value, id = after
+        beyond = "$lt" if self.descending else "$gt"
+        field = self.sort_field
+        if field == "id":
+            clause = {"id": {beyond: id}}
+        elif value is None:
+            if self.descending:
+                clause = {field: None, "id": {beyond: id}}
+            else:
+                clause = {"$or": [{field: None, "id": {beyond: id}}, {field: {"$ne": None}}]}
+        else:
+            clause = {"$or": [{field: {beyond: value}}, {field: value, "id": {beyond: id}}]}
+            if self.descending:
+                # Nulls sort last when descending
+                clause["$or"].append({field: None})
+        return {"$and": [query, clause]} if query else clause
+
+
+def document_query(
+    type: Optional[str] = Query(None, description="Only documents of this type"),
+    teacher_id: Optional[int] = Query(None, description="Only documents created by this teacher"),
+    subject_id: Optional[int] = Query(None, description="Only documents of this subject"),
+    owner_id: Optional[str] = Query(None, description="Only documents owned by this user (MongoDB ObjectId)"),
+    uploaded_from: Optional[datetime] = Query(None, description="Only documents uploaded at or after this time"),
+    uploaded_before: Optional[datetime] = Query(None, description="Only documents uploaded before this time"),
+    grade_min: Optional[float] = Query(None, ge=0, le=100, description="Only documents graded at least this"),
+    grade_max: Optional[float] = Query(None, ge=0, le=100, description="Only documents graded at most this"),
+    sort: str = Query("id", description="id, upload_date or grade; prefix with - for descending, e.g. -upload_date"),
+) -> DocumentQuery:
+    """Dependency parsing the filter and sort query parameters of a document listing"""
+    try:
+        return DocumentQuery(type, teacher_id, subject_id, owner_id, uploaded_from, uploaded_before, grade_min, grade_max, sort)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
@@ -0,0 +1,8 @@
+# Lower-cased copy of the email, kept next to it so case-insensitive
+# uniqueness can be enforced by a plain unique index instead of a regex scan
+NORMALIZED_EMAIL_FIELD = "email_normalized"
+
+
+def normalize_email(email: str) -> str:
+    """Canonical form used for uniqueness checks and lookups"""
+    return email.strip().lower()
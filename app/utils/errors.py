@@ -0,0 +1,2 @@
+class ConflictError(ValueError):
+    """A write was rejected because it conflicts with what is stored (answered with 409)"""
@@ -0,0 +1,63 @@
+from fastapi import HTTPException, Request, Response, status
+from app.controller.sync_controller import SyncController
+from app.utils.streaming import wants_ndjson
+from app.utils.versions import request_versions
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+# Cache-Control policies. Both make every cache revalidate every time, which is
+# cheap because a matching ETag costs one lookup by _id and no query on the
+# data. Only reference data may be kept by shared caches; user and document
+# responses carry personal data.
+PRIVATE_REVALIDATE = "private, no-cache"
+SHARED_REVALIDATE = "public, no-cache"
+
+
+def compute_etag(collections: Iterable[str], request: Request, epoch: Optional[str], versions: Dict[str, int]) -> str:
+    """Strong ETag for a response built only from the given collections.
+
+    It combines the change sequence's epoch with each collection's count of
+    finished writes, both kept in MongoDB by `SyncController`, so every API
+    process computes the same tag and it changes whenever any of the
+    collections is written, by any process, loaddb.py or a migration. A new
+    epoch (the database was reloaded) changes every tag. NDJSON and JSON
+    bodies of the same URL get different tags.
+    """
+    parts = [epoch or "0"] + [f"{name}.{versions.get(name, 0)}" for name in collections]
+    if wants_ndjson(request):
+        parts.append("ndjson")
+    return '"' + "-".join(parts) + '"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Whether an If-None-Match header lists this ETag (weak comparison, as GET allows)"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def conditional_get(*collections: str, cache_control: str = PRIVATE_REVALIDATE) -> Callable[..., Awaitable[None]]:
+    """Build a route dependency that answers 304 Not Modified from the ETag alone.
+
+    It runs before the route body, so a matching If-None-Match costs one read
+    of the version document and never reaches the data or Pydantic.
+    Otherwise it sets ETag, Cache-Control and Vary on the response, and
+    leaves the versions it read in `request_versions` so the route serves
+    cached reference data at least as new as the tag.
+    """
+    sync = SyncController()
+
+    async def check(request: Request, response: Response) -> None:
+        epoch, versions = await sync.versions()
+        request_versions.set((epoch, versions))
+        etag = compute_etag(collections, request, epoch, versions)
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(etag, if_none_match):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+
+    return check
@@ -0,0 +1,149 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import math
+
+# Summaries kept per value of these document fields, plus one over all documents
+GRADE_DIMENSIONS = {"subject": "subject_id", "teacher": "teacher_id", "type": "type"}
+OVERALL = ("overall", "all")
+# Document fields a change to which can move a grade between summaries
+TRACKED_FIELDS = ("grade",) + tuple(GRADE_DIMENSIONS.values())
+DISTRIBUTION_BANDS = [(low, low + 9 if low < 90 else 100) for low in range(0, 100, 10)]
+
+SummaryKey = Tuple[str, object]
+
+
+def summary_id(dimension: str, key) -> str:
+    """_id of a summary in the grade_stats collection, e.g. "subject:3" """
+    return f"{dimension}:{key}"
+
+
+def _bucket(grade: float) -> str:
+    """Whole-grade histogram bucket (grades are 0-100)"""
+    return str(min(100, max(0, int(math.floor(grade)))))
+
+
+def contributions(document: Optional[Dict]) -> List[Tuple[SummaryKey, Dict[str, float]]]:
+    """The counters one document adds to each summary it belongs to"""
+    if not document:
+        return []
+    grade = document.get("grade")
+    if grade is None:
+        counters = {"ungraded": 1}
+    else:
+        counters = {"count": 1, "sum": grade, "sum_sq": grade * grade, f"histogram.{_bucket(grade)}": 1}
+    keys = [OVERALL] + [
+        (dimension, document[field])
+        for dimension, field in GRADE_DIMENSIONS.items()
+        if document.get(field) is not None
+    ]
+    return [(key, counters) for key in keys]
+
+
+def deltas(changes: Iterable[Tuple[Optional[Dict], Optional[Dict]]]) -> Dict[SummaryKey, Dict[str, float]]:
+    """Net counter changes for a set of (before, after) document pairs; None stands for absent.
+
+    Changes that cancel out (e.g. an update that only touched the title) are
+    dropped, so they cost no write.
+    """
+    totals: Dict[SummaryKey, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for before, after in changes:
+        for key, counters in contributions(before):
+            for counter, value in counters.items():
+                totals[key][counter] -= value
+        for key, counters in contributions(after):
+            for counter, value in counters.items():
+                totals[key][counter] += value
+    result = {}
+    for key, counters in totals.items():
+        nonzero = {counter: value for counter, value in counters.items() if value}
+        if nonzero:
+            result[key] = nonzero
+    return result
+
+
+def summary_pipeline(field: Optional[str]) -> List[Dict]:
+    """Aggregation computing, on the server, the summary of every value of a document field
+    (or of all documents when `field` is None), with the same arithmetic as `contributions`.
+
+    Documents are grouped by value and whole-grade bucket first, then by
+    value, so each row comes back with its histogram as `[{"bucket", "n"}]`.
+    """
+    graded = {"$gt": ["$grade", None]}
+    bucket = {"$cond": [graded, {"$min": [100, {"$max": [0, {"$floor": "$grade"}]}]}, None]}
+    pipeline = [{"$match": {field: {"$ne": None}}}] if field else []
+    pipeline += [
+        {"$group": {
+            "_id": {"key": f"${field}" if field else {"$literal": OVERALL[1]}, "bucket": bucket},
+            "count": {"$sum": {"$cond": [graded, 1, 0]}},
+            "sum": {"$sum": {"$cond": [graded, "$grade", 0]}},
+            "sum_sq": {"$sum": {"$cond": [graded, {"$multiply": ["$grade", "$grade"]}, 0]}},
+            "ungraded": {"$sum": {"$cond": [graded, 0, 1]}},
+        }},
+        {"$group": {
+            "_id": "$_id.key",
+            **{counter: {"$sum": f"${counter}"} for counter in ("count", "sum", "sum_sq", "ungraded")},
+            "histogram": {"$push": {"bucket": "$_id.bucket", "n": "$count"}},
+        }},
+    ]
+    return pipeline
+
+
+def merge(summaries: Iterable[Dict]) -> Dict:
+    """Add up stored summaries (e.g. the subjects of a course)"""
+    merged = {"count": 0, "sum": 0.0, "sum_sq": 0.0, "ungraded": 0, "histogram": defaultdict(int)}
+    for summary in summaries:
+        for counter in ("count", "sum", "sum_sq", "ungraded"):
+            merged[counter] += summary.get(counter, 0)
+        for bucket, count in (summary.get("histogram") or {}).items():
+            merged["histogram"][bucket] += count
+    return merged
+
+
+def describe(dimension: str, key, summary: Optional[Dict]) -> Dict:
+    """Turn a stored summary into the statistics the API returns.
+
+    The mean and standard deviation are exact; the median and distribution
+    come from the whole-grade histogram.
+    """
+    summary = summary or {}
+    count = int(summary.get("count", 0))
+    histogram = {int(bucket): int(n) for bucket, n in (summary.get("histogram") or {}).items() if n > 0}
+    stats = {
+        "dimension": dimension,
+        "key": key,
+        "count": count,
+        "ungraded": int(summary.get("ungraded", 0)),
+        "mean": None,
+        "median": None,
+        "stddev": None,
+        "distribution": {
+            f"{low}-{high}": sum(n for bucket, n in histogram.items() if low <= bucket <= high)
+            for low, high in DISTRIBUTION_BANDS
+        },
+    }
+    if count > 0:
+        mean = summary.get("sum", 0.0) / count
+        variance = max(0.0, summary.get("sum_sq", 0.0) / count - mean * mean)
+        stats["mean"] = round(mean, 2)
+        stats["stddev"] = round(math.sqrt(variance), 2)
+        stats["median"] = _median(histogram)
+    return stats
+
+
+def _median(histogram: Dict[int, int]) -> Optional[float]:
+    """Median bucket of the histogram, ranked over the histogram's own total.
+
+    That total is normally `count`, but the two can drift apart (a failed
+    $inc, a rebuild racing a write), so it is not taken from there.
+    """
+    total = sum(histogram.values())
+    if total == 0:
+        return None
+    lower, upper = (total - 1) // 2, total // 2
+    values = []
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        while len(values) < 2 and seen > (lower, upper)[len(values)]:
+            values.append(bucket)
+    return (values[0] + values[1]) / 2
@@ -0,0 +1,72 @@
+from fastapi import HTTPException, Query, status
+from app.utils.pagination import MAX_PAGE_SIZE
+from bson import ObjectId
+from typing import Dict, Iterable, List, Optional
+
+# Most ids one ?ids= / ?mongo_ids= lookup may ask for
+MAX_LOOKUP_IDS = MAX_PAGE_SIZE
+
+
+class IdListParams:
+    """`?ids=1,2,3` or `?mongo_ids=...` on a list route.
+
+    When either is given the route answers with one `$in` query instead of a
+    page: one entry per requested id, in request order, with null for ids
+    that do not exist.
+    """
+
+    def __init__(
+        self,
+        ids: Optional[str] = Query(None, description="Comma-separated record ids to fetch, e.g. 1,2,3"),
+        mongo_ids: Optional[str] = Query(None, description="Comma-separated MongoDB _ids to fetch"),
+    ):
+        if ids is not None and mongo_ids is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Use either ids or mongo_ids, not both"
+            )
+        self.ids: Optional[List[int]] = None
+        self.mongo_ids: Optional[List[str]] = None
+        if ids is not None:
+            try:
+                self.ids = [int(part) for part in _split(ids)]
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="ids must be a comma-separated list of integers"
+                )
+        if mongo_ids is not None:
+            self.mongo_ids = _split(mongo_ids)
+        requested = self.ids if self.ids is not None else self.mongo_ids
+        if requested is not None and len(requested) > MAX_LOOKUP_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {MAX_LOOKUP_IDS} ids can be fetched at once"
+            )
+
+    @property
+    def requested(self) -> bool:
+        """Whether the request is an id lookup rather than a page"""
+        return self.ids is not None or self.mongo_ids is not None
+
+
+def _split(value: str) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def object_ids(mongo_ids: Iterable[str]) -> List[ObjectId]:
+    """The valid ObjectIds among `mongo_ids`; malformed ones cannot match anything"""
+    return [ObjectId(mongo_id) for mongo_id in mongo_ids if ObjectId.is_valid(mongo_id)]
+
+
+def with_mongo_id(fields: Optional[List[str]]) -> Optional[List[str]]:
+    """Fields to read for a _id lookup: `_id` is needed to put rows back in request order"""
+    if fields is None or "_id" in fields:
+        return fields
+    return fields + ["_id"]
+
+
+def in_request_order(rows: List[Dict], keys: List, key: str = "id") -> List[Optional[Dict]]:
+    """One row per requested key, in request order, None where nothing matched"""
+    by_key = {row[key]: row for row in rows}
+    return [by_key.get(requested) for requested in keys]
@@ -0,0 +1,197 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from typing import Dict, List, Tuple
+import os
+import time
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Label used for requests that matched no route, so unknown paths cannot blow up the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last byte of its response",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ["method"],
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Size of response bodies", ["method", "route"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000),
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round-trip time, as reported by the driver",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error", ["collection", "command"],
+)
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongodb_pool_connections", "Open connections in the driver's pool", ["address"],
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "mongodb_pool_checked_out_connections", "Pooled connections currently in use", ["address"],
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongodb_pool_checkout_failures_total", "Failed attempts to take a connection from the pool", ["address", "reason"],
+)
+MONGO_POOL_CLEARED = Counter(
+    "mongodb_pool_cleared_total", "Times the pool was cleared (e.g. after a network error)", ["address"],
+)
+
+
+def route_template(scope) -> str:
+    """The path template of the route that handled a request, e.g. "/documents/{id}".
+
+    Depending on the FastAPI version, a route of an included router may only
+    know its own path ("/{id}"); the router prefix is then the part of the
+    request path in front of what the route matched.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+    path = scope.get("path", "")
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    for i, char in enumerate(path):
+        if char == "/" and i and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+def _address(address: Tuple) -> str:
+    return f"{address[0]}:{address[1]}"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every command the driver sends, labelled by collection and command name.
+
+    The collection is only in the started event, so it is kept per request id
+    until the matching succeeded or failed event arrives.
+    """
+
+    def __init__(self):
+        self._collections: Dict[Tuple, str] = {}
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def _observe(self, event) -> Tuple[str, str]:
+        labels = (self._collections.pop((event.connection_id, event.request_id), ""), event.command_name)
+        latency = self._latency.get(labels)
+        if latency is None:
+            latency = self._latency[labels] = MONGO_COMMAND_LATENCY.labels(*labels)
+        latency.observe(event.duration_micros / 1e6)
+        return labels
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        MONGO_COMMAND_FAILURES.labels(*self._observe(event)).inc()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Keeps the pool gauges in step with the driver's connection events"""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        MONGO_POOL_CLEARED.labels(_address(event.address)).inc()
+
+    def pool_closed(self, event):
+        MONGO_POOL_CONNECTIONS.labels(_address(event.address)).set(0)
+        MONGO_POOL_CHECKED_OUT.labels(_address(event.address)).set(0)
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.labels(_address(event.address)).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.labels(_address(event.address)).dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.labels(_address(event.address), str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_CHECKED_OUT.labels(_address(event.address)).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.labels(_address(event.address)).dec()
+
+
+def mongo_event_listeners() -> List:
+    """Listeners to pass to MongoClient/AsyncIOMotorClient(event_listeners=...)"""
+    return [CommandMetrics(), PoolMetrics()] if METRICS_ENABLED else []
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, response size and in-flight count for every HTTP request.
+
+    Written against raw ASGI rather than BaseHTTPMiddleware so streamed
+    responses pass straight through; their size is the sum of the body
+    chunks and their latency runs until the last one is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Metric children per label set; labels() takes a lock and validates on every call
+        self._in_flight: Dict[str, Gauge] = {}
+        self._series: Dict[Tuple[str, str, int], Tuple[Histogram, Histogram]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = self._in_flight.get(method)
+        if in_flight is None:
+            in_flight = self._in_flight[method] = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            # Label by the route template, not the raw path, to keep the label set bounded
+            route = route_template(scope)
+            series = self._series.get((method, route, status))
+            if series is None:
+                series = self._series[(method, route, status)] = (
+                    REQUEST_LATENCY.labels(method, route, str(status)), RESPONSE_SIZE.labels(method, route)
+                )
+            series[0].observe(elapsed)
+            series[1].observe(size)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Current values of every metric in the Prometheus text format, with its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
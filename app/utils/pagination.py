@@ -0,0 +1,79 @@
+from fastapi import HTTPException, Query, Response, status
+from typing import Any, Callable, Dict, List, Optional
+import base64
+import json
+import os
+
+DEFAULT_PAGE_SIZE = int(os.getenv("API_DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Pack the keyset position of the last returned row into an opaque token"""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Unpack a token produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(values, dict):
+        raise ValueError("Invalid pagination cursor")
+    return values
+
+
+def keyset_filter(query: Dict, after: Optional[int]) -> Dict:
+    """Restrict a Mongo filter to rows whose id comes after the cursor position"""
+    if after is None:
+        return query
+    if "id" in query:
+        return {"$and": [query, {"id": {"$gt": after}}]}
+    return {**query, "id": {"$gt": after}}
+
+
+class PageParams:
+    """Query parameters shared by every list route (`limit` and `after`).
+
+    One extra row is fetched beyond `limit` so the route knows whether a next
+    page exists without a separate count query.
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
+        after: Optional[str] = Query(None, description="Cursor taken from the X-Next-Cursor header of the previous page"),
+    ):
+        self.limit = limit
+        self.after: Optional[int] = None
+        # Everything the cursor carries; sorted listings also resume from a sort value
+        self.cursor: Optional[Dict[str, Any]] = None
+        if after:
+            try:
+                self.cursor = decode_cursor(after)
+                self.after = int(self.cursor["id"])
+            except (ValueError, KeyError, TypeError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid pagination cursor"
+                )
+
+    @property
+    def fetch_limit(self) -> int:
+        """Number of rows to ask the database for (one lookahead row)"""
+        return self.limit + 1
+
+    def paginate(self, response: Response, items: List, position: Optional[Callable[[Dict], Dict]] = None) -> List:
+        """Drop the lookahead row and expose the next cursor in the response headers.
+
+        `position` gives the cursor values of the last row; by default its id.
+        """
+        if len(items) > self.limit:
+            items = items[:self.limit]
+            last = items[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(position(last) if position else {"id": last["id"]})
+        return items
@@ -0,0 +1,155 @@
+from app.utils.admin import admin_token_error
+from collections import Counter
+from fastapi.responses import JSONResponse
+from typing import Optional
+from urllib.parse import parse_qs
+import asyncio
+import os
+import sys
+import threading
+import time
+
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "1"))
+# Deepest stack kept per sample; deeper frames (closest to the root) are dropped
+PROFILE_MAX_DEPTH = 200
+
+
+# Samplers currently running, and the switch interval to put back when the last one stops
+_switch_lock = threading.Lock()
+_switch_users = 0
+_saved_switch_interval: Optional[float] = None
+
+
+def _shorten_switch_interval(interval: float):
+    """Lower the process-wide GIL switch interval to at most `interval` while any sampler runs"""
+    global _switch_users, _saved_switch_interval
+    with _switch_lock:
+        if _switch_users == 0:
+            _saved_switch_interval = sys.getswitchinterval()
+        _switch_users += 1
+        sys.setswitchinterval(min(sys.getswitchinterval(), interval))
+
+
+def _restore_switch_interval():
+    """Undo one _shorten_switch_interval; the original interval comes back with the last sampler"""
+    global _switch_users
+    with _switch_lock:
+        _switch_users -= 1
+        if _switch_users == 0:
+            sys.setswitchinterval(_saved_switch_interval)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Samples one thread's call stack on a background thread and counts identical stacks.
+
+    The result is in the collapsed format ("root;caller;callee count" per
+    line) read by flamegraph.pl, speedscope and most other flame graph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        # The sampler needs the GIL to take a sample; by default a busy thread only gives it up every 5ms
+        _shorten_switch_interval(self.interval)
+        self._thread.start()
+
+    async def stop(self):
+        """Stop sampling; the sampler thread is joined off the event loop, which keeps serving meanwhile"""
+        self._stop.set()
+        try:
+            await asyncio.to_thread(self._thread.join)
+        finally:
+            _restore_switch_interval()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileMiddleware:
+    """ASGI middleware answering `?profile=1` requests with a sampled profile instead of their body.
+
+    Admin only: the X-Admin-Token header must match ADMIN_TOKEN. The request
+    runs as usual, its response is discarded, and the reply is a
+    `profile.folded` attachment of collapsed stacks with the original status
+    in X-Profiled-Status. The event loop thread is what gets sampled, so
+    requests running at the same time show up in the profile too, and time
+    the loop spends waiting on MongoDB appears as the selector's poll call.
+    Only one request is profiled at a time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or b"profile=" not in scope.get("query_string", b""):
+            await self.app(scope, receive, send)
+            return
+        query = parse_qs(scope["query_string"].decode("latin-1"))
+        if query.get("profile", [""])[-1].lower() not in ("1", "true"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        error = admin_token_error(headers.get("x-admin-token"))
+        if error is not None:
+            await JSONResponse({"detail": error.detail}, status_code=error.status_code)(scope, receive, send)
+            return
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            await self._profile(scope, receive, send)
+
+    async def _profile(self, scope, receive, send):
+        status = 500
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        sampler = StackSampler(threading.get_ident())
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            await sampler.stop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        body = sampler.collapsed().encode()
+        headers = [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"content-disposition", b'attachment; filename="profile.folded"'),
+            (b"x-profiled-status", str(status).encode()),
+            (b"x-profile-samples", str(sampler.samples).encode()),
+            (b"x-profile-duration-ms", f"{elapsed_ms:.2f}".encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,87 @@
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from typing import Callable, Dict, List, Optional, Type
+
+
+def fields_param(model: Type[BaseModel]) -> Callable[..., Optional[List[str]]]:
+    """Build a dependency that parses `?fields=a,b,c` into database field names for a model.
+
+    Both attribute names and aliases are accepted, so `_id` and `mongo_id`
+    both select the MongoDB id. Unknown names are rejected with a 400.
+    """
+    by_name = {}
+    for name, field in model.model_fields.items():
+        stored = field.alias or name
+        by_name[name] = stored
+        by_name[stored] = stored
+
+    def parse(fields: Optional[str] = Query(None, description="Comma-separated list of fields to return, e.g. id,name")) -> Optional[List[str]]:
+        if not fields:
+            return None
+        selected = []
+        for raw in fields.split(","):
+            name = raw.strip()
+            if not name:
+                continue
+            if name not in by_name:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown field '{name}'. Valid fields: {', '.join(sorted(set(by_name.values())))}"
+                )
+            if by_name[name] not in selected:
+                selected.append(by_name[name])
+        return selected or None
+
+    return parse
+
+
+def to_projection(fields: Optional[List[str]]) -> Optional[Dict[str, int]]:
+    """Turn selected fields into a Mongo projection.
+
+    `id` is always included because list pagination keys on it; `_id` is
+    only returned when asked for.
+    """
+    if not fields:
+        return None
+    projection = {field: 1 for field in fields}
+    projection["id"] = 1
+    if "_id" not in projection:
+        projection["_id"] = 0
+    return projection
+
+
+def apply_projection(doc: Dict, fields: Optional[List[str]]) -> Dict:
+    """Apply the same selection as to_projection to a record already in memory"""
+    if not fields:
+        return dict(doc)
+    return {key: value for key, value in doc.items() if key == "id" or key in fields}
+
+
+def expand_param(allowed: List[str]) -> Callable[..., Optional[List[str]]]:
+    """Build a dependency that parses `?expand=a,b` into a subset of `allowed`, rejecting anything else with a 400"""
+
+    def parse(expand: Optional[str] = Query(None, description=f"Comma-separated references to embed: {', '.join(allowed)}")) -> Optional[List[str]]:
+        if not expand:
+            return None
+        selected = []
+        for raw in expand.split(","):
+            name = raw.strip()
+            if not name:
+                continue
+            if name not in allowed:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Cannot expand '{name}'. Valid values: {', '.join(allowed)}"
+                )
+            if name not in selected:
+                selected.append(name)
+        return selected or None
+
+    return parse
+
+
+def with_fields(fields: Optional[List[str]], required: List[str]) -> Optional[List[str]]:
+    """Widen a field selection with fields the server needs to read, even if not returned"""
+    if fields is None:
+        return None
+    return fields + [field for field in required if field not in fields]
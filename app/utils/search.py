@@ -0,0 +1,41 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Computed relevance of each hit, as returned to clients
+SCORE_FIELD = "score"
+
+# Keyset position of the last hit of a page: (score, id)
+SearchPosition = Tuple[float, int]
+
+
+def text_search_pipeline(text: str, query: Dict, fields: Sequence[str], after: Optional[SearchPosition],
+                         limit: int) -> List[Dict]:
+    """Aggregation returning text index matches ranked by relevance, then id.
+
+    Ranking happens in MongoDB: the score comes from the text index and the
+    $sort + $limit pair keeps only the top `limit` rows in memory. Paging
+    resumes strictly after the (score, id) of the previous page's last hit.
+    """
+    pipeline = [
+        {"$match": {"$text": {"$search": text}, **query}},
+        {"$project": {**{field: 1 for field in fields}, SCORE_FIELD: {"$meta": "textScore"}}},
+    ]
+    if after is not None:
+        score, id = after
+        pipeline.append({"$match": {"$or": [
+            {SCORE_FIELD: {"$lt": score}},
+            {SCORE_FIELD: score, "id": {"$gt": id}},
+        ]}})
+    pipeline += [{"$sort": {SCORE_FIELD: -1, "id": 1}}, {"$limit": limit}]
+    return pipeline
+
+
+def parse_position(value) -> Optional[SearchPosition]:
+    """A (score, id) pair read back from a search cursor"""
+    if value is None:
+        return None
+    if not isinstance(value, list) or len(value) != 2:
+        raise ValueError("Invalid pagination cursor")
+    try:
+        return float(value[0]), int(value[1])
+    except (TypeError, ValueError):
+        raise ValueError("Invalid pagination cursor")
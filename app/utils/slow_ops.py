@@ -0,0 +1,315 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from pymongo import MongoClient, monitoring
+from typing import Any, Dict, List, Optional, Tuple
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+
+SLOW_OP_THRESHOLD_MS = float(os.getenv("SLOW_OP_THRESHOLD_MS", "100"))
+SLOW_OP_LOG_SIZE = int(os.getenv("SLOW_OP_LOG_SIZE", "200"))
+# The same query shape is explained at most once per interval; explain re-runs the query
+SLOW_OP_EXPLAIN_INTERVAL_SECONDS = float(os.getenv("SLOW_OP_EXPLAIN_INTERVAL_SECONDS", "60"))
+
+WATCHED_COMMANDS = ("find", "aggregate")
+# Parts of a find/aggregate command that describe the query itself; the rest is driver/session metadata
+QUERY_FIELDS = {
+    "find": ("find", "filter", "sort", "projection", "hint", "skip", "limit", "collation"),
+    "aggregate": ("aggregate", "pipeline", "hint", "collation"),
+}
+REDACTED = "?"
+
+# Controller method a Mongo command is issued for, set by @traced
+current_origin: ContextVar[Optional[str]] = ContextVar("current_origin", default=None)
+
+
+def traced(cls):
+    """Class decorator: record the running method in `current_origin` so slow ops can name their caller.
+
+    Motor runs commands on worker threads but copies the caller's context, so
+    the command listener sees the value set by the coroutine that issued it.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith("__"):
+            continue
+        if inspect.isasyncgenfunction(method):
+            setattr(cls, name, _trace_async_gen(method, f"{cls.__name__}.{name}"))
+        elif inspect.iscoroutinefunction(method):
+            setattr(cls, name, _trace_coroutine(method, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _trace_coroutine(method, origin: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = current_origin.set(origin)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            current_origin.reset(token)
+    return wrapper
+
+
+def _trace_async_gen(method, origin: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        # Set, not reset: a streamed response may finish the generator from another context
+        current_origin.set(origin)
+        async for item in method(*args, **kwargs):
+            yield item
+    return wrapper
+
+
+def _origin_from_stack() -> Optional[str]:
+    """Nearest controller frame on the current thread's stack (sync pymongo callers)"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if f"{os.sep}controller{os.sep}" in code.co_filename:
+            return getattr(code, "co_qualname", code.co_name)
+        frame = frame.f_back
+    return None
+
+
+def redact(value: Any) -> Any:
+    """The shape of a filter or pipeline: keys and operators kept, values replaced with "?"
+
+    Lists of plain values collapse to one placeholder, so `$in` lists of any
+    length share a shape.
+    """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [redact(item) for item in value]
+        if all(item == REDACTED for item in items):
+            return [REDACTED] if items else []
+        return items
+    return REDACTED
+
+
+def query_shape(command_name: str, command: Dict) -> Dict:
+    """Redacted filter/sort/pipeline of a command, for logging and grouping"""
+    if command_name == "find":
+        shape = {"filter": redact(command.get("filter", {}))}
+        if "sort" in command:
+            # Sort directions are part of the shape, not data
+            shape["sort"] = dict(command["sort"])
+        return shape
+    return {"pipeline": [_stage_shape(stage, body) for step in command.get("pipeline", []) for stage, body in step.items()]}
+
+
+def _stage_shape(stage: str, body: Any) -> Dict:
+    """One aggregation stage with its data redacted; field names and sort/projection specs are kept"""
+    if stage == "$match":
+        return {stage: redact(body)}
+    if stage in ("$sort", "$project"):
+        return {stage: body}
+    if stage == "$lookup" and isinstance(body, dict):
+        return {stage: {key: body[key] for key in ("from", "localField", "foreignField", "as") if key in body}}
+    return {stage: REDACTED}
+
+
+def summarize_plan(plan: Dict) -> str:
+    """Stage chain of a winning plan, innermost last, e.g. "FETCH > IXSCAN {teacher_id: 1, id: 1}" """
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if "keyPattern" in plan:
+            keys = ", ".join(f"{key}: {direction}" for key, direction in plan["keyPattern"].items())
+            stage += f" {{{keys}}}"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0] or plan.get("queryPlan")
+    return " > ".join(stages)
+
+
+def _find_winning_plan(explain: Any) -> Optional[Dict]:
+    """queryPlanner.winningPlan wherever it is in an explain result ($cursor stage for aggregations)"""
+    if isinstance(explain, dict):
+        planner = explain.get("queryPlanner")
+        if isinstance(planner, dict) and "winningPlan" in planner:
+            return planner["winningPlan"]
+        for value in explain.values():
+            found = _find_winning_plan(value)
+            if found is not None:
+                return found
+    elif isinstance(explain, list):
+        for value in explain:
+            found = _find_winning_plan(value)
+            if found is not None:
+                return found
+    return None
+
+
+def _find_execution_stats(explain: Any) -> Optional[Dict]:
+    if isinstance(explain, dict):
+        if "totalDocsExamined" in explain and "nReturned" in explain:
+            return explain
+        for value in explain.values():
+            found = _find_execution_stats(value)
+            if found is not None:
+                return found
+    elif isinstance(explain, list):
+        for value in explain:
+            found = _find_execution_stats(value)
+            if found is not None:
+                return found
+    return None
+
+
+class SlowOpLog:
+    """Ring buffer of recent slow find/aggregate commands, with a sampled explain of each query shape.
+
+    Explains run on one background thread over a separate client (so they are
+    neither monitored themselves nor on the request path); while one is
+    running, further slow ops are logged without a plan.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_OP_THRESHOLD_MS, size: int = SLOW_OP_LOG_SIZE,
+                 explain_interval: float = SLOW_OP_EXPLAIN_INTERVAL_SECONDS):
+        self.threshold_ms = threshold_ms
+        self.explain_interval = explain_interval
+        self._entries: deque = deque(maxlen=size)
+        self._last_explained: Dict[str, float] = {}
+        self._explaining = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-op-explain")
+        self._client: Optional[MongoClient] = None
+        self.recorded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def listener(self) -> "SlowOpListener":
+        return SlowOpListener(self)
+
+    def record(self, database: str, command_name: str, command: Dict, duration_ms: float, reply: Dict,
+               origin: Optional[str]):
+        """Log one slow command and, if its shape is due, explain it in the background"""
+        shape = query_shape(command_name, command)
+        batch = (reply.get("cursor") or {}).get("firstBatch")
+        entry = {
+            "at": datetime.utcnow(),
+            "origin": origin,
+            "database": database,
+            "collection": command.get(command_name),
+            "command": command_name,
+            "shape": shape,
+            "duration_ms": round(duration_ms, 2),
+            "docs_returned": len(batch) if batch is not None else None,
+            "docs_examined": None,
+            "keys_examined": None,
+            "plan": None,
+            "winning_plan": None,
+            "explain_error": None,
+        }
+        self._entries.append(entry)
+        self.recorded += 1
+        print(f"[slow-op] {entry['duration_ms']}ms {command_name} {entry['collection']} from {origin or 'unknown'}: {shape}")
+        self._maybe_explain(entry, database, command_name, command)
+
+    def _maybe_explain(self, entry: Dict, database: str, command_name: str, command: Dict):
+        if command_name == "aggregate" and any(("$out" in step or "$merge" in step) for step in command.get("pipeline", [])):
+            return  # explain with executionStats would run the write
+        key = f"{database}.{entry['collection']}:{command_name}:{entry['shape']}"
+        now = time.monotonic()
+        if now - self._last_explained.get(key, float("-inf")) < self.explain_interval:
+            return
+        if not self._explaining.acquire(blocking=False):
+            return
+        self._last_explained[key] = now
+        query = {field: command[field] for field in QUERY_FIELDS[command_name] if field in command}
+        if command_name == "aggregate":
+            query["cursor"] = {}
+        self._executor.submit(self._explain, entry, database, query)
+
+    def _explain(self, entry: Dict, database: str, query: Dict):
+        try:
+            if self._client is None:
+                self._client = MongoClient(os.getenv("MONGODB_URI"))
+            explain = self._client[database].command({"explain": query, "verbosity": "executionStats"})
+            winning_plan = _find_winning_plan(explain)
+            stats = _find_execution_stats(explain) or {}
+            entry["winning_plan"] = winning_plan
+            entry["plan"] = summarize_plan(winning_plan) if winning_plan else None
+            entry["docs_examined"] = stats.get("totalDocsExamined")
+            entry["keys_examined"] = stats.get("totalKeysExamined")
+            if stats.get("nReturned") is not None:
+                entry["docs_returned"] = stats["nReturned"]
+            print(f"[slow-op] {entry['command']} {entry['collection']} from {entry['origin'] or 'unknown'}: "
+                  f"{entry['plan']}, examined {entry['docs_examined']} docs for {entry['docs_returned']} returned")
+        except Exception as e:
+            entry["explain_error"] = str(e)
+        finally:
+            self._explaining.release()
+
+    def entries(self, collection: Optional[str] = None, origin: Optional[str] = None,
+                min_duration_ms: Optional[float] = None, collscan: Optional[bool] = None,
+                limit: Optional[int] = None) -> List[Dict]:
+        """Recorded slow ops, newest first, optionally filtered"""
+        result = []
+        for entry in reversed(list(self._entries)):
+            if collection is not None and entry["collection"] != collection:
+                continue
+            if origin is not None and origin not in (entry["origin"] or ""):
+                continue
+            if min_duration_ms is not None and entry["duration_ms"] < min_duration_ms:
+                continue
+            if collscan is not None and ("COLLSCAN" in (entry["plan"] or "")) != collscan:
+                continue
+            result.append(entry)
+            if limit and len(result) >= limit:
+                break
+        return result
+
+    def clear(self) -> int:
+        """Drop every recorded entry and return how many there were"""
+        count = len(self._entries)
+        self._entries.clear()
+        self._last_explained.clear()
+        return count
+
+    def stats(self) -> Dict:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "size": self._entries.maxlen,
+            "entries": len(self._entries),
+            "recorded": self.recorded,
+            "explain_interval_seconds": self.explain_interval,
+        }
+
+
+class SlowOpListener(monitoring.CommandListener):
+    """Hands find/aggregate commands slower than the threshold to a SlowOpLog"""
+
+    def __init__(self, log: SlowOpLog):
+        self.log = log
+        self._started: Dict[Tuple, Dict] = {}
+
+    def started(self, event):
+        if event.command_name in WATCHED_COMMANDS:
+            self._started[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event):
+        command = self._started.pop((event.connection_id, event.request_id), None)
+        if command is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.log.threshold_ms:
+            origin = current_origin.get() or _origin_from_stack()
+            self.log.record(event.database_name, event.command_name, command, duration_ms, event.reply, origin)
+
+    def failed(self, event):
+        self._started.pop((event.connection_id, event.request_id), None)
+
+
+slow_op_log = SlowOpLog()
+
+
+def slow_op_listeners() -> List:
+    """Listeners to pass to MongoClient/AsyncIOMotorClient(event_listeners=...)"""
+    return [slow_op_log.listener()] if slow_op_log.enabled else []
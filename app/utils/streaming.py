@@ -0,0 +1,43 @@
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, Optional
+import orjson
+import os
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Documents pulled from the Mongo cursor per round-trip while streaming
+STREAM_BATCH_SIZE = int(os.getenv("API_STREAM_BATCH_SIZE", "500"))
+# Serialized lines are buffered up to this many bytes before each write to the socket
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Whether the client asked for a newline-delimited JSON stream"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(rows: AsyncIterator[Dict], response: Optional[Response] = None) -> StreamingResponse:
+    """Stream shaped rows as one JSON object per line.
+
+    Records are serialized as they come off the cursor, so memory use does
+    not depend on how many rows match. Headers already set on ``response``
+    (e.g. the ETag) are carried over.
+    """
+    async def lines():
+        buffer = []
+        size = 0
+        async for row in rows:
+            line = orjson.dumps(row, default=str) + b"\n"
+            buffer.append(line)
+            size += len(line)
+            if size >= STREAM_CHUNK_BYTES:
+                yield b"".join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield b"".join(buffer)
+
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key.lower() != "content-length"}
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
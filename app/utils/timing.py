@@ -0,0 +1,164 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fastapi.responses import JSONResponse
+from typing import Any, Dict, Optional
+import fastapi.routing
+import functools
+import inspect
+import os
+import time
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+class RequestTimings:
+    """Wall time spent in each phase of one request.
+
+    A phase's time is the union of the intervals during which at least one
+    call in it is running, so concurrent calls (asyncio.gather) are not
+    counted twice.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals: Dict[str, float] = {}
+        self._active: Dict[str, int] = {}
+        self._since: Dict[str, float] = {}
+
+    def enter(self, name: str):
+        depth = self._active.get(name, 0)
+        if depth == 0:
+            self._since[name] = time.perf_counter()
+        self._active[name] = depth + 1
+
+    def exit(self, name: str):
+        depth = self._active[name] - 1
+        self._active[name] = depth
+        if depth == 0:
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - self._since[name]
+
+    def get(self, name: str) -> float:
+        """Time spent in a phase so far, including a call that is still running"""
+        total = self.totals.get(name, 0.0)
+        if self._active.get(name):
+            total += time.perf_counter() - self._since[name]
+        return total
+
+    def header(self) -> str:
+        """Server-Timing value; validate is service time not spent in controllers, plus response validation"""
+        db = self.get("db")
+        validate = max(0.0, self.get("service") - db) + self.get("response_validation")
+        parts = [("db", db), ("validate", validate), ("serialize", self.get("serialize")),
+                 ("total", time.perf_counter() - self.started)]
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in parts)
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """Count the enclosed block towards a phase of the current request (no-op outside a request)"""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    timings.enter(name)
+    try:
+        yield
+    finally:
+        timings.exit(name)
+
+
+def timed(name: str):
+    """Class decorator: count every async method (and async generator step) of the class towards a phase"""
+    def decorate(cls):
+        for attr, method in list(vars(cls).items()):
+            if attr.startswith("__"):
+                continue
+            if inspect.isasyncgenfunction(method):
+                setattr(cls, attr, _timed_async_gen(method, name))
+            elif inspect.iscoroutinefunction(method):
+                setattr(cls, attr, _timed_coroutine(method, name))
+        return cls
+    return decorate
+
+
+def _timed_coroutine(method, name: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with phase(name):
+            return await method(*args, **kwargs)
+    return wrapper
+
+
+def _timed_async_gen(method, name: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        items = method(*args, **kwargs).__aiter__()
+        while True:
+            with phase(name):
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+    return wrapper
+
+
+class TimedJSONResponse(JSONResponse):
+    """FastAPI's default JSON response, with rendering counted as serialize time"""
+
+    def render(self, content: Any) -> bytes:
+        with phase("serialize"):
+            return super().render(content)
+
+
+def install_response_validation_timing():
+    """Count FastAPI's response_model validation towards the validate phase.
+
+    FastAPI has no hook for it, so the module-level serialize_response its
+    request handlers call is wrapped; routes that return respond() skip it.
+    """
+    original = fastapi.routing.serialize_response
+    if getattr(original, "_timed", False):
+        return
+
+    @functools.wraps(original)
+    async def serialize_response(*args, **kwargs):
+        with phase("response_validation"):
+            return await original(*args, **kwargs)
+
+    serialize_response._timed = True
+    fastapi.routing.serialize_response = serialize_response
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header (db, validate, serialize, total) to every response.
+
+    The header goes out with the status line, so for streamed responses it
+    only covers the work done before the first chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timings.reset(token)
@@ -0,0 +1,23 @@
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+# The change sequence's epoch and finished writes per collection, as kept in
+# MongoDB by `SyncController`; every process reads the same values
+Versions = Tuple[Optional[str], Dict[str, int]]
+
+# The versions the current request's ETag was built from. `conditional_get`
+# sets them, so whatever the route then serves from an in-process cache can be
+# checked against the same numbers the client will see in the ETag.
+request_versions: ContextVar[Optional[Versions]] = ContextVar("request_versions", default=None)
+
+
+def covers(held: Versions, wanted: Versions, names: Iterable[str]) -> bool:
+    """Whether data read at `held` versions is at least as new as `wanted` for the named collections.
+
+    Versions only grow within an epoch, so a newer copy also answers a request
+    made at older versions; a different epoch (the database was reloaded)
+    never covers.
+    """
+    held_epoch, held_counts = held
+    wanted_epoch, wanted_counts = wanted
+    return held_epoch == wanted_epoch and all(held_counts.get(name, 0) >= wanted_counts.get(name, 0) for name in names)
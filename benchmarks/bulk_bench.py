@@ -0,0 +1,146 @@
+"""Write throughput of the bulk endpoints against the single-item routes.
+
+Creates the same number of records twice against a running server, once
+with one POST per record and once through POST /<entity>/bulk in batches,
+then updates them the same two ways, and reports records per second for
+each. Everything it creates is removed again through /bulk/delete.
+
+    uvicorn main:app --port 8000
+    python benchmarks/bulk_bench.py --entity users --records 2000 --batch-size 500
+
+Subjects have a unique name and users a unique email, so every run
+generates fresh values. Only the standard library is used.
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+DOC_TYPES = ['Lecture Notes', 'Assignment', 'Exam', 'Project', 'Study Guide']
+
+
+def request(method, url, body=None, timeout=60.0):
+    """Send a JSON request and return (status_code, decoded body)"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def make_payloads(entity, count, base_url):
+    """`count` create bodies for the entity, unique per run"""
+    run = uuid.uuid4().hex[:8]
+    if entity == "users":
+        return [{"name": "Bench User", "email": f"bench-{run}-{i}@example.com", "type": "student"} for i in range(count)]
+    if entity == "subjects":
+        return [{"name": f"Bench {run} {i}", "description": "Benchmark subject"} for i in range(count)]
+    if entity == "courses":
+        return [{"name": f"Bench {run} {i}", "subjects": [1]} for i in range(count)]
+    status, users = request("GET", base_url + "/users/?limit=1&fields=_id,id")
+    if status != 200 or not users:
+        raise SystemExit("documents need at least one existing user to own them")
+    return [
+        {"title": f"Bench {run} {i}", "file_url": f"https://files.example.com/{run}/{i}.pdf",
+         "type": DOC_TYPES[i % len(DOC_TYPES)], "grade": float(i % 100), "teacher_id": 1,
+         "subject_id": 1, "owner": users[0]["_id"]}
+        for i in range(count)
+    ]
+
+
+def batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def summary(label, records, elapsed, failed):
+    return {
+        "mode": label,
+        "records": records,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "records_per_second": round(records / elapsed, 1) if elapsed else None,
+    }
+
+
+def run_single(url, payloads):
+    """One POST / per record, then one PUT /{id} per record"""
+    ids, failed = [], 0
+    started = time.perf_counter()
+    for payload in payloads:
+        status, body = request("POST", url + "/", payload)
+        if status == 201:
+            ids.append(body["id"])
+        else:
+            failed += 1
+    create = summary("single create", len(payloads), time.perf_counter() - started, failed)
+
+    failed = 0
+    started = time.perf_counter()
+    for id in ids:
+        status, _ = request("PUT", f"{url}/{id}", {"version": 1, **_update_body(url)})
+        failed += status != 200
+    update = summary("single update", len(ids), time.perf_counter() - started, failed)
+    return ids, [create, update]
+
+
+def run_bulk(url, payloads, batch_size):
+    """POST /bulk and PUT /bulk in batches of `batch_size`"""
+    ids, failed = [], 0
+    started = time.perf_counter()
+    for batch in batches(payloads, batch_size):
+        status, body = request("POST", url + "/bulk", batch)
+        if status != 200:
+            failed += len(batch)
+            continue
+        ids += [item["id"] for item in body["items"] if item["status"] == "created"]
+        failed += body["failed"]
+    create = summary("bulk create", len(payloads), time.perf_counter() - started, failed)
+
+    failed = 0
+    started = time.perf_counter()
+    for batch in batches(ids, batch_size):
+        status, body = request("PUT", url + "/bulk", [{"id": id, "version": 1, **_update_body(url)} for id in batch])
+        failed += len(batch) if status != 200 else body["failed"]
+    update = summary("bulk update", len(ids), time.perf_counter() - started, failed)
+    return ids, [create, update]
+
+
+def _update_body(url):
+    return {"grade": 42.0} if url.endswith("/documents") else {"name": "Bench Updated"}
+
+
+def cleanup(url, ids, batch_size):
+    for batch in batches(ids, batch_size):
+        request("POST", url + "/bulk/delete", [{"id": id} for id in batch])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk vs single-item write throughput")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Server to benchmark")
+    parser.add_argument("--entity", choices=["users", "documents", "subjects", "courses"], default="users")
+    parser.add_argument("--records", type=int, default=1000, help="Records written by each mode")
+    parser.add_argument("--batch-size", type=int, default=500, help="Items per bulk request")
+    parser.add_argument("--keep", action="store_true", help="Do not delete the records afterwards")
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+    url = f"{base_url}/{args.entity}"
+    single_ids, single = run_single(url, make_payloads(args.entity, args.records, base_url))
+    bulk_ids, bulk = run_bulk(url, make_payloads(args.entity, args.records, base_url), args.batch_size)
+    if not args.keep:
+        cleanup(url, single_ids + bulk_ids, args.batch_size)
+
+    for result in single + bulk:
+        print(json.dumps(result))
+    for (slow, fast) in zip(single, bulk):
+        if slow["records_per_second"] and fast["records_per_second"]:
+            print(json.dumps({"mode": fast["mode"], "speedup": round(fast["records_per_second"] / slow["records_per_second"], 1)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Concurrent-request throughput benchmark for the University API.
+
+Fires a fixed number of GET requests at a running server from a pool of
+concurrent workers and reports throughput and latency percentiles. Run it
+against the same dataset before and after a change to compare, e.g.:
+
+    uvicorn main:app --port 8000
+    python benchmarks/concurrency_bench.py --path /documents/ --concurrency 32 --requests 2000
+
+Only the standard library is used so the script works against any checkout.
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+def timed_get(url, timeout):
+    """Issue one GET and return (latency_seconds, status_code)"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def run(base_url, path, concurrency, total_requests, timeout=30.0):
+    """Run the benchmark and return a summary dict"""
+    url = base_url.rstrip("/") + path
+    latencies = []
+    errors = 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, status in pool.map(lambda _: timed_get(url, timeout), range(total_requests)):
+            latencies.append(latency)
+            if status == 0 or status >= 400:
+                errors += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total_requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent GET throughput benchmark")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the running API")
+    parser.add_argument("--path", action="append", help="Route to hit (repeatable, default /documents/)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=1000, help="Total requests per route")
+    args = parser.parse_args()
+
+    for path in args.path or ["/documents/"]:
+        print(json.dumps(run(args.url, path, args.concurrency, args.requests)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Fan-out latency of the /events change feed.
+
+Connects --clients SSE clients to a running API, creates --writes subjects
+through POST /subjects/ and measures, for every client and every subject,
+the time from sending the create to the change event arriving. Reports
+delivery (events received / expected) and p50/p95/p99 latency, then deletes
+the subjects it created.
+
+Change streams need a replica set; a single local node is enough:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGODB_URI='mongodb://localhost:27017/?replicaSet=rs0' uvicorn main:app
+    python benchmarks/events_bench.py --url http://localhost:8000 --clients 50 --writes 200
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Listener(threading.Thread):
+    """One SSE client recording when each subject named with the run's prefix arrives"""
+
+    def __init__(self, host, port, prefix):
+        super().__init__(daemon=True)
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.prefix = prefix
+        self.arrivals = {}
+        self.connected = threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            self.connection.request("GET", "/events/?collections=subjects", headers={"Accept": "text/event-stream"})
+            response = self.connection.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"GET /events/ returned {response.status}: {response.read()[:200]!r}")
+            self.connected.set()
+            data = []
+            for raw in response:
+                line = raw.decode().rstrip("\n")
+                if line.startswith("data: "):
+                    data.append(line[6:])
+                elif not line and data:
+                    event = json.loads("\n".join(data))
+                    data = []
+                    document = event.get("document") or {}
+                    if event.get("operation") == "insert" and str(document.get("name", "")).startswith(self.prefix):
+                        self.arrivals[document["name"]] = time.perf_counter()
+        except Exception as e:
+            if self.error is None and not isinstance(e, OSError):
+                self.error = str(e)
+        finally:
+            self.connected.set()
+
+    def close(self):
+        try:
+            self.connection.sock.shutdown(2)
+        except Exception:
+            pass
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change feed fan-out benchmark")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running API")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent SSE clients")
+    parser.add_argument("--writes", type=int, default=200, help="Subjects to create")
+    parser.add_argument("--interval-ms", type=float, default=5, help="Pause between creates")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for the last events")
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    prefix = f"Events bench {uuid.uuid4().hex[:8]}"
+    listeners = [Listener(url.hostname, url.port or 80, prefix) for _ in range(args.clients)]
+    for listener in listeners:
+        listener.start()
+    for listener in listeners:
+        listener.connected.wait(10)
+        if listener.error:
+            raise SystemExit(listener.error)
+
+    writer = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    sent, created = {}, []
+    for i in range(args.writes):
+        name = f"{prefix} {i}"
+        body = json.dumps({"name": name, "description": "Change feed benchmark"}).encode()
+        sent[name] = time.perf_counter()
+        writer.request("POST", "/subjects/", body=body, headers={"Content-Type": "application/json"})
+        response = writer.getresponse()
+        payload = response.read()
+        if response.status == 201:
+            created.append(json.loads(payload)["id"])
+        time.sleep(args.interval_ms / 1000)
+
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline and any(len(listener.arrivals) < len(created) for listener in listeners):
+        time.sleep(0.1)
+
+    latencies = [
+        (listener.arrivals[name] - sent[name]) * 1000
+        for listener in listeners for name in listener.arrivals if name in sent
+    ]
+    expected = len(created) * len(listeners)
+    print(json.dumps({
+        "clients": len(listeners),
+        "writes": len(created),
+        "delivered": len(latencies),
+        "delivery_ratio": round(len(latencies) / expected, 4) if expected else None,
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+    }))
+
+    for listener in listeners:
+        listener.close()
+    for start in range(0, len(created), 500):
+        body = json.dumps([{"id": id} for id in created[start:start + 500]]).encode()
+        writer.request("POST", "/subjects/bulk/delete", body=body, headers={"Content-Type": "application/json"})
+        writer.getresponse().read()
+
+
+if __name__ == "__main__":
+    main()
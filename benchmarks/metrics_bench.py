@@ -0,0 +1,140 @@
+"""CPU overhead of the Prometheus instrumentation.
+
+Reports three numbers:
+
+- middleware: MetricsMiddleware around a bare ASGI app that returns a small
+  body, called directly, so the figure is the middleware's own cost
+- http: the same FastAPI app through TestClient with and without the
+  middleware, runs interleaved so drift affects both sides alike
+- mongo command listener: one started/succeeded event pair
+
+No database or server is needed; run it from the repository root:
+
+    python benchmarks/metrics_bench.py --requests 5000 --events 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from starlette.routing import compile_path
+
+from app.utils.metrics import CommandMetrics, MetricsMiddleware
+
+
+def build_app(instrumented):
+    app = FastAPI()
+    router = APIRouter()
+
+    @router.get("/{id}")
+    async def item(id: int):
+        return {"id": id, "title": f"Document {id}"}
+
+    # Included with a prefix like the real routers, so route_template has to resolve it
+    app.include_router(router, prefix="/documents")
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+def measure_http(requests, repeat):
+    """Best CPU time per request through TestClient, without and with the middleware"""
+    clients = {False: TestClient(build_app(False)), True: TestClient(build_app(True))}
+    best = {False: None, True: None}
+    for _ in range(repeat):
+        for instrumented, client in clients.items():
+            client.get("/documents/1")  # warm-up
+            cpu_start = time.process_time()
+            for i in range(requests):
+                client.get(f"/documents/{i}")
+            cpu = (time.process_time() - cpu_start) / requests
+            best[instrumented] = cpu if best[instrumented] is None else min(best[instrumented], cpu)
+    return best[False], best[True]
+
+
+async def _bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"id": 1}'})
+
+
+async def _noop(message=None):
+    return {"type": "http.request", "body": b""}
+
+
+def measure_middleware(requests, repeat):
+    """Best CPU time per call of a bare ASGI app, without and with the middleware"""
+    # Shaped like a route of an included router, so the prefix has to be resolved
+    route = SimpleNamespace(path="/{id}", path_regex=compile_path("/{id}")[0])
+
+    async def drive(app):
+        for i in range(requests):
+            await app({"type": "http", "method": "GET", "path": f"/documents/{i}", "route": route}, _noop, _noop)
+
+    apps = {False: _bare_app, True: MetricsMiddleware(_bare_app)}
+    best = {False: None, True: None}
+    for _ in range(repeat):
+        for instrumented, app in apps.items():
+            cpu_start = time.process_time()
+            asyncio.run(drive(app))
+            cpu = (time.process_time() - cpu_start) / requests
+            best[instrumented] = cpu if best[instrumented] is None else min(best[instrumented], cpu)
+    return best[False], best[True]
+
+
+def overhead(mode, plain, instrumented):
+    return {
+        "mode": mode,
+        "plain_us_per_request": round(plain * 1e6, 1),
+        "instrumented_us_per_request": round(instrumented * 1e6, 1),
+        "overhead_us_per_request": round((instrumented - plain) * 1e6, 1),
+        "overhead_pct": round((instrumented - plain) / plain * 100, 1),
+    }
+
+
+def measure_listener(events, repeat):
+    """Best CPU time per started+succeeded pair"""
+    listener = CommandMetrics()
+    started = [
+        SimpleNamespace(command={"find": "documents", "filter": {}}, command_name="find", connection_id=("localhost", 27017), request_id=i)
+        for i in range(events)
+    ]
+    succeeded = [
+        SimpleNamespace(command_name="find", connection_id=("localhost", 27017), request_id=i, duration_micros=850)
+        for i in range(events)
+    ]
+    best = None
+    for _ in range(repeat):
+        cpu_start = time.process_time()
+        for start, done in zip(started, succeeded):
+            listener.started(start)
+            listener.succeeded(done)
+        cpu = time.process_time() - cpu_start
+        best = cpu if best is None else min(best, cpu)
+    return best / events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentation overhead benchmark")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per timed run")
+    parser.add_argument("--events", type=int, default=200000, help="Command event pairs per timed run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    print(json.dumps(overhead("middleware", *measure_middleware(args.requests * 20, args.repeat))))
+    print(json.dumps(overhead("http", *measure_http(args.requests, args.repeat))))
+    print(json.dumps({
+        "mode": "mongo command listener",
+        "us_per_command": round(measure_listener(args.events, args.repeat) * 1e6, 2),
+    }))
+
+
+if __name__ == "__main__":
+    main()
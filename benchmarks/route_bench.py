@@ -0,0 +1,493 @@
+"""Load test every users/documents/subjects/courses route at several dataset sizes.
+
+For each size the script starts the API from main.py in a child process
+against a freshly seeded database (generated with loaddb.py, so the same
+--seed gives the same data), drives every route of user_routes,
+document_routes, subject_routes and course_routes at a fixed concurrency,
+and records throughput and p50/p95/p99 latency. Reads go first; then, per
+collection, single and bulk create/update/delete, each working on the
+records the previous step created. Results are written as JSON, and a run
+can be compared with an earlier one to flag regressions:
+
+    python benchmarks/route_bench.py run --sizes 1000,10000,100000 --output baseline.json
+    # ... change something ...
+    python benchmarks/route_bench.py run --sizes 1000,10000,100000 --output current.json --baseline baseline.json
+    python benchmarks/route_bench.py compare baseline.json current.json --threshold 15
+
+The database named by --db-name (default university_bench) on MONGODB_URI
+is dropped and reloaded for every size, so never point it at real data.
+--in-memory runs the server on mongomock/mongomock_motor instead of a
+mongod (both must be installed); its numbers are only useful relative to
+another in-memory run. Routes the server exposes that have no scenario
+here are listed in the output, so new routes are not silently skipped.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ENTITIES = ["users", "documents", "subjects", "courses"]
+DOC_TYPES = ['Lecture Notes', 'Assignment', 'Exam', 'Project', 'Study Guide']
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+# --- server -------------------------------------------------------------------
+
+def use_in_memory_mongo():
+    """Point both connection classes at one shared mongomock database"""
+    try:
+        import mongomock
+        import mongomock_motor
+    except ImportError:
+        raise SystemExit("--in-memory needs the mongomock and mongomock_motor packages")
+    import app.connection.connection as connection
+    shared = mongomock.MongoClient()
+    connection.MongoClient = lambda *args, **kwargs: shared
+    connection.AsyncIOMotorClient = lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=shared)
+
+
+def dataset_shape(documents):
+    """How many of each record a dataset with `documents` documents gets"""
+    return {"courses": 8, "subjects_per_course": 6, "users": max(100, documents // 20), "documents": documents}
+
+
+def serve(args):
+    """Seed the database for one dataset size, then run the API on it (child process)"""
+    if args.in_memory:
+        use_in_memory_mongo()
+    from app.connection.connection import MongoDBConnection
+    import loaddb
+    import uvicorn
+
+    shape = dataset_shape(args.documents)
+    loaddb.seed_database(MongoDBConnection().get_database(), random.Random(args.seed), shape["courses"],
+                         shape["subjects_per_course"], shape["users"], 0.05, shape["documents"],
+                         workers=1 if args.in_memory else 4, link_documents=not args.in_memory)
+    asyncio.run(loaddb.finish())
+    uvicorn.run("main:app", host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, documents, log):
+    """Start the seeding + serving child and wait until the API answers"""
+    port = free_port()
+    env = dict(os.environ, MONGODB_DB_NAME=args.db_name)
+    env.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    command = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(port),
+               "--documents", str(documents), "--seed", str(args.seed)]
+    if args.in_memory:
+        command.append("--in-memory")
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            status, _ = Client("127.0.0.1", port).request("GET", "/")
+            if status == 200:
+                return process, port
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    log.seek(0)
+    raise SystemExit(f"API did not come up for {documents} documents; server output:\n" + log.read().decode()[-4000:])
+
+
+# --- client -------------------------------------------------------------------
+
+class Client:
+    """One keep-alive HTTP connection per thread"""
+
+    def __init__(self, host, port, timeout=60.0):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        """Send a request and return (status_code, decoded JSON body or None)"""
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        for attempt in range(2):
+            connection = getattr(self.local, "connection", None)
+            if connection is None:
+                connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                raw = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+        try:
+            return response.status, json.loads(raw) if raw else None
+        except ValueError:
+            return response.status, None
+
+
+class Context:
+    """What the scenarios need to know about the seeded data, plus the records they create"""
+
+    def __init__(self, client, documents, seed):
+        self.client = client
+        self.documents = documents
+        self.rng = random.Random(seed)
+        self.run = uuid.uuid4().hex[:8]
+        self.users = self._get("/users/?limit=500&fields=id,_id,type")
+        self.teachers = [user["id"] for user in self.users if user.get("type") == "teacher"] or [1]
+        self.subjects = self._get("/subjects/?limit=500&fields=id,_id,name")
+        self.courses = self._get("/courses/?limit=500&fields=id,_id")
+        self.created = {entity: [] for entity in ENTITIES}
+        self.created_batches = {entity: [] for entity in ENTITIES}
+
+    def _get(self, path):
+        status, body = self.client.request("GET", path)
+        if status != 200 or not body:
+            raise SystemExit(f"GET {path} returned {status}; is the dataset seeded?")
+        return body
+
+    def pick(self, rows, key="id"):
+        return self.rng.choice(rows)[key]
+
+    def latest_sync_token(self):
+        """A /sync token that is caught up, so syncing from it returns only what changed since"""
+        if getattr(self, "sync_token", None) is None:
+            body = {"next": None, "has_more": True}
+            while body["has_more"]:
+                body = self._get("/sync/?limit=500" + (f"&since={body['next']}" if body["next"] else ""))
+            self.sync_token = body["next"]
+        return self.sync_token
+
+    def search_term(self):
+        """A word from a subject name, so it matches subjects and the documents titled after them"""
+        return quote(self.rng.choice(self.pick(self.subjects, "name").split()))
+
+    def payload(self, entity, i):
+        """A create body that is unique within the run"""
+        if entity == "users":
+            return {"name": "Bench User", "email": f"bench-{self.run}-{i}@example.com", "type": "student"}
+        if entity == "subjects":
+            return {"name": f"Bench {self.run} {i}", "description": "Benchmark subject"}
+        if entity == "courses":
+            return {"name": f"Bench {self.run} {i}", "subjects": [self.pick(self.subjects)]}
+        return {"title": f"Bench {self.run} {i}", "file_url": f"https://files.example.com/{self.run}/{i}.pdf",
+                "type": self.rng.choice(DOC_TYPES), "grade": float(self.rng.randint(0, 100)), "teacher_id": self.rng.choice(self.teachers),
+                "subject_id": self.pick(self.subjects), "owner": self.pick(self.users, "_id")}
+
+
+def update_body(entity):
+    """A change to a field with no unique index, so every item of a run can get it"""
+    return {"documents": {"grade": 42.0}, "subjects": {"description": "Bench updated"}}.get(entity, {"name": "Bench Updated"})
+
+
+def read_scenarios(ctx):
+    """(route, label, request builder) for every read route; route is "METHOD /path/template" as in OpenAPI"""
+    doc_id = lambda: ctx.rng.randint(1, max(1, ctx.documents))
+    some = lambda rows, key="id": ",".join(str(row[key]) for row in ctx.rng.sample(rows, min(20, len(rows))))
+    return [
+        ("GET /users/", "GET /users/", lambda i: ("GET", "/users/?limit=100", None)),
+        ("GET /users/", "GET /users/?ids=", lambda i: ("GET", f"/users/?ids={some(ctx.users)}", None)),
+        ("GET /users/{user_id}", "GET /users/{user_id}", lambda i: ("GET", f"/users/{ctx.pick(ctx.users)}", None)),
+        ("GET /users/type/{user_type}", "GET /users/type/{user_type}",
+         lambda i: ("GET", f"/users/type/{('student', 'teacher')[i % 2]}?limit=100", None)),
+        ("GET /documents/", "GET /documents/", lambda i: ("GET", "/documents/?limit=100", None)),
+        ("GET /documents/", "GET /documents/?expand=", lambda i: ("GET", "/documents/?limit=100&expand=teacher,subject,owner", None)),
+        ("GET /documents/", "GET /documents/?ids=",
+         lambda i: ("GET", "/documents/?ids=" + ",".join(str(doc_id()) for _ in range(20)), None)),
+        ("GET /documents/", "GET /documents/?subject_id=&sort=-upload_date",
+         lambda i: ("GET", f"/documents/?subject_id={ctx.pick(ctx.subjects)}&sort=-upload_date&limit=100", None)),
+        ("GET /documents/", "GET /documents/?teacher_id=&grade_min=&sort=-grade",
+         lambda i: ("GET", f"/documents/?teacher_id={ctx.rng.choice(ctx.teachers)}&grade_min=60&sort=-grade&limit=100", None)),
+        ("GET /documents/", "GET /documents/?type=&uploaded_from=&sort=upload_date",
+         lambda i: ("GET", f"/documents/?type={DOC_TYPES[i % len(DOC_TYPES)].replace(' ', '%20')}&uploaded_from=2024-01-01&sort=upload_date&limit=100", None)),
+        ("GET /documents/{id}", "GET /documents/{id}", lambda i: ("GET", f"/documents/{doc_id()}", None)),
+        ("GET /documents/{id}", "GET /documents/{id}?expand=",
+         lambda i: ("GET", f"/documents/{doc_id()}?expand=teacher,subject,owner", None)),
+        ("GET /documents/type/{doc_type}", "GET /documents/type/{doc_type}",
+         lambda i: ("GET", f"/documents/type/{DOC_TYPES[i % len(DOC_TYPES)].replace(' ', '%20')}?limit=100", None)),
+        ("GET /documents/teacher/{teacher_id}", "GET /documents/teacher/{teacher_id}",
+         lambda i: ("GET", f"/documents/teacher/{ctx.rng.choice(ctx.teachers)}?limit=100", None)),
+        ("GET /documents/subject/{subject_id}", "GET /documents/subject/{subject_id}",
+         lambda i: ("GET", f"/documents/subject/{ctx.pick(ctx.subjects)}?limit=100", None)),
+        ("GET /documents/owner/{owner_id}", "GET /documents/owner/{owner_id}",
+         lambda i: ("GET", f"/documents/owner/{ctx.pick(ctx.users, '_id')}?limit=100", None)),
+        ("GET /subjects/", "GET /subjects/", lambda i: ("GET", "/subjects/?limit=100", None)),
+        ("GET /subjects/id/{id}", "GET /subjects/id/{id}", lambda i: ("GET", f"/subjects/id/{ctx.pick(ctx.subjects)}", None)),
+        ("GET /subjects/mongo/{mongo_id}", "GET /subjects/mongo/{mongo_id}",
+         lambda i: ("GET", f"/subjects/mongo/{ctx.pick(ctx.subjects, '_id')}", None)),
+        ("GET /subjects/course/{course_id}", "GET /subjects/course/{course_id}",
+         lambda i: ("GET", f"/subjects/course/{ctx.pick(ctx.courses)}", None)),
+        ("GET /courses/", "GET /courses/", lambda i: ("GET", "/courses/?limit=100", None)),
+        ("GET /courses/id/{id}", "GET /courses/id/{id}", lambda i: ("GET", f"/courses/id/{ctx.pick(ctx.courses)}", None)),
+        ("GET /courses/mongo/{mongo_id}", "GET /courses/mongo/{mongo_id}",
+         lambda i: ("GET", f"/courses/mongo/{ctx.pick(ctx.courses, '_id')}", None)),
+        ("GET /courses/subject/{subject_id}", "GET /courses/subject/{subject_id}",
+         lambda i: ("GET", f"/courses/subject/{ctx.pick(ctx.subjects)}", None)),
+        ("GET /search/", "GET /search/?q=", lambda i: ("GET", f"/search/?q={ctx.search_term()}&limit=20", None)),
+        ("GET /search/", "GET /search/?q=&type=",
+         lambda i: ("GET", f"/search/?q={ctx.search_term()}&type={DOC_TYPES[i % len(DOC_TYPES)].replace(' ', '%20')}&limit=20", None)),
+        ("GET /sync/", "GET /sync/", lambda i: ("GET", "/sync/?limit=500", None)),
+        ("GET /sync/", "GET /sync/?since=", lambda i: ("GET", f"/sync/?since={ctx.latest_sync_token()}", None)),
+    ]
+
+
+def write_scenarios(ctx, entity, bulk_size):
+    """Single then bulk create/update/delete for one collection, each step using what the one before created.
+
+    Every tuple is (route, label, builder, on_response, source): `source` is
+    the list whose length caps the request count, read when the step starts.
+    """
+    base = f"/{entity}"
+    param = {"users": "user_id", "documents": "document_id", "subjects": "subject_id", "courses": "course_id"}[entity]
+    created, batches = ctx.created[entity], ctx.created_batches[entity]
+
+    def remember(status, body):
+        if status == 201 and body:
+            created.append(body["id"])
+
+    def remember_batch(status, body):
+        if status == 200 and body:
+            batches.append([item["id"] for item in body["items"] if item["status"] == "created"])
+
+    return [
+        (f"POST {base}/", f"POST {base}/", lambda i: ("POST", f"{base}/", ctx.payload(entity, i)), remember, None),
+        (f"PUT {base}/{{{param}}}", f"PUT {base}/{{{param}}}",
+         lambda i: ("PUT", f"{base}/{created[i]}", update_body(entity)), None, created),
+        (f"DELETE {base}/{{{param}}}", f"DELETE {base}/{{{param}}}",
+         lambda i: ("DELETE", f"{base}/{created[i]}", None), None, created),
+        (f"POST {base}/bulk", f"POST {base}/bulk",
+         lambda i: ("POST", f"{base}/bulk", [ctx.payload(entity, f"b{i}-{j}") for j in range(bulk_size)]), remember_batch, None),
+        (f"PUT {base}/bulk", f"PUT {base}/bulk",
+         lambda i: ("PUT", f"{base}/bulk", [{"id": id, **update_body(entity)} for id in batches[i]]), None, batches),
+        (f"POST {base}/bulk/delete", f"POST {base}/bulk/delete",
+         lambda i: ("POST", f"{base}/bulk/delete", [{"id": id} for id in batches[i]]), None, batches),
+    ]
+
+
+def timed(client, request, on_response):
+    """Send one request and return (latency_seconds, ok)"""
+    method, path, body = request
+    started = time.perf_counter()
+    try:
+        status, payload = client.request(method, path, body)
+    except (http.client.HTTPException, OSError):
+        return time.perf_counter() - started, False
+    latency = time.perf_counter() - started
+    if on_response:
+        on_response(status, payload)
+    return latency, status < 400
+
+
+def run_scenario(client, requests, concurrency, on_response=None):
+    """Send the prepared requests from `concurrency` threads and summarize the latencies"""
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, ok in pool.map(lambda request: timed(client, request, on_response), requests):
+            latencies.append(latency)
+            errors += not ok
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "requests": len(requests),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(requests) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+    }
+    result.update({f"p{pct}_ms": round(percentile(latencies, pct) * 1000, 2) for pct in PERCENTILES})
+    return result
+
+
+def uncovered_routes(client, covered):
+    """Routes of the four routers the server exposes that no scenario exercises"""
+    _, spec = client.request("GET", "/openapi.json")
+    routes = {
+        f"{method.upper()} {path}"
+        for path, operations in (spec or {}).get("paths", {}).items()
+        if path.split("/")[1] in ENTITIES
+        for method in operations
+    }
+    return sorted(routes - covered)
+
+
+def bench_size(args, documents):
+    """Seed one dataset size, run every scenario against it, and return the results"""
+    with tempfile.TemporaryFile() as log:
+        print(f"[route_bench] seeding {documents:,} documents and starting the API...")
+        process, port = start_server(args, documents, log)
+        try:
+            client = Client("127.0.0.1", port)
+            ctx = Context(client, documents, args.seed)
+            scenarios, covered = {}, set()
+            for route, label, build in read_scenarios(ctx):
+                for i in range(args.warmup):
+                    client.request(*build(i))
+                scenarios[label] = dict(route=route, **run_scenario(client, [build(i) for i in range(args.requests)], args.concurrency))
+                covered.add(route)
+                print(f"[route_bench] {documents}: {label}: {json.dumps(scenarios[label])}")
+            for entity in ENTITIES:
+                for route, label, build, on_response, source in write_scenarios(ctx, entity, args.bulk_size):
+                    count = args.requests if source is None else min(args.requests, len(source))
+                    scenarios[label] = dict(route=route, **run_scenario(client, [build(i) for i in range(count)],
+                                                                        args.concurrency, on_response))
+                    covered.add(route)
+                    print(f"[route_bench] {documents}: {label}: {json.dumps(scenarios[label])}")
+            missing = uncovered_routes(client, covered)
+            for route in missing:
+                print(f"[route_bench] no scenario for {route}")
+            return {"dataset": dataset_shape(documents), "scenarios": scenarios, "uncovered_routes": missing}
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- compare ------------------------------------------------------------------
+
+def compare(baseline, current, threshold, min_delta_ms):
+    """Scenarios whose p95 latency rose or whose throughput fell by more than `threshold` percent.
+
+    A latency change also has to exceed `min_delta_ms`, so jitter on
+    sub-millisecond routes is not reported. New errors are always reported.
+    """
+    regressions = []
+    for size, run in current["sizes"].items():
+        base_run = baseline["sizes"].get(size)
+        if not base_run:
+            continue
+        for label, result in run["scenarios"].items():
+            base = base_run["scenarios"].get(label)
+            if not base:
+                continue
+            reasons = []
+            delta = result["p95_ms"] - base["p95_ms"]
+            if delta > min_delta_ms and delta > base["p95_ms"] * threshold / 100:
+                reasons.append(f"p95 {base['p95_ms']}ms -> {result['p95_ms']}ms")
+            if base["throughput_rps"] and result["throughput_rps"] < base["throughput_rps"] * (1 - threshold / 100):
+                reasons.append(f"throughput {base['throughput_rps']} -> {result['throughput_rps']} req/s")
+            if result["errors"] > base["errors"]:
+                reasons.append(f"errors {base['errors']} -> {result['errors']}")
+            if reasons:
+                regressions.append({"size": size, "scenario": label, "reasons": reasons})
+    return regressions
+
+
+def report_comparison(baseline, current, threshold, min_delta_ms):
+    """Print the regressions and return the process exit code (1 if there are any)"""
+    regressions = compare(baseline, current, threshold, min_delta_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression['size']} documents, {regression['scenario']}: {'; '.join(regression['reasons'])}")
+    print(f"{len(regressions)} regression(s) against {baseline['meta'].get('revision') or 'baseline'} "
+          f"(threshold {threshold}%, min p95 delta {min_delta_ms}ms)")
+    return 1 if regressions else 0
+
+
+def load_results(path):
+    with open(path) as results:
+        return json.load(results)
+
+
+# --- main ---------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Route throughput and latency benchmark with regression checks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Benchmark every route at each dataset size")
+    run.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated document counts to test at")
+    run.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    run.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    run.add_argument("--warmup", type=int, default=20, help="Untimed requests before each read scenario")
+    run.add_argument("--bulk-size", type=int, default=50, help="Items per bulk request")
+    run.add_argument("--seed", type=int, default=42, help="Random seed for the dataset and request mix")
+    run.add_argument("--db-name", default="university_bench", help="Database to seed (dropped for every size)")
+    run.add_argument("--in-memory", action="store_true", help="Use mongomock instead of a mongod")
+    run.add_argument("--startup-timeout", type=float, default=900, help="Seconds to wait for seeding and startup")
+    run.add_argument("--output", default="route_bench.json", help="Where to write the results")
+    run.add_argument("--baseline", help="Earlier results file to compare against")
+    run.add_argument("--threshold", type=float, default=10.0, help="Percent change counted as a regression")
+    run.add_argument("--min-delta-ms", type=float, default=1.0, help="Smallest p95 increase counted as a regression")
+
+    diff = commands.add_parser("compare", help="Compare two results files")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=10.0, help="Percent change counted as a regression")
+    diff.add_argument("--min-delta-ms", type=float, default=1.0, help="Smallest p95 increase counted as a regression")
+
+    child = commands.add_parser("serve", help="(internal) seed one dataset and run the API on it")
+    child.add_argument("--port", type=int, required=True)
+    child.add_argument("--documents", type=int, required=True)
+    child.add_argument("--seed", type=int, default=42)
+    child.add_argument("--in-memory", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+        return
+    if args.command == "compare":
+        sys.exit(report_comparison(load_results(args.baseline), load_results(args.current), args.threshold, args.min_delta_ms))
+
+    results = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "backend": "mongomock" if args.in_memory else "mongod",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "bulk_size": args.bulk_size,
+            "seed": args.seed,
+        },
+        "sizes": {},
+    }
+    for size in [int(size) for size in args.sizes.split(",")]:
+        results["sizes"][str(size)] = bench_size(args, size)
+        # Saved after every size so a long run that is interrupted still leaves results
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    print(f"[route_bench] results written to {args.output}")
+    if args.baseline:
+        sys.exit(report_comparison(load_results(args.baseline), results, args.threshold, args.min_delta_ms))
+
+
+if __name__ == "__main__":
+    main()
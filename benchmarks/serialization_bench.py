@@ -0,0 +1,112 @@
+"""Per-record CPU cost of rendering a large document list.
+
+Serves the same synthetic rows (shaped like DocumentController output)
+through two in-process routes and times them with process CPU time:
+
+- validated: Document(**row) in the service, then FastAPI re-validates the
+  models against response_model and encodes them with the stdlib encoder
+  (the old read path)
+- fast: RowShape + respond, i.e. rows laid out like the model without
+  building one, rendered with orjson and no response_model pass (the
+  current read path)
+
+No database or server is needed; run it from the repository root:
+
+    python benchmarks/serialization_bench.py --records 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from app.models.document import Document
+from app.utils.serialization import RowShape, respond
+
+DOC_TYPES = ['Lecture Notes', 'Assignment', 'Exam', 'Project', 'Study Guide']
+
+
+def make_rows(count):
+    """Rows as the controller returns them: ObjectIds already stringified, datetimes left as is"""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": f"{i:024x}",
+            "id": i,
+            "title": f"Document {i}",
+            "file_url": f"https://files.example.com/{i}.pdf",
+            "type": DOC_TYPES[i % len(DOC_TYPES)],
+            "grade": float(i % 100),
+            "teacher_id": i % 50 + 1,
+            "subject_id": i % 20 + 1,
+            "owner": f"{i % 500:024x}",
+            "upload_date": start + timedelta(minutes=i),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def build_app(rows):
+    app = FastAPI()
+    shape = RowShape(Document)
+
+    @app.get("/validated", response_model=List[Document])
+    async def validated():
+        return [Document(**row) for row in rows]
+
+    @app.get("/fast", response_model=List[Document])
+    async def fast(response: Response):
+        return respond(response, [shape(row) for row in rows])
+
+    return app
+
+
+def measure(client, path, repeat, records):
+    client.get(path)  # warm-up
+    cpu = []
+    wall = []
+    body = b""
+    for _ in range(repeat):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        body = client.get(path).content
+        cpu.append(time.process_time() - cpu_start)
+        wall.append(time.perf_counter() - wall_start)
+    best_cpu = min(cpu)
+    return {
+        "path": path,
+        "records": records,
+        "cpu_ms": round(best_cpu * 1000, 2),
+        "wall_ms": round(min(wall) * 1000, 2),
+        "cpu_us_per_record": round(best_cpu / records * 1e6, 3),
+        "bytes": len(body),
+    }, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-path serialization benchmark")
+    parser.add_argument("--records", type=int, default=10000, help="Number of documents in the list")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per path (best is reported)")
+    args = parser.parse_args()
+
+    rows = make_rows(args.records)
+    with TestClient(build_app(rows)) as client:
+        slow, slow_body = measure(client, "/validated", args.repeat, args.records)
+        fast, fast_body = measure(client, "/fast", args.repeat, args.records)
+
+    if json.loads(slow_body) != json.loads(fast_body):
+        print("warning: the two paths rendered different JSON", file=sys.stderr)
+    print(json.dumps(slow))
+    print(json.dumps(fast))
+    print(json.dumps({"speedup": round(slow["cpu_ms"] / fast["cpu_ms"], 2) if fast["cpu_ms"] else None}))
+
+
+if __name__ == "__main__":
+    main()
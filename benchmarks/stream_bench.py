@@ -0,0 +1,118 @@
+"""Time-to-first-byte and memory benchmark for NDJSON streaming.
+
+Reads a whole collection twice from a running server: once as an NDJSON
+stream (Accept: application/x-ndjson) and once by walking the JSON pages
+with the X-Next-Cursor header. For each mode it reports time to first
+byte, total time, records and bytes received. Pass --server-pid to also
+sample the server's resident memory while the transfer runs, which should
+stay flat for the stream whatever the collection size:
+
+    python benchmarks/stream_bench.py --path /documents/ --server-pid $(pgrep -f "uvicorn main:app")
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+
+
+def read_rss_kb(pid):
+    """Current resident set size of a process in kB (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler(threading.Thread):
+    """Samples a process's RSS in the background and keeps the peak"""
+
+    def __init__(self, pid, interval=0.01):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.baseline_kb = read_rss_kb(pid)
+        self.peak_kb = self.baseline_kb
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            rss = read_rss_kb(self.pid)
+            if rss is not None and (self.peak_kb is None or rss > self.peak_kb):
+                self.peak_kb = rss
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def fetch(base_url, path, headers):
+    """GET one URL; return (ttfb_s, total_s, body, response)"""
+    url = urllib.parse.urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=300)
+    start = time.perf_counter()
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    first = response.read(1)
+    ttfb = time.perf_counter() - start
+    body = first + response.read()
+    total = time.perf_counter() - start
+    connection.close()
+    return ttfb, total, body, response
+
+
+def bench_ndjson(base_url, path):
+    ttfb, total, body, _ = fetch(base_url, path, {"Accept": "application/x-ndjson"})
+    return {"mode": "ndjson", "ttfb_ms": round(ttfb * 1000, 2), "total_ms": round(total * 1000, 2),
+            "records": body.count(b"\n"), "bytes": len(body)}
+
+
+def bench_pages(base_url, path, limit):
+    ttfb = None
+    total_bytes = 0
+    records = 0
+    after = None
+    start = time.perf_counter()
+    while True:
+        query = {"limit": limit, **({"after": after} if after else {})}
+        page_ttfb, _, body, response = fetch(base_url, f"{path}?{urllib.parse.urlencode(query)}", {})
+        if ttfb is None:
+            ttfb = page_ttfb
+        total_bytes += len(body)
+        records += len(json.loads(body))
+        after = response.getheader("X-Next-Cursor")
+        if not after:
+            break
+    total = time.perf_counter() - start
+    return {"mode": f"json pages of {limit}", "ttfb_ms": round(ttfb * 1000, 2), "total_ms": round(total * 1000, 2),
+            "records": records, "bytes": total_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NDJSON streaming vs paged JSON benchmark")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the running API")
+    parser.add_argument("--path", default="/documents/", help="List route to read")
+    parser.add_argument("--limit", type=int, default=500, help="Page size for the paged JSON run")
+    parser.add_argument("--server-pid", type=int, help="PID of the API server, to sample its memory")
+    args = parser.parse_args()
+
+    for run in (lambda: bench_ndjson(args.url, args.path), lambda: bench_pages(args.url, args.path, args.limit)):
+        sampler = RssSampler(args.server_pid) if args.server_pid else None
+        if sampler:
+            sampler.start()
+        result = run()
+        if sampler:
+            sampler.stop()
+            result["server_rss_baseline_kb"] = sampler.baseline_kb
+            result["server_rss_peak_kb"] = sampler.peak_kb
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
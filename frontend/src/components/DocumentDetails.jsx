@@ -9,18 +9,14 @@ function DocumentDetails({ document, onClose }) {
   useEffect(() => {
     const fetchRelatedData = async () => {
       try {
-        if (document.teacher_id) {
-          const teacherResponse = await api.get(`/users/${document.teacher_id}`);
-          setTeacher(teacherResponse.data);
-        }
-        if (document.subject_id) {
-          const subjectResponse = await api.get(`/subjects/id/${document.subject_id}`);
-          setSubject(subjectResponse.data);
-        }
-        if (document.owner) {
-          const userResponse = await api.get(`/users/${document.owner}`);
-          setOwner(userResponse.data);
-        }
+        // The teacher, subject and owner come embedded in a single response
+        const response = await api.get(`/documents/${document.id}`, {
+          params: { expand: 'teacher,subject,owner', fields: 'id' },
+        });
+        const { teacher, subject, owner } = response.data.expanded;
+        setTeacher(teacher);
+        setSubject(subject);
+        setOwner(owner);
       } catch (error) {
         console.error('Error fetching related data:', error);
       }
@@ -1,6 +1,6 @@
 import React from 'react';
 
-function Table({ columns, data, onView, onEdit, onDelete }) {
+function Table({ columns, data, onView, onEdit, onDelete, hasMore = false, onLoadMore, loadingMore = false }) {
   return (
     <div className="overflow-x-auto">
       <table className="min-w-full divide-y divide-gray-200">
@@ -63,6 +63,17 @@ function Table({ columns, data, onView, onEdit, onDelete }) {
           ))}
         </tbody>
       </table>
+      {hasMore && onLoadMore && (
+        <div className="flex justify-center py-4">
+          <button
+            onClick={onLoadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 text-sm text-blue-600 hover:text-blue-800 disabled:text-gray-400"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
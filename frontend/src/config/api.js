@@ -33,4 +33,69 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints are paginated: each response carries at most `limit` items and,
+// when more remain, the cursor for the next page in the X-Next-Cursor header.
+export const fetchPage = async (url, { limit = 50, after = null, params = {} } = {}) => {
+  const response = await api.get(url, {
+    params: { ...params, limit, ...(after ? { after } : {}) },
+  });
+  return {
+    items: response.data,
+    nextCursor: response.headers['x-next-cursor'] || null,
+  };
+};
+
+// Follow the cursors until the whole list has been loaded (for dropdowns and lookups)
+export const fetchAll = async (url, params = {}) => {
+  let items = [];
+  let after = null;
+  do {
+    const page = await fetchPage(url, { limit: 500, after, params });
+    items = items.concat(page.items);
+    after = page.nextCursor;
+  } while (after);
+  return items;
+};
+
+// Fetch specific records in one request: one entry per id, in the same order,
+// null where the record does not exist. Use key 'mongo_ids' for MongoDB _ids.
+export const fetchMany = async (url, ids, { key = 'ids', fields = null } = {}) => {
+  if (!ids.length) return [];
+  const response = await api.get(url, {
+    params: { [key]: ids.join(','), ...(fields ? { fields } : {}) },
+  });
+  return response.data;
+};
+
+// Live updates from GET /events (server-sent events). `onChange` gets each change
+// event of the given collections; `onReset` is called when the server could not
+// replay what was missed while disconnected, and the list should be reloaded.
+// EventSource reconnects by itself and resumes from the last event it saw.
+// isLive() tells whether the feed is connected; while it is not, reload after writes.
+export const subscribeToChanges = (collections, { onChange, onReset }) => {
+  const source = new EventSource(`${API_BASE_URL}/events?collections=${[].concat(collections).join(',')}`);
+  let live = false;
+  source.onopen = () => { live = true; };
+  source.onerror = () => { live = false; };
+  source.addEventListener('change', (message) => onChange(JSON.parse(message.data)));
+  source.addEventListener('reset', () => onReset && onReset());
+  return {
+    isLive: () => live,
+    close: () => source.close(),
+  };
+};
+
+// Apply a change event to a loaded list. Inserts are only appended once the last
+// page is loaded (`hasMore` false); otherwise they turn up when paging reaches them.
+export const applyChange = (items, event, { hasMore = false } = {}) => {
+  if (event.operation === 'delete') {
+    return items.filter((item) => item._id !== event._id);
+  }
+  if (!event.document) return items;
+  if (items.some((item) => item._id === event._id)) {
+    return items.map((item) => (item._id === event._id ? event.document : item));
+  }
+  return event.operation === 'insert' && !hasMore ? [...items, event.document] : items;
+};
+
 export default api; 
\ No newline at end of file
@@ -1,9 +1,13 @@
-import { useState, useEffect } from 'react';
-import api from '../config/api';
+import { useState, useEffect, useRef } from 'react';
+import api, { applyChange, fetchAll, fetchPage, subscribeToChanges } from '../config/api';
 import Table from '../components/Table';
 
 function Courses() {
   const [courses, setCourses] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const nextCursorRef = useRef(null);
+  const feedRef = useRef(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [subjects, setSubjects] = useState([]);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [isViewModalOpen, setIsViewModalOpen] = useState(false);
@@ -36,14 +40,25 @@ function Courses() {
   useEffect(() => {
     fetchCourses();
     fetchSubjects();
+    // Apply other clients' (and our own) writes as they happen instead of reloading
+    feedRef.current = subscribeToChanges('courses', {
+      onChange: (event) => setCourses((current) => applyChange(current, event, { hasMore: Boolean(nextCursorRef.current) })),
+      onReset: fetchCourses,
+    });
+    return () => feedRef.current.close();
   }, []);
 
+  useEffect(() => {
+    nextCursorRef.current = nextCursor;
+  }, [nextCursor]);
+
   const fetchCourses = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await api.get('/courses');
-      setCourses(response.data);
+      const page = await fetchPage('/courses');
+      setCourses(page.items);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Error fetching courses:', error);
       setError('Failed to load courses. Please try again later.');
@@ -52,10 +67,23 @@ function Courses() {
     }
   };
 
+  const loadMoreCourses = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage('/courses', { after: nextCursor });
+      setCourses((current) => [...current, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error loading more courses:', error);
+      alert('Failed to load more courses. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchSubjects = async () => {
     try {
-      const response = await api.get('/subjects');
-      setSubjects(response.data);
+      setSubjects(await fetchAll('/subjects', { fields: 'id,name,description' }));
     } catch (error) {
       console.error('Error fetching subjects:', error);
     }
@@ -79,7 +107,7 @@ function Courses() {
     if (window.confirm('Are you sure you want to delete this course?')) {
       try {
         await api.delete(`/courses/${course.id}`);
-        fetchCourses();
+        if (!feedRef.current.isLive()) fetchCourses();
       } catch (error) {
         console.error('Error deleting course:', error);
         alert('Failed to delete course. Please try again.');
@@ -98,7 +126,7 @@ function Courses() {
       setIsModalOpen(false);
       setSelectedCourse(null);
       setFormData({ name: '', subjects: [] });
-      fetchCourses();
+      if (!feedRef.current.isLive()) fetchCourses();
     } catch (error) {
       console.error('Error saving course:', error);
       alert('Failed to save course. Please try again.');
@@ -167,6 +195,9 @@ function Courses() {
       <Table
         columns={columns}
         data={courses}
+        hasMore={Boolean(nextCursor)}
+        onLoadMore={loadMoreCourses}
+        loadingMore={loadingMore}
         onEdit={handleEdit}
         onDelete={handleDelete}
       />
@@ -20,19 +20,9 @@ function Dashboard() {
       setLoading(true);
       setError(null);
       
-      const [usersRes, coursesRes, subjectsRes, documentsRes] = await Promise.all([
-        api.get('/users'),
-        api.get('/courses'),
-        api.get('/subjects'),
-        api.get('/documents')
-      ]);
-
-      setStats({
-        users: usersRes.data.length,
-        courses: coursesRes.data.length,
-        subjects: subjectsRes.data.length,
-        documents: documentsRes.data.length
-      });
+      // Counts only; the server keeps them cached for a few seconds
+      const response = await api.get('/stats/');
+      setStats(response.data);
     } catch (error) {
       console.error('Error fetching stats:', error);
       setError('Failed to load dashboard data. Please try again later.');
@@ -1,10 +1,14 @@
-import React, { useState, useEffect } from 'react';
-import api from '../config/api';
+import React, { useState, useEffect, useRef } from 'react';
+import api, { applyChange, fetchAll, fetchPage, subscribeToChanges } from '../config/api';
 import Table from '../components/Table';
 import DocumentDetails from '../components/DocumentDetails';
 
 function Documents() {
   const [documents, setDocuments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const nextCursorRef = useRef(null);
+  const feedRef = useRef(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [selectedDocument, setSelectedDocument] = useState(null);
   const [isDetailsOpen, setIsDetailsOpen] = useState(false);
@@ -37,14 +41,25 @@ function Documents() {
     fetchTeachers();
     fetchSubjects();
     fetchUsers();
+    // Apply other clients' (and our own) writes as they happen instead of reloading
+    feedRef.current = subscribeToChanges('documents', {
+      onChange: (event) => setDocuments((current) => applyChange(current, event, { hasMore: Boolean(nextCursorRef.current) })),
+      onReset: fetchDocuments,
+    });
+    return () => feedRef.current.close();
   }, []);
 
+  useEffect(() => {
+    nextCursorRef.current = nextCursor;
+  }, [nextCursor]);
+
   const fetchDocuments = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await api.get('/documents');
-      setDocuments(response.data);
+      const page = await fetchPage('/documents');
+      setDocuments(page.items);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Error fetching documents:', error);
       setError('Failed to load documents. Please try again later.');
@@ -53,12 +68,23 @@ function Documents() {
     }
   };
 
+  const loadMoreDocuments = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage('/documents', { after: nextCursor });
+      setDocuments((current) => [...current, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error loading more documents:', error);
+      alert('Failed to load more documents. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchTeachers = async () => {
     try {
-      const response = await api.get('/users');
-      // Filter users to get only teachers
-      const teacherUsers = response.data.filter(user => user.type === 'teacher');
-      setTeachers(teacherUsers);
+      setTeachers(await fetchAll('/users/type/teacher', { fields: 'id,name' }));
     } catch (error) {
       console.error('Error fetching teachers:', error);
     }
@@ -66,8 +92,7 @@ function Documents() {
 
   const fetchSubjects = async () => {
     try {
-      const response = await api.get('/subjects');
-      setSubjects(response.data);
+      setSubjects(await fetchAll('/subjects', { fields: 'id,name' }));
     } catch (error) {
       console.error('Error fetching subjects:', error);
     }
@@ -75,8 +100,7 @@ function Documents() {
 
   const fetchUsers = async () => {
     try {
-      const response = await api.get('/users');
-      setUsers(response.data);
+      setUsers(await fetchAll('/users', { fields: 'id,_id,name' }));
     } catch (error) {
       console.error('Error fetching users:', error);
     }
@@ -105,7 +129,7 @@ function Documents() {
     if (window.confirm('Are you sure you want to delete this document?')) {
       try {
         await api.delete(`/documents/${document.id}`);
-        fetchDocuments();
+        if (!feedRef.current.isLive()) fetchDocuments();
       } catch (error) {
         console.error('Error deleting document:', error);
         alert('Failed to delete document. Please try again.');
@@ -137,7 +161,7 @@ function Documents() {
         subject_id: null,
         owner: null
       });
-      fetchDocuments();
+      if (!feedRef.current.isLive()) fetchDocuments();
     } catch (error) {
       console.error('Error saving document:', error);
       alert('Failed to save document. Please try again.');
@@ -158,7 +182,7 @@ function Documents() {
 
   const getOwnerName = (ownerId) => {
     if (!ownerId) return 'No Owner';
-    const owner = users.find(u => u.id === ownerId);
+    const owner = users.find(u => u._id === ownerId);
     return owner ? owner.name : 'Unknown Owner';
   };
 
@@ -254,6 +278,17 @@ function Documents() {
             ))}
           </tbody>
         </table>
+        {nextCursor && (
+          <div className="flex justify-center py-4">
+            <button
+              onClick={loadMoreDocuments}
+              disabled={loadingMore}
+              className="px-4 py-2 text-sm text-blue-600 hover:text-blue-800 disabled:text-gray-400"
+            >
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          </div>
+        )}
       </div>
 
       {isModalOpen && (
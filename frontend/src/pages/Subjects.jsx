@@ -1,9 +1,13 @@
-import { useState, useEffect } from 'react';
-import api from '../config/api';
+import { useState, useEffect, useRef } from 'react';
+import api, { applyChange, fetchAll, fetchPage, subscribeToChanges } from '../config/api';
 import Table from '../components/Table';
 
 function Subjects() {
   const [subjects, setSubjects] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const nextCursorRef = useRef(null);
+  const feedRef = useRef(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [teachers, setTeachers] = useState([]);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [isViewModalOpen, setIsViewModalOpen] = useState(false);
@@ -33,14 +37,25 @@ function Subjects() {
   useEffect(() => {
     fetchSubjects();
     fetchTeachers();
+    // Apply other clients' (and our own) writes as they happen instead of reloading
+    feedRef.current = subscribeToChanges('subjects', {
+      onChange: (event) => setSubjects((current) => applyChange(current, event, { hasMore: Boolean(nextCursorRef.current) })),
+      onReset: fetchSubjects,
+    });
+    return () => feedRef.current.close();
   }, []);
 
+  useEffect(() => {
+    nextCursorRef.current = nextCursor;
+  }, [nextCursor]);
+
   const fetchSubjects = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await api.get('/subjects');
-      setSubjects(response.data);
+      const page = await fetchPage('/subjects');
+      setSubjects(page.items);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Error fetching subjects:', error);
       setError('Failed to load subjects. Please try again later.');
@@ -49,11 +64,23 @@ function Subjects() {
     }
   };
 
+  const loadMoreSubjects = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage('/subjects', { after: nextCursor });
+      setSubjects((current) => [...current, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error loading more subjects:', error);
+      alert('Failed to load more subjects. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchTeachers = async () => {
     try {
-      const response = await api.get('/users');
-      const teacherUsers = response.data.filter(user => user.type === 'teacher');
-      setTeachers(teacherUsers);
+      setTeachers(await fetchAll('/users/type/teacher', { fields: 'id,name,email' }));
     } catch (error) {
       console.error('Error fetching teachers:', error);
     }
@@ -78,7 +105,7 @@ function Subjects() {
     if (window.confirm('Are you sure you want to delete this subject?')) {
       try {
         await api.delete(`/subjects/${subject.id}`);
-        fetchSubjects();
+        if (!feedRef.current.isLive()) fetchSubjects();
       } catch (error) {
         console.error('Error deleting subject:', error);
         alert('Failed to delete subject. Please try again.');
@@ -102,7 +129,7 @@ function Subjects() {
       setIsModalOpen(false);
       setSelectedSubject(null);
       setFormData({ name: '', description: '', teacher_id: null });
-      fetchSubjects();
+      if (!feedRef.current.isLive()) fetchSubjects();
     } catch (error) {
       console.error('Error saving subject:', error);
       alert('Failed to save subject. Please try again.');
@@ -148,6 +175,9 @@ function Subjects() {
       <Table
         columns={columns}
         data={subjects}
+        hasMore={Boolean(nextCursor)}
+        onLoadMore={loadMoreSubjects}
+        loadingMore={loadingMore}
         onEdit={handleEdit}
         onDelete={handleDelete}
         onRowClick={handleViewSubject}
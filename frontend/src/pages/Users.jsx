@@ -1,9 +1,13 @@
-import { useState, useEffect } from 'react';
-import api from '../config/api';
+import { useState, useEffect, useRef } from 'react';
+import api, { applyChange, fetchPage, subscribeToChanges } from '../config/api';
 import Table from '../components/Table';
 
 function Users() {
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const nextCursorRef = useRef(null);
+  const feedRef = useRef(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [selectedUser, setSelectedUser] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -25,14 +29,25 @@ function Users() {
 
   useEffect(() => {
     fetchUsers();
+    // Apply other clients' (and our own) writes as they happen instead of reloading
+    feedRef.current = subscribeToChanges('users', {
+      onChange: (event) => setUsers((current) => applyChange(current, event, { hasMore: Boolean(nextCursorRef.current) })),
+      onReset: fetchUsers,
+    });
+    return () => feedRef.current.close();
   }, []);
 
+  useEffect(() => {
+    nextCursorRef.current = nextCursor;
+  }, [nextCursor]);
+
   const fetchUsers = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await api.get('/users');
-      setUsers(response.data);
+      const page = await fetchPage('/users');
+      setUsers(page.items);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Error fetching users:', error);
       setError('Failed to load users. Please try again later.');
@@ -41,6 +56,20 @@ function Users() {
     }
   };
 
+  const loadMoreUsers = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage('/users', { after: nextCursor });
+      setUsers((current) => [...current, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error loading more users:', error);
+      alert('Failed to load more users. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleEdit = (user) => {
     setSelectedUser(user);
     setFormData({
@@ -57,7 +86,7 @@ function Users() {
     if (window.confirm('Are you sure you want to delete this user?')) {
       try {
         await api.delete(`/users/${user.id}`);
-        fetchUsers();
+        if (!feedRef.current.isLive()) fetchUsers();
       } catch (error) {
         console.error('Error deleting user:', error);
         alert('Failed to delete user. Please try again.');
@@ -76,7 +105,7 @@ function Users() {
       setIsModalOpen(false);
       setSelectedUser(null);
       setFormData({ name: '', email: '', type: 'student', courses: [], documents: [] });
-      fetchUsers();
+      if (!feedRef.current.isLive()) fetchUsers();
     } catch (error) {
       console.error('Error saving user:', error);
       alert('Failed to save user. Please try again.');
@@ -118,6 +147,9 @@ function Users() {
       <Table
         columns={columns}
         data={users}
+        hasMore={Boolean(nextCursor)}
+        onLoadMore={loadMoreUsers}
+        loadingMore={loadingMore}
         onEdit={handleEdit}
         onDelete={handleDelete}
       />
@@ -1,185 +1,363 @@
-from pymongo import MongoClient
-import json
+"""Generate a synthetic university dataset and bulk-load it into MongoDB.
+
+Courses, subjects, users and documents are generated with plausible shapes
+(a few popular subjects per course, a small share of teachers, owners with
+very different activity levels, grades that depend on both the student and
+the subject) and written in large unordered insert_many batches with no
+indexes in place. Every row is stamped with its change sequence number as
+it is generated, from one block of the shared sequence per collection. The
+indexes, id counters and grade summaries are built once everything is
+loaded, and rows/sec is reported per collection.
+
+The connection comes from MONGODB_URI and MONGODB_DB_NAME, the same
+settings the API uses. Every collection in that database is dropped first.
+
+    python loaddb.py                                  # small development dataset
+    python loaddb.py --users 200000 --documents 5000000 --workers 8
+    python loaddb.py --seed 7 --documents 100000      # reproducible
+"""
+from app.connection.connection import AsyncMongoDBConnection, MongoDBConnection
+from app.connection.indexes import IndexManager
+from app.connection.migrations import build_grade_stats
+from app.controller.counter_controller import CounterController
+from app.controller.sync_controller import SEQ_FIELD
+from app.utils.concurrency import INITIAL_VERSION, VERSION_FIELD
+from app.utils.emails import NORMALIZED_EMAIL_FIELD, normalize_email
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from typing import Dict, Iterable, Iterator, List
 from bson import ObjectId
+import argparse
+import asyncio
+import json
 import random
+import time
+import uuid
 
-# Connect to MongoDB
-client = MongoClient('mongodb://localhost:27017/')
-db = client['university_db']  # Create a database named university_db
-
-# Read the JSON schema
-with open('JSON_db.json', 'r') as file:
-    schema = json.load(file)
-
-# Clear existing collections
-for collection in db.list_collection_names():
-    db[collection].drop()
-
-# Create collections
-for collection in schema:
-    collection_name = collection['name']
-    if collection_name not in db.list_collection_names():
-        db.create_collection(collection_name)
-
-# Sample data
-courses_data = [
-    {
-        'id': 1,
-        'name': 'Computer Science',
-        'subjects': [1, 2, 3, 4]  # Will be updated with actual subject IDs
-    },
-    {
-        'id': 2,
-        'name': 'Business Administration',
-        'subjects': [5, 6, 7, 8]
-    },
-    {
-        'id': 3,
-        'name': 'Engineering',
-        'subjects': [9, 10, 11, 12]
-    }
-]
+SEQUENCES = ["users", "documents", "subjects", "courses"]
+DEFAULT_BATCH_SIZE = 10000
+PROGRESS_EVERY_SECONDS = 5.0
+UPLOAD_WINDOW_DAYS = 730
+UNGRADED_SHARE = 0.08
 
-subjects_data = [
-    # Computer Science subjects
-    {'id': 1, 'name': 'Programming Fundamentals', 'description': 'Introduction to programming concepts'},
-    {'id': 2, 'name': 'Database Systems', 'description': 'Study of database design and management'},
-    {'id': 3, 'name': 'Web Development', 'description': 'Modern web development technologies'},
-    {'id': 4, 'name': 'Artificial Intelligence', 'description': 'Introduction to AI and machine learning'},
-    
-    # Business Administration subjects
-    {'id': 5, 'name': 'Marketing', 'description': 'Principles of marketing and market analysis'},
-    {'id': 6, 'name': 'Financial Management', 'description': 'Corporate finance and investment'},
-    {'id': 7, 'name': 'Business Strategy', 'description': 'Strategic planning and management'},
-    {'id': 8, 'name': 'Operations Management', 'description': 'Business operations and logistics'},
-    
-    # Engineering subjects
-    {'id': 9, 'name': 'Mechanics', 'description': 'Classical mechanics and dynamics'},
-    {'id': 10, 'name': 'Electronics', 'description': 'Electronic circuits and systems'},
-    {'id': 11, 'name': 'Materials Science', 'description': 'Study of materials and their properties'},
-    {'id': 12, 'name': 'Thermodynamics', 'description': 'Heat and energy transfer'}
+COURSE_NAMES = [
+    "Computer Science", "Business Administration", "Engineering", "Mathematics", "Physics",
+    "Chemistry", "Biology", "Economics", "Psychology", "History", "Philosophy", "Law",
+    "Medicine", "Architecture", "Music", "Linguistics", "Political Science", "Sociology",
+    "Statistics", "Environmental Science",
 ]
-
-# Create teachers
-teachers_data = [
-    {
-        'id': 1,
-        'name': 'Dr. Sarah Johnson',
-        'email': 'sarah.johnson@university.edu',
-        'type': 'teacher',
-        'courses': [1],  # Computer Science
-        'documents': []
-    },
-    {
-        'id': 2,
-        'name': 'Prof. Michael Chen',
-        'email': 'michael.chen@university.edu',
-        'type': 'teacher',
-        'courses': [2],  # Business Administration
-        'documents': []
-    },
-    {
-        'id': 3,
-        'name': 'Dr. Emily Rodriguez',
-        'email': 'emily.rodriguez@university.edu',
-        'type': 'teacher',
-        'courses': [3],  # Engineering
-        'documents': []
-    }
+SUBJECT_PREFIXES = [
+    "Introduction to", "Foundations of", "Applied", "Advanced", "Topics in", "Research Methods in",
+    "History of", "Seminar in", "Quantitative", "Computational", "Ethics in", "Capstone in",
+]
+FIRST_NAMES = [
+    "Sarah", "Michael", "Emily", "John", "Emma", "James", "Sophia", "Liam", "Olivia", "Noah",
+    "Ava", "Lucas", "Mia", "Ethan", "Isabella", "Mateo", "Amelia", "Daniel", "Harper", "David",
+    "Aisha", "Wei", "Priya", "Kenji", "Fatima", "Carlos", "Ana", "Omar", "Yuki", "Ines",
+]
+LAST_NAMES = [
+    "Johnson", "Chen", "Rodriguez", "Smith", "Garcia", "Nguyen", "Patel", "Kim", "Müller", "Rossi",
+    "Silva", "Khan", "Tanaka", "Okafor", "Novak", "Dubois", "Larsen", "Cohen", "Singh", "Brown",
+    "Lopez", "Wilson", "Martin", "Ahmed", "Kowalski", "Hansen", "Moreau", "Ivanova", "Park", "Costa",
 ]
+TEACHER_TITLES = ["Dr.", "Prof."]
+
+# Which document types each kind of user uploads, and how often
+TEACHER_DOCUMENT_TYPES = {"Lecture Notes": 55, "Study Guide": 20, "Exam": 15, "Assignment": 10}
+STUDENT_DOCUMENT_TYPES = {"Assignment": 45, "Project": 20, "Exam": 20, "Study Guide": 10, "Lecture Notes": 5}
+# Types that carry a grade when a student uploads them
+GRADED_TYPES = {"Assignment", "Project", "Exam"}
+
+
+def batched(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Split a stream of rows into lists of at most `size`"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _insert(collection, batch: List[Dict]) -> int:
+    """Insert one batch unordered and return how many rows were written"""
+    try:
+        return len(collection.insert_many(batch, ordered=False, bypass_document_validation=True).inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        print(f"[loaddb] {collection.name}: {len(errors)} rows rejected, first: {errors[0]['errmsg'] if errors else e}")
+        return e.details.get("nInserted", 0)
+
+
+def load(collection, rows: Iterable[Dict], batch_size: int, workers: int) -> Dict:
+    """Write rows in unordered insert_many batches, `workers` batches in flight at a time.
+
+    Rows are generated while earlier batches are on the wire; at most two
+    batches per worker are held in memory.
+    """
+    started = last_report = time.perf_counter()
+    inserted = 0
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in batched(rows, batch_size):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                inserted += sum(future.result() for future in done)
+            pending.add(pool.submit(_insert, collection, batch))
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_EVERY_SECONDS:
+                print(f"[loaddb] {collection.name}: {inserted:,} rows, {inserted / (now - started):,.0f} rows/sec")
+                last_report = now
+        inserted += sum(future.result() for future in wait(pending).done)
+    seconds = time.perf_counter() - started
+    rate = inserted / seconds if seconds else 0.0
+    print(f"[loaddb] {collection.name}: {inserted:,} rows in {seconds:.1f}s ({rate:,.0f} rows/sec)")
+    return {"rows": inserted, "seconds": round(seconds, 2), "rows_per_sec": round(rate)}
+
+
+def _unique_name(name: str, taken: set) -> str:
+    """`name`, or `name` with the first free numeric suffix"""
+    candidate, n = name, 2
+    while candidate in taken:
+        candidate, n = f"{name} {n}", n + 1
+    taken.add(candidate)
+    return candidate
+
+
+def generate_courses_and_subjects(rng: random.Random, courses: int, subjects_per_course: int):
+    """Courses, each with its own subjects; subject popularity within a course is Zipf-like"""
+    course_rows, subject_rows = [], []
+    course_names, subject_names = set(), set()
+    for course_id in range(1, courses + 1):
+        course_name = _unique_name(COURSE_NAMES[(course_id - 1) % len(COURSE_NAMES)], course_names)
+        count = max(1, round(rng.gauss(subjects_per_course, subjects_per_course / 4)))
+        subject_ids = []
+        for prefix in rng.sample(SUBJECT_PREFIXES * (count // len(SUBJECT_PREFIXES) + 1), count):
+            subject_id = len(subject_rows) + 1
+            name = _unique_name(f"{prefix} {course_name}", subject_names)
+            subject_rows.append({
+                "id": subject_id,
+                "name": name,
+                "description": f"{name}, part of the {course_name} programme",
+                VERSION_FIELD: INITIAL_VERSION,
+                # Generation-only: mean grade for the subject, dropped before insert
+                "_difficulty": rng.gauss(74, 6),
+            })
+            subject_ids.append(subject_id)
+        course_rows.append({"id": course_id, "name": course_name, "subjects": subject_ids, VERSION_FIELD: INITIAL_VERSION})
+    return course_rows, subject_rows
+
+
+def generate_users(rng: random.Random, count: int, teacher_ratio: float, courses: int) -> List[Dict]:
+    """Users with client-side _ids, so documents can reference their owners before they are written.
+
+    The first teachers cover one course each, so every course has at least one
+    where there are enough of them. Each user also gets an activity weight
+    (log-normal, so a few upload a lot) and, for students, an ability offset.
+    """
+    teachers = max(1, round(count * teacher_ratio)) if count else 0
+    users = []
+    for user_id in range(1, count + 1):
+        is_teacher = user_id <= teachers
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        email = f"{first}.{last}.{user_id}@university.edu".lower()
+        if is_teacher:
+            home = (user_id - 1) % courses + 1
+            user_courses = [home] if rng.random() < 0.8 else sorted({home, rng.randint(1, courses)})
+        else:
+            user_courses = [rng.randint(1, courses)]
+            if rng.random() < 0.15:
+                user_courses = sorted(set(user_courses) | {rng.randint(1, courses)})
+        users.append({
+            "_id": ObjectId(),
+            "id": user_id,
+            "name": f"{rng.choice(TEACHER_TITLES)} {first} {last}" if is_teacher else f"{first} {last}",
+            "email": email,
+            NORMALIZED_EMAIL_FIELD: normalize_email(email),
+            "type": "teacher" if is_teacher else "student",
+            "courses": user_courses,
+            "documents": [],
+            VERSION_FIELD: INITIAL_VERSION,
+            # Generation-only fields, dropped before insert
+            "_activity": rng.lognormvariate(0, 1),
+            "_ability": 0.0 if is_teacher else rng.gauss(0, 8),
+        })
+    return users
+
 
-# Create students
-students_data = []
-for i in range(15):
-    student = {
-        'id': i + 4,  # Start from 4 since teachers are 1-3
-        'name': f'Student {i+1}',
-        'email': f'student{i+1}@university.edu',
-        'type': 'student',
-        'courses': [random.randint(1, 3)],  # Random course assignment
-        'documents': []
+def generate_documents(rng: random.Random, count: int, users: List[Dict], courses: List[Dict],
+                       subjects: List[Dict]) -> Iterator[Dict]:
+    """Yield documents one by one; owners are picked by activity, subjects by popularity within the course"""
+    difficulty = {subject["id"]: subject["_difficulty"] for subject in subjects}
+    subject_names = {subject["id"]: subject["name"] for subject in subjects}
+    course_subjects = {course["id"]: course["subjects"] for course in courses}
+    # 1/rank weights: the first subjects of a course get most of its documents
+    subject_weights = {
+        course_id: list(accumulate(1 / rank for rank in range(1, len(ids) + 1)))
+        for course_id, ids in course_subjects.items()
     }
-    students_data.append(student)
-
-# Insert courses and subjects
-for course in courses_data:
-    db['courses'].insert_one(course)
-
-for subject in subjects_data:
-    db['subjects'].insert_one(subject)
-
-# Insert users (teachers and students)
-for teacher in teachers_data:
-    db['users'].insert_one(teacher)
-
-for student in students_data:
-    db['users'].insert_one(student)
-
-# Create documents
-document_types = ['Lecture Notes', 'Assignment', 'Exam', 'Project', 'Study Guide']
-document_titles = [
-    'Introduction to Programming',
-    'Database Design Principles',
-    'Web Development Basics',
-    'AI Fundamentals',
-    'Marketing Strategy',
-    'Financial Analysis',
-    'Business Planning',
-    'Operations Management',
-    'Mechanical Systems',
-    'Circuit Design',
-    'Materials Properties',
-    'Heat Transfer'
-]
+    teachers_by_course: Dict[int, List[int]] = {}
+    for user in users:
+        if user["type"] == "teacher":
+            for course_id in user["courses"]:
+                teachers_by_course.setdefault(course_id, []).append(user["id"])
+    any_teacher = [user["id"] for user in users if user["type"] == "teacher"]
+    owner_weights = list(accumulate(user["_activity"] for user in users))
+    type_choices = {
+        kind: (list(weights), list(accumulate(weights.values())))
+        for kind, weights in (("teacher", TEACHER_DOCUMENT_TYPES), ("student", STUDENT_DOCUMENT_TYPES))
+    }
+    now = datetime.utcnow()
 
-# Create documents for teachers
-for teacher in teachers_data:
-    for i in range(3):  # 3 documents per teacher
-        doc = {
-            'id': len(list(db['documents'].find())) + 1,
-            'title': f'{document_titles[i]} - {document_types[i]}',
-            'upload_date': datetime.now() - timedelta(days=random.randint(1, 30)),
-            'file_url': f'https://university.edu/documents/{teacher["id"]}_{i+1}.pdf',
-            'type': document_types[i],
-            'grade': None,
-            'teacher_id': teacher['id'],
-            'subject_id': teacher['courses'][0] * 4 - 3 + i,  # Related to teacher's course
-            'owner': ObjectId()
-        }
-        db['documents'].insert_one(doc)
-        # Update teacher's documents
-        db['users'].update_one(
-            {'id': teacher['id']},
-            {'$push': {'documents': doc['id']}}
-        )
-
-# Create documents for students
-for student in students_data:
-    for i in range(2):  # 2 documents per student
-        doc = {
-            'id': len(list(db['documents'].find())) + 1,
-            'title': f'Assignment {i+1} - {document_titles[student["courses"][0] * 4 - 4 + i]}',
-            'upload_date': datetime.now() - timedelta(days=random.randint(1, 30)),
-            'file_url': f'https://university.edu/documents/{student["id"]}_{i+1}.pdf',
-            'type': 'Assignment',
-            'grade': random.randint(60, 100),
-            'teacher_id': student['courses'][0],  # Course teacher
-            'subject_id': student['courses'][0] * 4 - 3 + i,  # Related to student's course
-            'owner': ObjectId()
+    for document_id in range(1, count + 1):
+        owner = rng.choices(users, cum_weights=owner_weights)[0]
+        course_id = rng.choice(owner["courses"])
+        subject_id = rng.choices(course_subjects[course_id], cum_weights=subject_weights[course_id])[0]
+        names, weights = type_choices[owner["type"]]
+        doc_type = rng.choices(names, cum_weights=weights)[0]
+        if owner["type"] == "teacher":
+            teacher_id = owner["id"]
+        else:
+            teacher_id = rng.choice(teachers_by_course.get(course_id) or any_teacher)
+
+        grade = None
+        if owner["type"] == "student" and doc_type in GRADED_TYPES and rng.random() >= UNGRADED_SHARE:
+            raw = rng.gauss(difficulty[subject_id] + owner["_ability"], 10)
+            grade = min(100.0, max(0.0, round(raw * 2) / 2))
+
+        # Skewed towards recent uploads
+        age = timedelta(days=UPLOAD_WINDOW_DAYS * rng.random() ** 1.5, seconds=rng.randint(0, 86399))
+        yield {
+            "id": document_id,
+            "title": f"{doc_type} {rng.randint(1, 12)} - {subject_names[subject_id]}",
+            "upload_date": now - age,
+            "file_url": f"https://university.edu/documents/{document_id}.pdf",
+            "type": doc_type,
+            "grade": grade,
+            "teacher_id": teacher_id,
+            "subject_id": subject_id,
+            "owner": owner["_id"],
+            VERSION_FIELD: INITIAL_VERSION,
         }
-        db['documents'].insert_one(doc)
-        # Update student's documents
-        db['users'].update_one(
-            {'id': student['id']},
-            {'$push': {'documents': doc['id']}}
-        )
-
-print("Database has been created with sample data!")
-print("\nCollections created:", db.list_collection_names())
-
-# Print sample data from each collection
-for collection_name in db.list_collection_names():
-    print(f"\nSample data from {collection_name}:")
-    for doc in db[collection_name].find():
-        print(doc)
+
+
+def _stored(rows: Iterable[Dict]) -> Iterator[Dict]:
+    """Rows without their generation-only fields"""
+    for row in rows:
+        yield {key: value for key, value in row.items() if not key.startswith("_") or key == "_id"}
+
+
+def reserve_seqs(db, name: str, count: int) -> range:
+    """Take a block of `count` change sequence numbers for one collection's rows, in one update.
+
+    The sequence document was dropped with everything else, so the first
+    block starts a new epoch: every ETag changes and clients of /sync start over.
+    """
+    state = db.counters.find_one_and_update(
+        {"_id": SEQ_FIELD},
+        {"$inc": {"seq": count}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:12], "pending": {}, "versions": {}}},
+        upsert=True, return_document=ReturnDocument.AFTER,
+    )
+    return range(state["seq"] - count + 1, state["seq"] + 1)
+
+
+def _sequenced(rows: Iterable[Dict], seqs: range) -> Iterator[Dict]:
+    """Rows stamped with consecutive change sequence numbers, as the API stamps what it writes"""
+    for row, seq in zip(rows, seqs):
+        row[SEQ_FIELD] = seq
+        yield row
+
+
+def link_user_documents(db) -> float:
+    """Fill users.documents with the ids each user owns, in one server-side pass"""
+    started = time.perf_counter()
+    db.documents.aggregate([
+        {"$sort": {"id": 1}},
+        {"$group": {"_id": "$owner", "documents": {"$push": "$id"}}},
+        {"$merge": {"into": "users", "on": "_id", "whenMatched": [{"$set": {"documents": "$$new.documents"}}],
+                    "whenNotMatched": "discard"}},
+    ], allowDiskUse=True)
+    seconds = time.perf_counter() - started
+    print(f"[loaddb] users.documents linked in {seconds:.1f}s")
+    return round(seconds, 2)
+
+
+def seed_database(db, rng: random.Random, courses: int, subjects_per_course: int, users: int, teacher_ratio: float,
+                  documents: int, batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 4,
+                  link_documents: bool = True) -> Dict:
+    """Drop every collection in `db` and load a freshly generated dataset into it"""
+    # Start from an empty database; indexes are created after the load, which is much faster
+    for collection_name in db.list_collection_names():
+        db[collection_name].drop()
+
+    course_rows, subject_rows = generate_courses_and_subjects(rng, courses, subjects_per_course)
+    user_rows = generate_users(rng, users, teacher_ratio, courses)
+    document_rows = generate_documents(rng, documents, user_rows, course_rows, subject_rows)
+    report = {
+        "courses": load(db.courses, _sequenced(course_rows, reserve_seqs(db, "courses", len(course_rows))),
+                        batch_size, workers),
+        "subjects": load(db.subjects, _sequenced(_stored(subject_rows), reserve_seqs(db, "subjects", len(subject_rows))),
+                         batch_size, workers),
+        "users": load(db.users, _sequenced(_stored(user_rows), reserve_seqs(db, "users", len(user_rows))),
+                      batch_size, workers),
+        "documents": load(db.documents, _sequenced(document_rows, reserve_seqs(db, "documents", documents)),
+                          batch_size, workers),
+    }
+    # Count the load as one finished write per collection, as the API does after
+    # its own writes, so no ETag handed out during the load matches afterwards
+    db.counters.update_one({"_id": SEQ_FIELD}, {"$inc": {f"versions.{name}": 1 for name in SEQUENCES}})
+    if link_documents:
+        report["link_user_documents_seconds"] = link_user_documents(db)
+    return report
+
+
+async def finish() -> Dict:
+    """Build what the API expects on top of the raw data: indexes, id counters, grade summaries"""
+    report = {}
+    started = time.perf_counter()
+    await IndexManager().ensure_indexes()
+    report["indexes_seconds"] = round(time.perf_counter() - started, 2)
+    report["counters"] = await CounterController().seed_all(SEQUENCES)
+    started = time.perf_counter()
+    await build_grade_stats(force=True)
+    report["grade_stats_seconds"] = round(time.perf_counter() - started, 2)
+    AsyncMongoDBConnection().close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset and bulk-load it into MongoDB")
+    parser.add_argument("--courses", type=int, default=8, help="Number of courses")
+    parser.add_argument("--subjects-per-course", type=int, default=6, help="Average number of subjects per course")
+    parser.add_argument("--users", type=int, default=2000, help="Number of users (teachers and students)")
+    parser.add_argument("--teacher-ratio", type=float, default=0.05, help="Share of users that are teachers")
+    parser.add_argument("--documents", type=int, default=50000, help="Number of documents")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per insert_many")
+    parser.add_argument("--workers", type=int, default=4, help="insert_many batches in flight at once")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, for a reproducible dataset")
+    parser.add_argument("--skip-user-documents", action="store_true",
+                        help="Leave users.documents empty instead of filling it after the load")
+    args = parser.parse_args()
+    if args.courses < 1 or args.users < 1 or args.subjects_per_course < 1:
+        parser.error("--courses, --subjects-per-course and --users must be at least 1")
+    if args.batch_size < 1 or args.workers < 1:
+        parser.error("--batch-size and --workers must be at least 1")
+
+    started = time.perf_counter()
+    report = seed_database(MongoDBConnection().get_database(), random.Random(args.seed), args.courses,
+                           args.subjects_per_course, args.users, args.teacher_ratio, args.documents,
+                           args.batch_size, args.workers, link_documents=not args.skip_user_documents)
+    MongoDBConnection().close()
+
+    report.update(asyncio.run(finish()))
+    rows = sum(report[name]["rows"] for name in SEQUENCES)
+    seconds = time.perf_counter() - started
+    report["total"] = {"rows": rows, "seconds": round(seconds, 2), "rows_per_sec": round(rows / seconds) if seconds else 0}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
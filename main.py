@@ -1,15 +1,32 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import user_routes, document_routes, subject_routes, course_routes
-from app.connection.connection import MongoDBConnection
+from app.routes import user_routes, document_routes, subject_routes, course_routes, stats_routes, analytics_routes, search_routes, event_routes, sync_routes, admin_routes
+from app.connection.connection import AsyncMongoDBConnection
+from app.controller.counter_controller import CounterController
+from app.connection.indexes import IndexManager, index_dry_run_enabled
+from app.connection.migrations import run_migrations
+from app.controller.reference_cache import reference_cache
+from app.controller.change_feed import change_feed
+from app.utils.metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from app.utils.profiler import ProfileMiddleware
+from app.utils.timing import SERVER_TIMING_ENABLED, ServerTimingMiddleware, TimedJSONResponse, install_response_validation_timing
 
 # Create FastAPI app
 app = FastAPI(
     title="API Documentation",
     description="API for managing users, documents, subjects and courses",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=TimedJSONResponse,
 )
 
+# Admin-only ?profile=1 sampling profiler; innermost, so CORS and timing headers still apply to its reply
+app.add_middleware(ProfileMiddleware)
+
+# Server-Timing header (db, validate, serialize, total) on every response
+if SERVER_TIMING_ENABLED:
+    install_response_validation_timing()
+    app.add_middleware(ServerTimingMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -17,20 +34,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],  # Pagination cursor, validator for conditional GETs, per-request timing breakdown
 )
 
+# Request latency/size metrics for /metrics; added last so it wraps everything else
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers with prefixes
 app.include_router(user_routes.router, prefix="/users", tags=["users"])
 app.include_router(document_routes.router, prefix="/documents", tags=["documents"])
 app.include_router(subject_routes.router, prefix="/subjects", tags=["subjects"])
 app.include_router(course_routes.router, prefix="/courses", tags=["courses"])
+app.include_router(stats_routes.router, prefix="/stats", tags=["stats"])
+app.include_router(analytics_routes.router, prefix="/analytics", tags=["analytics"])
+app.include_router(search_routes.router, prefix="/search", tags=["search"])
+app.include_router(event_routes.router, prefix="/events", tags=["events"])
+app.include_router(sync_routes.router, prefix="/sync", tags=["sync"])
+app.include_router(admin_routes.router, prefix="/admin", tags=["admin"])
 
 @app.on_event("startup")
 async def startup_db_client():
     """Initialize database connection on startup"""
     try:
         # Test database connection
-        db = MongoDBConnection().get_database()
+        await AsyncMongoDBConnection().ping()
+
+        # Make sure id sequences start past any data that already exists
+        counters = await CounterController().seed_all(["users", "documents", "subjects", "courses"])
+        print(f"ID sequences seeded: {counters}")
+
+        # Backfill derived fields before the indexes built on them
+        migrations = await run_migrations()
+        print(f"Migrations applied: {migrations}")
+
+        # Create the unique and query indexes declared for each collection
+        indexes = IndexManager()
+        await indexes.ensure_indexes(dry_run=index_dry_run_enabled())
+        # Email uniqueness rests on its index alone, so refuse to serve without it
+        await indexes.require_indexes()
+
         # You can add any additional startup database operations here
         print("Database connection established successfully!")
     except Exception as e:
@@ -40,7 +83,8 @@ async def startup_db_client():
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close database connection on shutdown"""
-    MongoDBConnection().close()
+    await change_feed.stop()
+    AsyncMongoDBConnection().close()
     print("Database connection closed.")
 
 @app.get("/")
@@ -49,9 +93,17 @@ async def root():
     return {
         "message": "Welcome to University API",
         "status": "running",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "reference_cache": reference_cache.stats(),
+        "change_feed": change_feed.stats()
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request, MongoDB command and connection pool metrics in the Prometheus text format"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
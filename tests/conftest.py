@@ -0,0 +1,200 @@
+"""Shared fixtures: the API on a throwaway database, and the MongoDB commands it sends.
+
+Set MONGODB_TEST_URI to run against a real mongod; the commands are then
+recorded by a pymongo CommandListener. Without it the API runs on
+mongomock-motor, which sends no commands at all, so the same recorder is
+fed by wrapping each mock collection method with the command the real
+driver sends for it.
+"""
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Dict, List, Tuple
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne, monitoring
+import os
+import pytest
+
+TEST_URI = os.getenv("MONGODB_TEST_URI")
+TEST_DB_NAME = os.getenv("MONGODB_TEST_DB_NAME", "university_test")
+
+# Commands that change data; everything else the API sends is a read or bookkeeping
+WRITE_COMMANDS = {"insert", "update", "delete", "findAndModify"}
+
+# The command the driver sends for each collection method (bulk_write sends one per kind of op)
+MOCK_COMMANDS = {
+    "find": "find",
+    "find_one": "find",
+    "aggregate": "aggregate",
+    "count_documents": "aggregate",
+    "distinct": "distinct",
+    "insert_one": "insert",
+    "insert_many": "insert",
+    "update_one": "update",
+    "update_many": "update",
+    "replace_one": "update",
+    "delete_one": "delete",
+    "delete_many": "delete",
+    "find_one_and_update": "findAndModify",
+    "find_one_and_replace": "findAndModify",
+    "find_one_and_delete": "findAndModify",
+}
+BULK_OP_COMMANDS = {
+    InsertOne: "insert",
+    UpdateOne: "update",
+    UpdateMany: "update",
+    ReplaceOne: "update",
+    DeleteOne: "delete",
+    DeleteMany: "delete",
+}
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Collects (command name, collection) for every command sent to the test database"""
+
+    def __init__(self):
+        self.commands: List[Tuple[str, str]] = []
+
+    def record(self, name: str, collection: str):
+        self.commands.append((name, collection))
+
+    def on(self, collection: str) -> List[str]:
+        """Names of the commands sent against one collection, in order"""
+        return [name for name, target in self.commands if target == collection]
+
+    def writes(self, collection: str) -> List[str]:
+        """Names of the write commands sent against one collection, in order"""
+        return [name for name in self.on(collection) if name in WRITE_COMMANDS]
+
+    def clear(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.database_name == TEST_DB_NAME:
+            self.record(event.command_name, event.command.get(event.command_name))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+recorder = CommandRecorder()
+
+
+def _bulk_commands(requests, ordered: bool) -> List[str]:
+    """Commands for a bulk_write: one per run of same-kind ops if ordered, one per kind if not"""
+    kinds = [BULK_OP_COMMANDS[type(request)] for request in requests]
+    if not ordered:
+        return sorted(set(kinds), key=kinds.index)
+    return [kind for i, kind in enumerate(kinds) if i == 0 or kinds[i - 1] != kind]
+
+
+def _record_mock_commands():
+    """Wrap the mongomock-motor collection methods so each call is recorded as its command"""
+    from mongomock_motor import AsyncMongoMockCollection
+
+    def recording(name, method, command):
+        if name == "bulk_write":
+            @wraps(method)
+            async def bulk_write(self, requests, *args, **kwargs):
+                for name in _bulk_commands(requests, kwargs.get("ordered", True)):
+                    recorder.record(name, self.name)
+                return await method(self, requests, *args, **kwargs)
+            return bulk_write
+        if name in ("find", "aggregate"):
+            # Return cursors; the command goes out when they are first read, at most once either way
+            @wraps(method)
+            def cursor(self, *args, **kwargs):
+                recorder.record(command, self.name)
+                return method(self, *args, **kwargs)
+            return cursor
+
+        @wraps(method)
+        async def call(self, *args, **kwargs):
+            recorder.record(command, self.name)
+            return await method(self, *args, **kwargs)
+        return call
+
+    for name, command in {**MOCK_COMMANDS, "bulk_write": None}.items():
+        setattr(AsyncMongoMockCollection, name, recording(name, getattr(AsyncMongoMockCollection, name), command))
+
+
+def _use_mongomock():
+    """Point both of the API's connections at one in-memory mongomock client"""
+    import mongomock
+    import mongomock_motor
+    import app.connection.connection as connection
+
+    client = mongomock.MongoClient()
+    connection.MongoClient = lambda *args, **kwargs: client
+    connection.AsyncIOMotorClient = lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=client)
+    _record_mock_commands()
+
+
+# Set up before the app (and with it the connection singletons) is imported by any test
+os.environ["MONGODB_DB_NAME"] = TEST_DB_NAME
+if TEST_URI:
+    os.environ["MONGODB_URI"] = TEST_URI
+    monitoring.register(recorder)
+else:
+    os.environ["MONGODB_URI"] = "mongodb://localhost:27017"
+    _use_mongomock()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The API, started once for the whole run"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+    if TEST_URI:
+        from pymongo import MongoClient
+        MongoClient(TEST_URI).drop_database(TEST_DB_NAME)
+
+
+@pytest.fixture
+def db(client):
+    """The test database, emptied before each test (indexes are kept), with no reference data cached"""
+    from app.connection.connection import MongoDBConnection
+    from app.controller.reference_cache import reference_cache
+
+    database = MongoDBConnection().get_database()
+    for name in database.list_collection_names():
+        database[name].delete_many({})
+    reference_cache.invalidate()
+    return database
+
+
+@pytest.fixture
+def seeded(db) -> Dict:
+    """Two courses, three subjects, teachers 1-2, students 3-5 and documents 1-3, with id counters past them"""
+    db.courses.insert_many([
+        {"id": 1, "name": "Computer Science", "subjects": [1, 2]},
+        {"id": 2, "name": "Business", "subjects": [3]},
+    ])
+    db.subjects.insert_many([{"id": i, "name": f"Subject {i}", "description": f"About subject {i}"} for i in (1, 2, 3)])
+    db.users.insert_many([
+        {"id": i, "name": f"User {'ABCDE'[i - 1]}", "email": f"user{i}@example.edu",
+         "email_normalized": f"user{i}@example.edu", "type": "teacher" if i <= 2 else "student",
+         "courses": [1], "documents": [], "version": 1}
+        for i in range(1, 6)
+    ])
+    owner = db.users.find_one({"id": 3})["_id"]
+    db.documents.insert_many([
+        {"id": i, "title": f"Document {i}", "file_url": f"https://files.example.edu/{i}.pdf",
+         "type": "Exam", "grade": 60 + i, "teacher_id": 1, "subject_id": 1, "owner": owner,
+         "upload_date": datetime(2024, 1, 1) + timedelta(days=i), "version": 1}
+        for i in (1, 2, 3)
+    ])
+    db.counters.insert_many([{"_id": name, "seq": 5 if name == "users" else 3}
+                             for name in ("users", "documents", "subjects", "courses")])
+    return {"owner": str(owner)}
+
+
+@pytest.fixture
+def commands(client) -> CommandRecorder:
+    """The commands sent from here to the end of the test"""
+    recorder.clear()
+    return recorder
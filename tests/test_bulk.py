@@ -0,0 +1,147 @@
+"""Bulk endpoints: every per-item status, and results taken from the write rather than a later read"""
+from app.connection.connection import AsyncMongoDBConnection
+from app.utils.bulk import read_current, update_batch
+
+
+def statuses(response):
+    assert response.status_code == 200
+    return [item["status"] for item in response.json()["items"]]
+
+
+def test_create_users_reports_each_item(client, seeded, db):
+    response = client.post("/users/bulk", json=[
+        {"name": "New Student", "email": "new@example.edu", "type": "student"},
+        {"name": "Bad Type", "email": "bad@example.edu", "type": "janitor"},
+        {"name": "Taken Email", "email": "User3@example.edu", "type": "student"},
+        {"name": "Same Email", "email": "twin@example.edu", "type": "student"},
+        {"name": "Same Email Again", "email": "TWIN@example.edu", "type": "student"},
+    ])
+
+    assert statuses(response) == ["created", "invalid", "conflict", "created", "conflict"]
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 3)
+    assert body["items"][0]["id"] == 6 and body["items"][0]["version"] == 1
+    assert body["items"][2]["error"] == "Email User3@example.edu already registered"
+    assert db.users.count_documents({"email_normalized": "twin@example.edu"}) == 1
+
+
+def test_update_users_reports_each_item(client, seeded, db):
+    response = client.put("/users/bulk", json=[
+        {"id": 3, "name": "Renamed Student"},
+        {"id": 99, "name": "Nobody Here"},
+        {"id": 4, "name": "Stale Edit", "version": 5},
+        {"id": 5},
+        {"id": 3, "name": "Renamed Twice"},
+        {"name": "No Id"},
+        {"id": 2, "email": "user1@example.edu"},
+    ])
+
+    assert statuses(response) == ["updated", "not_found", "conflict", "invalid", "invalid", "invalid", "conflict"]
+    items = response.json()["items"]
+    assert items[0]["version"] == 2
+    assert items[2]["version"] == 1
+    assert "appears more than once" in items[4]["error"]
+    assert items[6]["error"] == "Email user1@example.edu already registered"
+    assert db.users.find_one({"id": 3})["name"] == "Renamed Student"
+    assert db.users.find_one({"id": 4})["name"] == "User D"
+
+
+def test_delete_users_reports_each_item(client, seeded, db):
+    response = client.post("/users/bulk/delete", json=[
+        {"id": 4},
+        {"id": 99},
+        {"id": 5, "version": 2},
+        {"id": 4},
+        {"id": "five"},
+    ])
+
+    assert statuses(response) == ["deleted", "not_found", "conflict", "invalid", "invalid"]
+    assert db.users.find_one({"id": 4}) is None
+    assert db.tombstones.count_documents({"collection": "users", "id": 4}) == 1
+
+
+def test_create_documents_reports_each_item(client, seeded):
+    document = {"title": "Lab report", "file_url": "https://files.example.edu/lab.pdf", "type": "Assignment",
+                "grade": 88, "teacher_id": 1, "subject_id": 2, "owner": seeded["owner"]}
+    response = client.post("/documents/bulk", json=[document, {**document, "type": "Poster"}])
+
+    assert statuses(response) == ["created", "invalid"]
+
+
+def test_update_documents_reports_each_item(client, seeded, db):
+    response = client.put("/documents/bulk", json=[
+        {"id": 1, "grade": 95},
+        {"id": 42, "grade": 50},
+        {"id": 2, "grade": 70, "version": 3},
+        {"id": 3, "owner": "not-an-object-id"},
+        {"id": 1, "grade": 10},
+    ])
+
+    assert statuses(response) == ["updated", "not_found", "conflict", "invalid", "invalid"]
+    assert db.documents.find_one({"id": 1})["grade"] == 95
+    assert db.documents.find_one({"id": 2})["grade"] == 62
+
+
+def test_delete_documents_reports_each_item(client, seeded, db):
+    response = client.post("/documents/bulk/delete", json=[{"id": 1}, {"id": 42}, {"id": 2, "version": 9}])
+
+    assert statuses(response) == ["deleted", "not_found", "conflict"]
+    assert db.documents.count_documents({}) == 2
+
+
+class LateWriter:
+    """A collection whose bulk_write is followed by another client's update to `id` before the results are read"""
+
+    def __init__(self, collection, id):
+        self.collection = collection
+        self.id = id
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def bulk_write(self, *args, **kwargs):
+        result = await self.collection.bulk_write(*args, **kwargs)
+        await self.collection.update_one({"id": self.id}, {"$set": {"title": "Edited elsewhere"}, "$inc": {"version": 1}})
+        return result
+
+
+def run_batch(client, collection, updates, current=None):
+    async def run():
+        return await update_batch(collection, updates, label="Document", current=current)
+    return client.portal.call(run)
+
+
+def test_write_landing_after_the_batch_is_not_a_conflict(client, seeded, db):
+    documents = AsyncMongoDBConnection().get_collection("documents")
+
+    results = run_batch(client, LateWriter(documents, 1), [(0, 1, {"grade": 99}, None)])
+
+    assert [result["status"] for result in results] == ["updated"]
+    assert results[0]["version"] == 2
+    assert db.documents.find_one({"id": 1})["version"] == 3
+
+
+def test_write_landing_before_the_batch_is_a_conflict(client, seeded, db):
+    documents = AsyncMongoDBConnection().get_collection("documents")
+    current = client.portal.call(read_current, documents, [1, 2])
+    db.documents.update_one({"id": 1}, {"$set": {"title": "Edited elsewhere"}, "$inc": {"version": 1}})
+
+    results = run_batch(client, documents, [(0, 1, {"grade": 99}, None), (1, 2, {"grade": 98}, None)], current)
+
+    assert [result["status"] for result in results] == ["conflict", "updated"]
+    assert db.documents.find_one({"id": 1})["grade"] == 61
+    assert db.documents.count_documents({}) == 3
+
+
+def test_record_deleted_before_the_batch_is_not_found(client, seeded, db, commands):
+    documents = AsyncMongoDBConnection().get_collection("documents")
+    current = client.portal.call(read_current, documents, [1, 2])
+    db.documents.delete_one({"id": 1})
+    commands.clear()
+
+    results = run_batch(client, documents, [(0, 1, {"grade": 99}, None), (1, 2, {"grade": 98}, None)], current)
+
+    assert [result["status"] for result in results] == ["not_found", "updated"]
+    # Nothing is written for the deleted record, so nothing shows up on /events or /sync
+    assert commands.on("documents") == ["update", "find"]
+    assert db.documents.count_documents({}) == 2
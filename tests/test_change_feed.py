@@ -0,0 +1,46 @@
+"""Change feed shutdown and subscriber bookkeeping (the change stream itself needs a replica set)"""
+from app.controller.change_feed import ChangeFeed, Subscriber
+from app.services.event_service import EventService
+from unittest import mock
+import asyncio
+
+
+def test_close_replaces_a_full_queue_with_the_end_of_stream():
+    subscriber = Subscriber({"users"}, buffer_size=2)
+    subscriber.offer(b"one")
+    subscriber.offer(b"two")
+
+    subscriber.close()
+
+    assert subscriber.queue.get_nowait() is None
+    assert subscriber.queue.empty()
+
+
+def test_stop_ends_every_stream_even_when_queues_are_full():
+    async def run():
+        feed = ChangeFeed(buffer_size=1)
+        slow, idle = Subscriber({"users"}, 1), Subscriber({"users"}, 1)
+        slow.offer(b"unread")
+        feed.subscribers.update({slow, idle})
+
+        await feed.stop()
+
+        assert not feed.subscribers
+        return [slow.queue.get_nowait(), idle.queue.get_nowait()]
+
+    assert asyncio.run(run()) == [None, None]
+
+
+def test_stream_registers_only_once_iterated():
+    async def run():
+        feed = ChangeFeed()
+        with mock.patch("app.services.event_service.change_feed", feed), mock.patch.object(feed, "start"):
+            stream = EventService().stream(["users"])
+            # A response dropped before its first chunk never iterates its body
+            registered_before = len(feed.subscribers)
+            first = await stream.__anext__()
+            registered_while_streaming = len(feed.subscribers)
+            await stream.aclose()
+            return registered_before, first, registered_while_streaming, len(feed.subscribers)
+
+    assert asyncio.run(run()) == (0, b"retry: 3000\n\n", 1, 0)
@@ -0,0 +1,94 @@
+"""Single-record writes: one round-trip each, and version preconditions that fail without writing"""
+
+
+def test_put_is_one_find_and_modify(client, seeded, commands):
+    response = client.put("/documents/1", json={"title": "Revised notes"})
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "Revised notes"
+    assert response.json()["version"] == 2
+    assert commands.on("documents") == ["findAndModify"]
+    # Taking the change sequence number and releasing it, one update each
+    assert commands.on("counters") == ["findAndModify", "update"]
+
+
+def test_put_with_current_version_is_one_find_and_modify(client, seeded, commands):
+    response = client.put("/documents/1", json={"title": "Revised notes", "version": 1})
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert commands.on("documents") == ["findAndModify"]
+
+
+def test_put_without_changes_is_not_a_404(client, seeded, commands):
+    response = client.put("/documents/1", json={"title": "Document 1"})
+
+    assert response.status_code == 200
+    assert commands.on("documents") == ["findAndModify"]
+
+
+def test_put_missing_document_is_404_after_one_command(client, seeded, commands):
+    response = client.put("/documents/99", json={"title": "Revised notes"})
+
+    assert response.status_code == 404
+    assert commands.on("documents") == ["findAndModify"]
+
+
+def test_put_version_mismatch_is_409_without_a_second_write(client, seeded, db, commands):
+    response = client.put("/documents/1", json={"title": "Revised notes", "version": 7})
+
+    assert response.status_code == 409
+    assert commands.writes("documents") == ["findAndModify"]
+    # The only other command tells a conflict from a missing document
+    assert commands.on("documents") == ["findAndModify", "find"]
+    assert db.documents.find_one({"id": 1})["title"] == "Document 1"
+
+
+def test_put_user_is_one_find_and_modify(client, seeded, commands):
+    response = client.put("/users/3", json={"name": "Student Renamed"})
+
+    assert response.status_code == 200
+    assert commands.on("users") == ["findAndModify"]
+    assert commands.on("counters") == ["findAndModify", "update"]
+
+
+def test_delete_user_is_one_delete(client, seeded, db, commands):
+    response = client.delete("/users/4")
+
+    assert response.status_code == 200
+    assert commands.on("users") == ["delete"]
+    assert commands.writes("counters") == ["findAndModify", "update"]
+    assert db.users.find_one({"id": 4}) is None
+
+
+def test_delete_document_is_one_command(client, seeded, db, commands):
+    # find_one_and_delete rather than delete: the grade summaries need the removed grade back
+    response = client.delete("/documents/2")
+
+    assert response.status_code == 200
+    assert commands.on("documents") == ["findAndModify"]
+    assert db.documents.find_one({"id": 2}) is None
+
+
+def test_delete_missing_is_404_after_one_delete(client, seeded, commands):
+    response = client.delete("/users/99")
+
+    assert response.status_code == 404
+    assert commands.on("users") == ["delete"]
+
+
+def test_delete_version_mismatch_is_409_without_a_second_write(client, seeded, db, commands):
+    response = client.delete("/users/4", params={"version": 3})
+
+    assert response.status_code == 409
+    assert commands.writes("users") == ["delete"]
+    assert commands.on("users") == ["delete", "find"]
+    assert db.users.find_one({"id": 4}) is not None
+
+
+def test_delete_document_version_mismatch_is_409_without_a_second_write(client, seeded, db, commands):
+    response = client.delete("/documents/2", params={"version": 3})
+
+    assert response.status_code == 409
+    assert commands.writes("documents") == ["findAndModify"]
+    assert db.documents.find_one({"id": 2}) is not None
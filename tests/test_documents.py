@@ -0,0 +1,23 @@
+"""Document reads by owner"""
+from app.routes import document_routes
+from pymongo.errors import ServerSelectionTimeoutError
+from unittest import mock
+import pytest
+
+
+def test_documents_by_owner(client, seeded):
+    response = client.get(f"/documents/owner/{seeded['owner']}")
+
+    assert response.status_code == 200
+    assert [document["id"] for document in response.json()] == [1, 2, 3]
+
+
+def test_owner_that_is_not_an_object_id_has_no_documents(client, seeded):
+    assert client.get("/documents/owner/not-an-object-id").json() == []
+
+
+def test_database_failure_is_not_an_empty_list(client, seeded):
+    with mock.patch.object(document_routes.document_service.controller, "collection") as collection:
+        collection.find.side_effect = ServerSelectionTimeoutError("No primary available")
+        with pytest.raises(ServerSelectionTimeoutError):
+            client.get(f"/documents/owner/{seeded['owner']}")
@@ -0,0 +1,81 @@
+"""Grade summaries: incremental upkeep, the aggregation rebuild, and statistics from drifted counters"""
+from app.controller.grade_stats_controller import GradeStatsController
+from app.utils.grade_stats import describe
+from unittest import mock
+
+DOCUMENT = {"title": "Quiz", "file_url": "https://files.example.edu/quiz.pdf", "type": "Assignment",
+            "teacher_id": 2, "subject_id": 3}
+
+
+def stored(db):
+    """Summaries by _id, without the zero counters and buckets $inc leaves behind"""
+    summaries = {}
+    for summary in db.grade_stats.find():
+        summary["histogram"] = {bucket: n for bucket, n in summary.get("histogram", {}).items() if n}
+        summaries[summary["_id"]] = {key: value for key, value in summary.items() if value not in (0, {})}
+    return summaries
+
+
+def test_rebuild_matches_incremental_upkeep(client, seeded, db):
+    client.portal.call(GradeStatsController().rebuild)
+    owner = seeded["owner"]
+    client.post("/documents/bulk", json=[{**DOCUMENT, "grade": grade, "owner": owner} for grade in (71.5, 100, 0)])
+    client.post("/documents/", json={**DOCUMENT, "owner": owner})
+    client.put("/documents/1", json={"grade": 45.25, "subject_id": 2})
+    client.delete("/documents/2")
+    incremental = stored(db)
+
+    report = client.portal.call(GradeStatsController().rebuild)
+
+    assert stored(db) == incremental
+    assert report == {"summaries": len(incremental), "documents": 6}
+
+
+def test_summary_left_without_documents_drops_out_of_listings(client, seeded, db):
+    client.portal.call(GradeStatsController().rebuild)
+    client.post("/documents/", json={**DOCUMENT, "grade": 80, "owner": seeded["owner"]})
+    assert [stats["key"] for stats in client.get("/analytics/grades/subject").json()] == [1, 3]
+
+    client.delete("/documents/4")
+
+    assert [stats["key"] for stats in client.get("/analytics/grades/subject").json()] == [1]
+    assert [stats["key"] for stats in client.get("/analytics/grades/teacher").json()] == [1]
+    assert db.grade_stats.find_one({"_id": "subject:3"}) is None
+
+
+def test_summaries_are_current_before_the_etag_moves(client, seeded, db):
+    record_many = GradeStatsController.record_many
+    seen = []
+
+    async def recording(self, changes):
+        # What an /analytics read landing now would be tagged with
+        seen.append(db.counters.find_one({"_id": "updated_seq"}).get("versions", {}).get("documents", 0))
+        await record_many(self, changes)
+
+    with mock.patch.object(GradeStatsController, "record_many", recording):
+        client.put("/documents/1", json={"grade": 90})
+        client.put("/documents/bulk", json=[{"id": 2, "grade": 91}])
+
+    assert seen == [0, 1]
+    assert db.counters.find_one({"_id": "updated_seq"})["versions"]["documents"] == 2
+
+
+def test_failed_summary_update_does_not_fail_the_write(client, seeded, db):
+    with mock.patch("app.controller.grade_stats_controller.deltas", side_effect=KeyError("grade")):
+        response = client.put("/documents/1", json={"grade": 90})
+
+    assert response.status_code == 200
+    assert db.documents.find_one({"id": 1})["grade"] == 90
+
+
+def test_median_uses_the_histogram_when_it_drifts_from_count():
+    drifted = {"count": 5, "sum": 400.0, "sum_sq": 32500.0, "histogram": {"70": 1, "90": 1}}
+
+    stats = describe("subject", 1, drifted)
+
+    assert stats["median"] == 80
+    assert stats["mean"] == 80
+
+
+def test_median_of_an_empty_histogram_is_none():
+    assert describe("subject", 1, {"count": 2, "sum": 150.0, "sum_sq": 11300.0})["median"] is None
@@ -0,0 +1,53 @@
+"""Startup refuses to serve without the indexes that guard against duplicates, and duplicates are 409s"""
+from app.connection.indexes import IndexManager
+from pymongo import ASCENDING
+import pytest
+
+
+def test_required_indexes_are_in_place_after_startup(client):
+    client.portal.call(IndexManager().require_indexes)
+
+
+def test_missing_email_index_stops_startup(client, db):
+    db.users.drop_index([("email_normalized", ASCENDING)])
+    try:
+        with pytest.raises(RuntimeError, match="email_normalized"):
+            client.portal.call(IndexManager().require_indexes)
+    finally:
+        client.portal.call(IndexManager().ensure_indexes)
+
+
+def test_email_index_without_unique_stops_startup(client, db):
+    db.users.drop_index([("email_normalized", ASCENDING)])
+    db.users.create_index([("email_normalized", ASCENDING)])
+    try:
+        with pytest.raises(RuntimeError, match="without the unique option"):
+            client.portal.call(IndexManager().require_indexes)
+    finally:
+        db.users.drop_index([("email_normalized", ASCENDING)])
+        client.portal.call(IndexManager().ensure_indexes)
+
+
+def test_email_taken_in_another_case_is_409(client, seeded):
+    response = client.post("/users/", json={"name": "Another User", "email": "USER3@Example.edu", "type": "student"})
+
+    assert response.status_code == 409
+
+
+def test_subject_name_taken_is_409(client, seeded):
+    created = client.post("/subjects/", json={"name": "Subject 1", "description": "Another one"})
+    renamed = client.put("/subjects/2", json={"name": "Subject 1"})
+
+    assert (created.status_code, created.json()["detail"]) == (409, "Subject Subject 1 already exists")
+    assert (renamed.status_code, renamed.json()["detail"]) == (409, "Subject Subject 1 already exists")
+
+
+def test_subject_name_taken_in_a_batch_is_a_conflict(client, seeded):
+    created = client.post("/subjects/bulk", json=[{"name": "Subject 2", "description": "Again"},
+                                                  {"name": "Subject 9", "description": "New"}])
+    renamed = client.put("/subjects/bulk", json=[{"id": 3, "name": "Subject 1"}])
+
+    assert [item["status"] for item in created.json()["items"]] == ["conflict", "created"]
+    assert created.json()["items"][0]["error"] == "Subject Subject 2 already exists"
+    item = renamed.json()["items"][0]
+    assert (item["status"], item["error"]) == ("conflict", "Subject Subject 1 already exists")
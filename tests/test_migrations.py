@@ -0,0 +1,14 @@
+"""Data migrations run at startup before the indexes exist"""
+from app.connection.migrations import backfill_updated_seq
+
+
+def test_backfill_stamps_each_unstamped_record_once(client, seeded, db, commands):
+    db.documents.update_one({"id": 2}, {"$set": {"updated_seq": 100}})
+
+    stamped = client.portal.call(backfill_updated_seq, 2)
+
+    assert stamped == {"users": 5, "documents": 2, "subjects": 3, "courses": 2}
+    seqs = [row["updated_seq"] for name in ("users", "documents", "subjects", "courses") for row in db[name].find()]
+    assert len(seqs) == 13 and len(set(seqs)) == 13
+    # Pages of 2 in _id order: three pages of users, then an empty one to finish
+    assert commands.on("users") == ["find", "update", "find", "update", "find", "update", "find"]
@@ -0,0 +1,28 @@
+"""Sampling profiler: stopping off the event loop, and the shared switch interval"""
+from app.utils.profiler import StackSampler
+import asyncio
+import sys
+import threading
+
+
+def test_overlapping_samplers_restore_the_original_switch_interval():
+    original = sys.getswitchinterval()
+
+    async def run():
+        first = StackSampler(threading.get_ident(), interval=0.002)
+        second = StackSampler(threading.get_ident(), interval=0.001)
+        first.start()
+        second.start()
+        shortest = sys.getswitchinterval()
+        # Each sampler used to restore the interval it found: stopping first put the
+        # default back while second still ran, and stopping second then left 2ms behind
+        await first.stop()
+        while_second_runs = sys.getswitchinterval()
+        await second.stop()
+        return shortest, while_second_runs
+
+    shortest, while_second_runs = asyncio.run(run())
+
+    assert shortest == 0.001
+    assert while_second_runs == 0.001
+    assert sys.getswitchinterval() == original
@@ -0,0 +1,55 @@
+"""Reference data served from memory is never older than the ETag it is sent with"""
+from app.controller.reference_cache import reference_cache
+from app.controller.sync_controller import SyncController
+from app.utils.timing import RequestTimings, current_timings
+from app.utils.versions import request_versions
+
+
+def write_elsewhere(db, subject_id: int, name: str):
+    """A write made by another API process: the shared versions move, this process's memory does not"""
+    db.subjects.update_one({"id": subject_id}, {"$set": {"name": name}})
+    db.counters.update_one({"_id": "updated_seq"}, {"$inc": {"versions.subjects": 1}}, upsert=True)
+
+
+def test_write_by_another_process_reloads_the_snapshot(client, seeded, db):
+    first = client.get("/subjects/id/1")
+    assert first.json()["name"] == "Subject 1"
+
+    write_elsewhere(db, 1, "Renamed Elsewhere")
+    second = client.get("/subjects/id/1", headers={"If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.json()["name"] == "Renamed Elsewhere"
+
+
+def test_expanded_subject_follows_the_shared_versions(client, seeded, db):
+    client.get("/documents/1", params={"expand": "subject"})
+
+    write_elsewhere(db, 1, "Renamed Elsewhere")
+    response = client.get("/documents/1", params={"expand": "subject"})
+
+    assert response.json()["expanded"]["subject"]["name"] == "Renamed Elsewhere"
+
+
+def test_unchanged_versions_are_served_from_memory(client, seeded, db):
+    first = client.get("/subjects/id/1")
+    # Not a write through the API, so neither the ETag nor the body moves
+    db.subjects.update_one({"id": 1}, {"$set": {"name": "Unannounced"}})
+    second = client.get("/subjects/id/1")
+
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.json()["name"] == "Subject 1"
+
+
+def test_only_a_reload_counts_as_database_time(client, seeded):
+    async def timed_get():
+        # As after conditional_get, which has already read the versions
+        request_versions.set(await SyncController().versions())
+        timings = RequestTimings()
+        current_timings.set(timings)
+        await reference_cache.get()
+        return timings.totals
+
+    assert "db" in client.portal.call(timed_get)
+    assert "db" not in client.portal.call(timed_get)
@@ -0,0 +1,27 @@
+"""Shaped rows render exactly as the response models they replace"""
+from app.models.document import Document
+from app.utils.serialization import RowShape, respond
+from fastapi import Response
+import orjson
+
+
+def stored_document(db, id: int):
+    row = db.documents.find_one({"id": id})
+    row["_id"], row["owner"] = str(row["_id"]), str(row["owner"])
+    return row
+
+
+def test_respond_matches_the_response_model_for_an_integer_grade(client, seeded, db):
+    row = stored_document(db, 1)
+    assert type(row["grade"]) is int
+
+    shaped = orjson.loads(respond(Response(), RowShape(Document)(row)).body)
+
+    assert shaped == Document.model_validate(row).model_dump(mode="json", by_alias=True)
+    assert type(shaped["grade"]) is float
+
+
+def test_projected_grade_is_coerced_too(client, seeded):
+    response = client.get("/documents/1", params={"fields": "grade"})
+
+    assert '"grade":61.0' in response.text
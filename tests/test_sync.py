@@ -0,0 +1,45 @@
+"""Change sequence reservations: one update to take, none waiting on another writer, no leftovers"""
+from app.controller.sync_controller import SEQ_FIELD, SYNC_PENDING_TIMEOUT_SECONDS, SyncController
+from datetime import datetime, timedelta
+
+
+def test_reservations_follow_each_other_without_reading_first(client, db, commands):
+    sync = SyncController()
+
+    async def run():
+        taken = []
+        async with sync.reserve("documents", 3) as first:
+            taken.append(first)
+            async with sync.reserve("users") as second:
+                taken.append(second)
+                horizon = await sync.horizon()
+        return taken, horizon
+
+    commands.clear()
+    (first, second), horizon = client.portal.call(run)
+
+    assert (first, second) == (range(1, 4), range(4, 5))
+    # Nothing is visible while the first reservation is still being written
+    assert horizon == 0
+    assert commands.on("counters") == ["findAndModify", "findAndModify", "find", "update", "update"]
+    state = db.counters.find_one({"_id": SEQ_FIELD})
+    assert state["pending"] == {}
+    assert state["versions"] == {"documents": 1, "users": 1}
+
+
+def test_reservation_of_a_dead_writer_is_dropped(client, db):
+    sync = SyncController()
+    abandoned = datetime.utcnow() - timedelta(seconds=SYNC_PENDING_TIMEOUT_SECONDS + 1)
+    db.counters.insert_one({"_id": SEQ_FIELD, "seq": 7, "epoch": "e", "versions": {},
+                            "pending": {"crashed": {"start": 3, "at": abandoned}}})
+
+    async def run():
+        async with sync.reserve("documents") as seqs:
+            pass
+        return seqs, await sync.horizon()
+
+    seqs, horizon = client.portal.call(run)
+
+    assert seqs == range(8, 9)
+    assert horizon == 8
+    assert db.counters.find_one({"_id": SEQ_FIELD})["pending"] == {}